@@ -0,0 +1,8 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Scalability benchmarks for PyDesignFlow.
+
+See docs/tests.rst for usage.
+"""
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compares two benchmark reports written by benchmarks.run.
+
+Usage::
+
+    python -m benchmarks.compare old.json new.json
+
+The exit code is 1 if any benchmark became slower by more than the
+threshold factor (default: 1.25) or started failing.
+"""
+
+import sys
+import json
+import argparse
+
+def load_report(filename) -> dict:
+    """
+    Returns:
+        Dictionary mapping (shape, targets, benchmark) to benchmark record.
+    """
+    with open(filename) as f:
+        report = json.load(f)
+    return {(r["shape"], r["targets"], r["benchmark"]): r for r in report["results"]}
+
+def format_record(record) -> str:
+    if record is None:
+        return "-"
+    if "error" in record:
+        return record["error"].split(":", 1)[0]
+    return f"{record['min']:.4f}"
+
+def compare(old: dict, new: dict, threshold: float) -> tuple[list[list], bool]:
+    """
+    Returns:
+        Tuple of table rows and a bool indicating a regression.
+    """
+    rows = []
+    regression = False
+    for key in list(old) + [k for k in new if k not in old]:
+        o, n = old.get(key), new.get(key)
+        ratio = ""
+        if o and n and ("min" in o) and ("min" in n) and o["min"] > 0:
+            r = n["min"] / o["min"]
+            ratio = f"{r:.2f}"
+            if r > threshold:
+                ratio += " !"
+                regression = True
+        elif o and n and ("min" in o) and ("error" in n):
+            ratio = "failed !"
+            regression = True
+        rows.append([*key, format_record(o), format_record(n), ratio])
+    return rows, regression
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Compare PyDesignFlow benchmark reports",
+        prog="python -m benchmarks.compare",
+    )
+    parser.add_argument("old", help="Report of the baseline version")
+    parser.add_argument("new", help="Report of the new version")
+    parser.add_argument("--threshold", type=float, default=1.25,
+        help="Slowdown factor that is reported as regression.")
+    args = parser.parse_args(args)
+
+    rows, regression = compare(load_report(args.old), load_report(args.new), args.threshold)
+    import tabulate
+    print(tabulate.tabulate(rows,
+        headers=["Shape", "Targets", "Benchmark", "Old [s]", "New [s]", "New/Old"]))
+    if regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Runs the scalability benchmarks and writes a JSON report.
+
+Usage::
+
+    python -m benchmarks.run --targets 100000 --output report.json
+"""
+
+import sys
+import time
+import json
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from pydesignflow import TargetId, Result
+from pydesignflow.ansiterm import NoColor
+from pydesignflow.version import version
+
+from .synthetic import shapes, populate_build_dir, sample_result, _FakeSession
+
+report_version = 1
+
+def timed(func, repeat: int, setup=None) -> dict:
+    """
+    Calls func repeat times and measures the wall time of each call. If
+    given, setup is called before each call and not included in the time.
+
+    Returns:
+        Dictionary with list of times in seconds and min / median, or with
+        an error message if func raised an exception.
+    """
+    seconds = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        seconds.append(time.perf_counter() - start)
+    return {
+        "seconds": seconds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+    }
+
+def count_targets(flow) -> int:
+    return sum(len(flow[block_id].tasks) for block_id in flow)
+
+def roundtrip_results(build_dir: Path, tids: list[TargetId]):
+    sess = _FakeSession(build_dir)
+    now = datetime.now()
+    for tid in tids:
+        json_str = sample_result(build_dir, tid, now).json(sess, tid.block_id, tid.task_id)
+        _, _, res = Result.from_json(sess, json_str)
+        res.decode_all()
+
+def run_shape(shape: str, n_targets: int, work_dir: Path, repeat: int, log=None) -> list[dict]:
+    """
+    Runs all benchmarks for one synthetic flow shape.
+
+    Returns:
+        List of benchmark records.
+    """
+    records = []
+    flow = sink = sess = targets = None
+    build_dir = work_dir / shape
+
+    def bench(name, func, setup=None, repeat=repeat):
+        if log:
+            log(f"{shape}: {name}")
+        record = {"shape": shape, "benchmark": name}
+        record.update(timed(func, repeat, setup))
+        records.append(record)
+        return "error" not in record
+
+    def construct():
+        nonlocal flow, sink
+        flow, sink = shapes[shape](n_targets)
+
+    def session_open():
+        nonlocal sess
+        sess = flow.session_at(build_dir)
+
+    def remove_index():
+        shutil.rmtree(build_dir / ".pydesignflow", ignore_errors=True)
+
+    if bench("flow_construct", construct):
+        targets = count_targets(flow)
+        shutil.rmtree(build_dir, ignore_errors=True)
+        populate_build_dir(flow, build_dir)
+        bench("session_open_cold", session_open, setup=remove_index)
+        bench("session_open_warm", session_open)
+
+    if sess:
+        bench("plan_missing", lambda: sess.plan(sink.block_id, sink.task_id,
+            build_dependencies="missing"))
+        bench("plan_all", lambda: sess.plan(sink.block_id, sink.task_id,
+            build_dependencies="all"))
+        bench("status", lambda: sess.status(None, show_hidden=False,
+            color=NoColor, brief=False))
+        bench("status_brief", lambda: sess.status(None, show_hidden=False,
+            color=NoColor, brief=True))
+
+        tids = [TargetId(b, t) for b in flow for t in flow[b].tasks][:10000]
+        bench("result_roundtrip", lambda: roundtrip_results(build_dir, tids))
+        records[-1]["count"] = len(tids)
+
+        block_id = next(iter(flow))
+        bench("clean_block", lambda: sess.clean(block_id),
+            setup=lambda: populate_build_dir(flow, build_dir, [block_id]))
+        bench("clean_all", lambda: sess.clean(), repeat=1)
+
+    for record in records:
+        record["targets"] = targets
+    shutil.rmtree(build_dir, ignore_errors=True)
+    return records
+
+def run(n_targets: int, shape_names: list[str], repeat: int, work_dir: Path, log=None) -> dict:
+    """
+    Returns:
+        Benchmark report as dictionary.
+    """
+    report = {
+        "report_version": report_version,
+        "pydesignflow_version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "results": [],
+    }
+    for shape in shape_names:
+        report["results"] += run_shape(shape, n_targets, work_dir, repeat, log)
+    return report
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="PyDesignFlow scalability benchmarks",
+        prog="python -m benchmarks.run",
+    )
+    parser.add_argument("--targets", "-t", type=int, default=100000,
+        help="Approximate number of targets per synthetic flow.")
+    parser.add_argument("--shapes", "-s", nargs="+", choices=list(shapes),
+        default=list(shapes), help="Synthetic flow shapes to benchmark.")
+    parser.add_argument("--repeat", "-r", type=int, default=3,
+        help="Number of repetitions of each benchmark.")
+    parser.add_argument("--output", "-o",
+        help="Write JSON report to this file instead of stdout.")
+    parser.add_argument("--work-dir", "-w",
+        help="Directory for synthetic build directories. Defaults to a temporary directory.")
+    args = parser.parse_args(args)
+
+    def log(msg):
+        print(msg, file=sys.stderr)
+        sys.stderr.flush()
+
+    if args.work_dir:
+        Path(args.work_dir).mkdir(parents=True, exist_ok=True)
+        report = run(args.targets, args.shapes, args.repeat, Path(args.work_dir), log)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run(args.targets, args.shapes, args.repeat, Path(tmp), log)
+
+    report_str = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report_str)
+    else:
+        print(report_str)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Synthetic flows and build directories for benchmarks.
+
+Each shape function returns a tuple of the Flow and the TargetId of a sink
+target, which depends (directly or indirectly) on all other targets.
+"""
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pydesignflow import Flow, Block, Result, TargetId
+from pydesignflow.target import TargetPrototype
+
+def noop_task(self, cwd, **kwargs):
+    """Synthetic task."""
+    pass
+
+def make_block_class(name: str, requires: list[dict]) -> type:
+    """
+    Creates a Block subclass with one task per element of requires. The
+    tasks are named t0, t1, ...
+    """
+    attrs = {"__doc__": f"Synthetic block {name}"}
+    for idx, req in enumerate(requires):
+        attrs[f"t{idx}"] = TargetPrototype(noop_task, req,
+            always_rebuild=False, hidden=False)
+    return type(name, (Block,), attrs)
+
+def wide_flow(n_targets: int, tasks_per_block: int=100) -> tuple[Flow, TargetId]:
+    """
+    Blocks with independent tasks. The last task of each block depends on
+    all other tasks of the block, a sink block depends on all blocks.
+    """
+    n_blocks = max(1, n_targets // tasks_per_block)
+    requires = [{} for _ in range(tasks_per_block-1)]
+    requires.append({f"d{i}": f".t{i}" for i in range(tasks_per_block-1)})
+    cls = make_block_class("WideBlock", requires)
+    flow = Flow()
+    for i in range(n_blocks):
+        flow[f"w{i}"] = cls()
+    sink = make_block_class("SinkBlock", [
+        {f"d{i}": f"=w{i}.t{tasks_per_block-1}" for i in range(n_blocks)}
+    ])
+    flow["sink"] = sink()
+    return flow, TargetId("sink", "t0")
+
+def deep_flow(n_targets: int, tasks_per_block: int=100) -> tuple[Flow, TargetId]:
+    """
+    Single dependency chain through all targets. Blocks reference their
+    predecessor symbolically via dependency_map.
+    """
+    n_blocks = max(1, n_targets // tasks_per_block)
+    chain = [{"d": f".t{i-1}"} for i in range(1, tasks_per_block)]
+    first_cls = make_block_class("ChainStartBlock", [{}] + chain)
+    cls = make_block_class("ChainBlock",
+        [{"d": f"prev.t{tasks_per_block-1}"}] + chain)
+    flow = Flow()
+    flow["c0"] = first_cls()
+    for i in range(1, n_blocks):
+        flow[f"c{i}"] = cls(dependency_map={"prev": f"c{i-1}"})
+    return flow, TargetId(f"c{n_blocks-1}", f"t{tasks_per_block-1}")
+
+def diamond_flow(n_targets: int, width: int=100) -> tuple[Flow, TargetId]:
+    """
+    Layers of width tasks, each task depending on two tasks of the previous
+    layer. Each layer is a block.
+    """
+    n_layers = max(1, n_targets // width)
+    first_cls = make_block_class("DiamondStartBlock", [{} for _ in range(width)])
+    cls = make_block_class("DiamondBlock", [
+        {"a": f"prev.t{i}", "b": f"prev.t{(i+1) % width}"} for i in range(width)
+    ])
+    flow = Flow()
+    flow["l0"] = first_cls()
+    for i in range(1, n_layers):
+        flow[f"l{i}"] = cls(dependency_map={"prev": f"l{i-1}"})
+    sink = make_block_class("SinkBlock", [
+        {f"d{i}": f"=l{n_layers-1}.t{i}" for i in range(width)}
+    ])
+    flow["sink"] = sink()
+    return flow, TargetId("sink", "t0")
+
+def many_blocks_flow(n_targets: int, tasks_per_block: int=5) -> tuple[Flow, TargetId]:
+    """
+    Many small blocks with a short dependency chain each, and a sink block
+    depending on all blocks.
+    """
+    n_blocks = max(1, n_targets // tasks_per_block)
+    cls = make_block_class("SmallBlock",
+        [{}] + [{"d": f".t{i-1}"} for i in range(1, tasks_per_block)])
+    flow = Flow()
+    for i in range(n_blocks):
+        flow[f"b{i}"] = cls()
+    sink = make_block_class("SinkBlock", [
+        {f"d{i}": f"=b{i}.t{tasks_per_block-1}" for i in range(n_blocks)}
+    ])
+    flow["sink"] = sink()
+    return flow, TargetId("sink", "t0")
+
+shapes = {
+    "wide": wide_flow,
+    "deep": deep_flow,
+    "diamond": diamond_flow,
+    "blocks": many_blocks_flow,
+}
+
+class _FakeSession:
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+
+def sample_result(build_dir: Path, tid: TargetId, time_finished: datetime) -> Result:
+    """
+    Returns a Result with attributes typical for EDA tasks.
+    """
+    cwd = build_dir / tid.block_id / tid.task_id
+    r = Result()
+    r.returned_data = True
+    r.time_started = time_finished - timedelta(seconds=42)
+    r.time_finished = time_finished
+    r.netlist = cwd / "netlist.v"
+    r.reports = [cwd / "timing.rpt", cwd / "area.rpt"]
+    r.metrics = {"wns": -0.012, "tns": -1.5, "area": 123456.7, "cells": 98765}
+    r.timing_met = False
+    return r
+
+def populate_build_dir(flow: Flow, build_dir: Path, block_ids: list[str]=None):
+    """
+    Writes a result.json file for every target of flow, or only for the
+    targets of the given blocks.
+    """
+    sess = _FakeSession(build_dir)
+    now = datetime.now()
+    for block_id in (block_ids or flow):
+        for task_id in flow[block_id].tasks:
+            tid = TargetId(block_id, task_id)
+            cwd = build_dir / block_id / task_id
+            os.makedirs(cwd, exist_ok=True)
+            res = sample_result(build_dir, tid, now)
+            with open(cwd / "result.json", "w") as f:
+                f.write(res.json(sess, block_id, task_id))
@@ -1,12 +1,20 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-from .version import version as __version__
-
 from .block import Block
 from .target import TargetId
 from .task import task, action
 from .result import Result
 from .flow import Flow
 from .errors import FlowError, ResultRequired
-from . import filemgmt
+
+def __getattr__(name):
+    # __version__ and filemgmt are loaded on first use, as they are not
+    # needed by the command line interface and slow to import.
+    if name == "__version__":
+        from .version import version
+        return version
+    elif name == "filemgmt":
+        import importlib
+        return importlib.import_module(".filemgmt", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
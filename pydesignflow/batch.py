@@ -0,0 +1,322 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Executor that submits the targets of a BuildPlan as jobs to a Slurm batch
+system.
+
+All targets of the plan are submitted up front, with dependencies between
+the jobs (``--dependency=afterok:...``), so that the batch system starts
+each job once its requirements are built. Targets with the same resource
+requests and the same upstream jobs are grouped and submitted as one array
+job, which keeps the number of submissions small for plans with thousands
+of targets. A target whose only requirement in an array job is a single
+element of it, e.g. the next step of one of many independent chains,
+depends on that element alone (``aftercorr``): its array index equals the
+index of the element it requires. Targets therefore never wait for jobs
+they do not depend on.
+
+Every array element runs ``flow worker --run <target>`` in the flow
+directory and writes a status file into the run directory
+(``.pydesignflow/batch``), which the coordinator polls. The batch system is
+only queried (one squeue call for all jobs) every queue_interval seconds,
+to detect jobs that ended without status file, e.g. due to a timeout.
+"""
+
+import os
+import sys
+import time
+import shlex
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, field
+
+from .ansiterm import NoColor
+from .errors import FlowError
+from .target import TargetId
+from .executor import Executor
+
+def write_status(status_dir: Path, tid: TargetId, error: str=None):
+    """
+    Writes status file of a target that was run by a batch job.
+
+    Args:
+        error: Formatted exception if the target failed, otherwise None.
+    """
+    name = f"{tid}.failed" if error else f"{tid}.done"
+    tmp_path = status_dir / f"{name}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(error or "")
+    os.replace(tmp_path, status_dir / name)
+
+def sbatch_options(request: dict) -> list[str]:
+    """
+    Translates resources of a target (@task(resources=...)) to sbatch
+    options. Supported resources are "cpus", "mem_gb" and "license:<name>".
+    Other resources are not passed to the batch system.
+    """
+    options = []
+    licenses = []
+    for res, amount in sorted(request.items()):
+        if res == "cpus":
+            options.append(f"--cpus-per-task={amount}")
+        elif res == "mem_gb":
+            options.append(f"--mem={int(amount * 1024)}M")
+        elif res.startswith("license:"):
+            licenses.append(f"{res[len('license:'):]}:{amount}")
+    if licenses:
+        options.append(f"--licenses={','.join(licenses)}")
+    return options
+
+def array_spec(indices) -> str:
+    """
+    Returns sbatch --array specification of indices, e.g. "0-3,7".
+    """
+    ranges = []
+    for idx in sorted(indices):
+        if ranges and ranges[-1][1] == idx - 1:
+            ranges[-1][1] = idx
+        else:
+            ranges.append([idx, idx])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+@dataclass
+class JobGroup:
+    """
+    Targets that are submitted as one (array) job.
+
+    Attributes:
+        tids: Dictionary mapping array index to TargetId.
+        after: Indices of the groups whose jobs must have completed before
+            the job starts (afterok).
+        corr: Index of the group whose element with the same array index
+            must have completed before an element starts (aftercorr), or
+            None.
+    """
+    tids: dict = field(default_factory=dict)
+    after: frozenset = frozenset()
+    corr: int = None
+
+    def is_array(self) -> bool:
+        return (self.corr is not None) or len(self.tids) > 1
+
+class SlurmExecutor(Executor):
+    """
+    Runs the targets of a BuildPlan as Slurm array jobs.
+
+    If a target fails, all remaining jobs are cancelled and FlowError is
+    raised.
+
+    Args:
+        poll_interval: Seconds between checks for status files.
+        queue_interval: Seconds between squeue calls.
+        sbatch_args: Additional sbatch arguments, e.g. ["--partition=eda"].
+            Defaults to the environment variable PYDESIGNFLOW_SBATCH_ARGS.
+        flow_dir: Directory in which the jobs import the flow, defaults to
+            the current working directory.
+        flow_command: Command that runs the command line interface of the
+            flow in the jobs, defaults to python -m pydesignflow.shortcut.
+        max_array_size: Maximum number of targets per array job.
+    """
+    sbatch = "sbatch"
+    squeue = "squeue"
+    scancel = "scancel"
+
+    def __init__(self, plan, color=NoColor, jobs: int=1, resources: dict=None,
+            poll_interval: float=2.0, queue_interval: float=30.0,
+            sbatch_args: list[str]=None, flow_dir: Path=None,
+            flow_command: list[str]=None, max_array_size: int=1000):
+        super().__init__(plan, color, jobs, resources)
+        self.poll_interval = poll_interval
+        self.queue_interval = queue_interval
+        if sbatch_args is None:
+            sbatch_args = shlex.split(os.environ.get("PYDESIGNFLOW_SBATCH_ARGS", ""))
+        self.sbatch_args = sbatch_args
+        self.flow_dir = Path(flow_dir or Path.cwd()).resolve()
+        self.flow_command = flow_command or [sys.executable, "-m", "pydesignflow.shortcut"]
+        self.max_array_size = max_array_size
+        self.run_dir = self.sess.index.meta_dir / "batch"
+        self.status_dir = self.run_dir / "status"
+        self.deps, _ = self.plan_edges()
+
+    def groups(self) -> list[JobGroup]:
+        """
+        Groups the targets of the plan into array jobs, in the order in
+        which they must be submitted. Targets of a group have the same
+        resource requests and depend on the same jobs, or on elements of
+        the same array job with their own array index (JobGroup.corr).
+
+        Targets are placed by increasing depth (length of the longest chain
+        of requirements in the plan), so that the groups they require are
+        complete when they are placed.
+        """
+        depth = {}
+        for tid in self.plan.target_sequence:
+            depth[tid] = max((depth[dep] + 1 for dep in self.deps[tid]), default=0)
+        groups = []
+        place = {} # TargetId -> (group index, array index)
+        open_groups = {} # key -> index of group that is filled
+        for tid in sorted(self.plan.target_sequence, key=depth.get):
+            request = tuple(sorted(self.sess.flow.target(tid).resources.items()))
+            in_arrays = [place[dep] for dep in self.deps[tid] if groups[place[dep][0]].is_array()]
+            if len(in_arrays) == 1:
+                corr, index = in_arrays[0]
+            else:
+                corr, index = None, None
+            after = frozenset(place[dep][0] for dep in self.deps[tid]) - {corr}
+            key = (request, after, corr)
+            idx = open_groups.get(key)
+            if (idx is None) or len(groups[idx].tids) >= self.max_array_size \
+                    or index in groups[idx].tids:
+                idx = len(groups)
+                groups.append(JobGroup(after=after, corr=corr))
+                open_groups[key] = idx
+            group = groups[idx]
+            if index is None:
+                index = len(group.tids)
+            group.tids[index] = tid
+            place[tid] = (idx, index)
+        return groups
+
+    def job_script(self, group: JobGroup) -> str:
+        worker = self.flow_command + ["worker",
+            "--build-dir", str(Path(self.sess.build_dir).resolve()),
+            "--status-dir", str(self.status_dir.resolve())]
+        targets = " ".join(f"[{idx}]={shlex.quote(str(tid))}" for idx, tid in group.tids.items())
+        options = " ".join(f"[{idx}]=--if-missing" for idx, tid in group.tids.items()
+            if self.plan.if_missing(tid))
+        return "\n".join([
+            "#!/bin/bash",
+            f"targets=({targets})",
+            f"options=({options})",
+            "idx=${SLURM_ARRAY_TASK_ID:-0}",
+            f"cd {shlex.quote(str(self.flow_dir))}",
+            f"exec {shlex.join(worker)} --run \"${{targets[$idx]}}\" ${{options[$idx]}}",
+            "",
+        ])
+
+    def submit(self, idx: int, group: JobGroup, after_jobs: list[str], corr_job: str=None) -> str:
+        """
+        Submits a group of targets as (array) job.
+
+        Args:
+            after_jobs: IDs of jobs that must complete before the job starts.
+            corr_job: ID of array job whose elements must complete before
+                the elements of the same index start, or None.
+
+        Returns:
+            Job ID.
+        """
+        tids = list(group.tids.values())
+        script = self.run_dir / f"job{idx}.sh"
+        script.write_text(self.job_script(group))
+        cmd = [self.sbatch, "--parsable",
+            f"--job-name=flow-{tids[0]}",
+            f"--output={self.run_dir / f'job{idx}_%a.log'}"]
+        if group.is_array():
+            cmd.append(f"--array={array_spec(group.tids)}")
+        dependency = []
+        if after_jobs:
+            dependency.append(f"afterok:{':'.join(after_jobs)}")
+        if corr_job:
+            dependency.append(f"aftercorr:{corr_job}")
+        if dependency:
+            cmd.append(f"--dependency={','.join(dependency)}")
+            cmd.append("--kill-on-invalid-dep=yes")
+        cmd += sbatch_options(self.sess.flow.target(tids[0]).resources)
+        cmd += self.sbatch_args
+        cmd.append(str(script))
+        try:
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise FlowError(f"sbatch failed: {e.stderr.strip()}") from None
+        # Output of --parsable is "jobid" or "jobid;cluster".
+        return out.strip().split(";")[0]
+
+    def active_jobs(self, job_ids: set[str]) -> set[str]:
+        """
+        Returns the subset of job_ids that are pending or running, or None
+        if the batch system could not be queried.
+        """
+        cmd = [self.squeue, "--noheader", "--format=%i", f"--jobs={','.join(sorted(job_ids))}"]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            if "Invalid job id" in proc.stderr:
+                # squeue fails if none of the jobs are known anymore.
+                return set()
+            return None
+        # Elements of array jobs are listed as "<jobid>_<index>".
+        return {line.strip().split("_")[0] for line in proc.stdout.splitlines() if line.strip()}
+
+    def cancel(self, job_ids: set[str]):
+        if job_ids:
+            subprocess.run([self.scancel] + sorted(job_ids), capture_output=True)
+
+    def read_status(self, outstanding: dict, failures: list):
+        """
+        Processes new status files of the targets in outstanding.
+        """
+        for name in sorted(os.listdir(self.status_dir)):
+            stem, _, state = name.rpartition(".")
+            if state not in ("done", "failed"):
+                continue
+            block_id, task_id = stem.split(".", 1)
+            tid = TargetId(block_id, task_id)
+            if outstanding.pop(tid, None) is None:
+                continue
+            # The result was written by the job:
+            self.sess.refresh_target(tid)
+            if state == "done":
+                self.message(f"Finished target {tid}.")
+            else:
+                error = (self.status_dir / name).read_text()
+                self.message(f"Failed target {tid}: {error.strip().splitlines()[-1]}")
+                failures.append((tid, error))
+
+    def run(self):
+        self.sess.trash.move(self.run_dir)
+        self.status_dir.mkdir(parents=True)
+
+        job_of = {} # TargetId -> job ID
+        groups = self.groups()
+        job_ids = []
+        for idx, group in enumerate(groups):
+            after_jobs = sorted((job_ids[g] for g in group.after), key=int)
+            corr_job = None if group.corr is None else job_ids[group.corr]
+            job_ids.append(self.submit(idx, group, after_jobs, corr_job))
+            for tid in group.tids.values():
+                job_of[tid] = job_ids[-1]
+        self.message(f"Submitted {len(job_of)} target(s) as {len(groups)} job(s).")
+
+        outstanding = dict(job_of)
+        failures = []
+        last_query = time.monotonic()
+        try:
+            while outstanding and not failures:
+                time.sleep(self.poll_interval)
+                active = None
+                if time.monotonic() - last_query >= self.queue_interval:
+                    # Queried before reading the status files, as jobs write
+                    # their status file before they end.
+                    active = self.active_jobs(set(outstanding.values()))
+                    last_query = time.monotonic()
+                self.read_status(outstanding, failures)
+                if active is None:
+                    continue
+                for tid, job_id in list(outstanding.items()):
+                    if job_id not in active:
+                        del outstanding[tid]
+                        self.sess.refresh_target(tid)
+                        error = f"Batch job {job_id} ended without running target {tid}, see {self.run_dir}."
+                        self.message(f"Failed target {tid}: {error}")
+                        failures.append((tid, error))
+        except BaseException:
+            self.cancel(set(outstanding.values()))
+            raise
+
+        if failures:
+            self.cancel(set(outstanding.values()))
+            if outstanding:
+                self.message(f"{len(outstanding)} target(s) not run due to failure.")
+            tid, error = failures[0]
+            raise FlowError(f"Target {tid} failed:\n{error}")
@@ -1,6 +1,8 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
+from pathlib import Path
+
 from .errors import FlowError
 from .target import TargetPrototype
 
@@ -26,6 +28,47 @@ class Block():
         flow = Flow()
         flow['fpga'] = SynthesisBlock()
     """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The task table is computed on first instantiation, as requirement
+        # specs were always validated when a Block is created.
+        cls._task_table = None
+
+    @classmethod
+    def task_table(cls) -> tuple:
+        """
+        Returns tuple of (task_id, TargetPrototype) pairs and the set of
+        symbolic block references required by the tasks of this class. It is
+        computed once per class.
+        """
+        table = cls.__dict__.get("_task_table")
+        if table is None:
+            ordered_keys = list(cls.__dict__.keys())
+            # cls.__dict__ does not cover inherited tasks, so if there are
+            # missing keys, add them at the end of the list:
+            for key in dir(cls):
+                if key not in ordered_keys:
+                    ordered_keys.append(key)
+
+            prototypes = []
+            block_refs = set()
+            for key in ordered_keys:
+                val = getattr(cls, key, None)
+                if isinstance(val, TargetPrototype):
+                    prototypes.append((key, val))
+                    for _, is_direct_ref, block_ref, _ in val.parse_requires():
+                        if not is_direct_ref and block_ref:
+                            block_refs.add(block_ref)
+            table = (tuple(prototypes), frozenset(block_refs))
+            cls._task_table = table
+        return table
+
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls)
+        # Constructor parameters are part of the key for cached tasks.
+        obj._init_args = (args, kwargs)
+        return obj
+
     def __init__(self, dependency_map={}):
         """
         Initialize a Block instance.
@@ -67,27 +110,65 @@ class Block():
         pass
 
 
+    def run_tool(self, cmd: list, cwd: Path, log: Path=None, env: dict=None,
+            check: bool=True, echo_rate: float=20.0, tail_lines: int=50,
+            result=None) -> "ToolRun":
+        """
+        Runs an external tool, writing its output to a compressed log file.
+
+        stdout and stderr of the tool are written to a gzip-compressed log
+        file, by default <tool>.log.gz in cwd. At most echo_rate lines per
+        second are echoed to the console; a note with the number of lines
+        not shown is printed instead of the others. Only the last
+        tail_lines lines are kept in memory.
+
+        Example::
+
+            @task()
+            def place_route(self, cwd):
+                result = Result()
+                self.run_tool(["innovus", "-batch", "-files", "pnr.tcl"], cwd, result=result)
+                return result
+
+        Args:
+            cmd: Command as list of arguments.
+            cwd: Working directory, normally the cwd of the task.
+            log: Path of the log file.
+            env: Environment of the tool, defaults to the environment of the
+                flow.
+            check: If True, ToolError is raised if the tool exits with
+                non-zero return code. The error message of the flow command
+                includes the last lines of the output.
+            echo_rate: Maximum number of lines per second echoed to the
+                console. None echoes all lines, 0 disables echo.
+            tail_lines: Number of lines kept for error messages.
+            result: If given, the command, return code, number of lines
+                and log path are appended to the list result.tool_runs.
+
+        Returns:
+            ToolRun
+
+        Raises:
+            ToolError: If check is True and the tool fails. ToolError is a
+                subclass of subprocess.CalledProcessError.
+        """
+        from .tool import run_tool
+        return run_tool(cmd, cwd, log=log, env=env, check=check, echo_rate=echo_rate,
+            tail_lines=tail_lines, result=result)
+
     def auto_register_tasks(self):
         """
         Registers all Target objects in the .tasks dictionary.
 
-        Alternately, a similar automatic detection can be implemented using a
-        metaclass and __prepare__.
+        The TargetPrototypes are looked up in the task table of the class
+        (see task_table), only the Target objects are created per instance.
         """
-        ordered_keys = list(type(self).__dict__.keys())
-        # This does not cover type(self).__dict__ does not cover everything,
-        # so if there are missing keys, add them at the end of the list:
-        for key in dir(self):
-            if key not in ordered_keys:
-                ordered_keys.append(key)
-
-        for key in ordered_keys:
-            val = getattr(self, key)
-            if isinstance(val, TargetPrototype):
-                # Bidirectional reference:
-                act = val.create()
-                act.register(self, key)
-                self.tasks[key] = act
+        prototypes, _ = self.task_table()
+        for key, proto in prototypes:
+            # Bidirectional reference:
+            act = proto.create()
+            act.register(self, key)
+            self.tasks[key] = act
 
     def required_block_refs(self) -> list[str]:
         """
@@ -95,12 +176,8 @@ class Block():
             List of block names, which need to be provided to the constructor
             via dependency_map.
         """
-        block_refs = set()
-        for task in self.tasks.values():
-            for _, is_direct_ref, block_ref, _ in task.parse_requires():
-                if not is_direct_ref and block_ref:
-                    block_refs.add(block_ref)
-        return block_refs
+        _, block_refs = self.task_table()
+        return set(block_refs)
 
     def verify_block_refs(self, dependency_map):
         """
@@ -0,0 +1,394 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Content-addressed cache for outputs of tasks declared with @task(cache=True).
+
+The cache directory can be shared between multiple users and build
+directories. Entries are published atomically, verified against SHA-256
+hashes when they are restored and evicted in least-recently-used order when
+the cache exceeds its size limit.
+
+If the cache directory is group-writable, directories created in it are
+made group-writable and setgid and files group-readable, so that all
+members of the group can add, use and evict entries.
+"""
+
+import os
+import sys
+import json
+import time
+import stat
+import shutil
+import hashlib
+import re
+from pathlib import Path
+
+from .paths import default_cache_dir
+from .serialization import StdlibCodec
+from .result import Result
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Result attributes that differ between builds of a target with identical
+# inputs. They are not part of the cache keys of dependent targets.
+volatile_attrs = frozenset(("time_started", "time_finished", "peak_rss", "peak_cpu_percent"))
+
+class CacheIntegrityError(Exception):
+    """Raised when a cache entry does not match its manifest."""
+    pass
+
+class CacheKeyError(Exception):
+    """Raised when the inputs of a target cannot be represented in a key."""
+    pass
+
+def parse_size(size) -> int:
+    """
+    Converts a size such as 500G, 20M or 1024 to a number of bytes.
+    """
+    if isinstance(size, int):
+        return size
+    m = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?)B?\s*", size, re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Malformed size \"{size}\".")
+    factor = 1024**" KMGT".index(m.group(2).upper() or " ")
+    return int(float(m.group(1)) * factor)
+
+def code_digest(code, h):
+    """
+    Feeds the bytecode of a code object and its nested code objects into
+    hash object h. Line numbers and file names are not included, so that
+    moving a task function within its file does not change its digest.
+    """
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    h.update(repr(code.co_varnames).encode())
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            code_digest(const, h)
+        elif isinstance(const, frozenset):
+            # Iteration order of sets depends on string hash randomization.
+            h.update(repr(sorted(map(repr, const))).encode())
+        else:
+            h.update(repr(const).encode())
+
+def canonical_json(obj) -> str:
+    """
+    Deterministic JSON representation of obj. Objects that are not
+    JSON-serializable are represented by their repr().
+
+    Raises:
+        CacheKeyError: If obj contains an object with the default repr(),
+            which includes its address and changes with every run.
+    """
+    def default(o):
+        if isinstance(o, Path):
+            return str(o)
+        if type(o).__repr__ is object.__repr__:
+            raise CacheKeyError(f"Object of type {type(o).__name__} has no "
+                "deterministic representation (define __repr__).")
+        return repr(o)
+    return json.dumps(obj, sort_keys=True, default=default)
+
+def copy_hashed(src, dst) -> tuple[str, int]:
+    """
+    Copies file src to dst.
+
+    Returns:
+        Tuple of SHA-256 hex digest and size of the copied data.
+    """
+    h = hashlib.sha256()
+    size = 0
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        while True:
+            buf = fsrc.read(1024*1024)
+            if not buf:
+                break
+            h.update(buf)
+            fdst.write(buf)
+            size += len(buf)
+    shutil.copymode(src, dst)
+    return h.hexdigest(), size
+
+class TaskCache:
+    """
+    Cache of task outputs, keyed on the inputs of a target.
+
+    The key of a target is computed from the bytecode of its task function,
+    the constructor parameters of its block and the results of its
+    dependencies, except for attributes such as time_started that change
+    with every build (volatile_attrs). Rebuilding a dependency with the same
+    result therefore does not change the key. Each cache entry is a directory <key[:2]>/<key> holding a
+    copy of the target directory (files/), the result JSON (result.json) and
+    a manifest with the hashes of all files (manifest.json).
+
+    Entries are assembled in tmp/ and published by renaming them into place,
+    which is atomic. Published entries are never modified. To evict an
+    entry, it is first renamed into trash/ and then deleted. Readers that are
+    copying an entry at this time fail and treat the entry as missing.
+
+    Args:
+        cache_dir: Cache directory. Can be shared by multiple users.
+        size_limit: Maximum total size of all entries in bytes, or None for
+            no limit. Least recently used entries are evicted when the
+            limit is exceeded.
+    """
+    manifest_name = "manifest.json"
+    tmp_max_age = 24*3600 # seconds
+
+    def __init__(self, cache_dir: Path, size_limit: int=None):
+        self.cache_dir = Path(cache_dir)
+        self.size_limit = size_limit
+        self.shared = None # True if cache_dir is group-writable
+
+    def make_dir(self, path: Path):
+        """
+        Creates directory path and missing parents. In a shared cache,
+        created directories below cache_dir are made group-writable and
+        setgid.
+        """
+        missing = []
+        while not path.is_dir():
+            missing.append(path)
+            path = path.parent
+        for path in reversed(missing):
+            try:
+                path.mkdir()
+            except FileExistsError:
+                continue
+            if self.cache_dir in path.parents:
+                self.share(path, stat.S_IRWXG | stat.S_ISGID)
+
+    def share(self, path: Path, bits: int):
+        """
+        Adds permission bits to path, which was created by this process, if
+        the cache is shared.
+        """
+        if self.shared is None:
+            self.shared = bool(os.stat(self.cache_dir).st_mode & stat.S_IWGRP)
+        if self.shared:
+            os.chmod(path, os.stat(path).st_mode | bits)
+
+    def key(self, target, sess) -> str:
+        """
+        Returns the cache key of target.
+
+        Raises:
+            CacheKeyError: If a constructor parameter of the block has no
+                deterministic representation.
+        """
+        block = target.block
+        h = hashlib.sha256()
+        code_digest(target.func.__code__, h)
+        args, kwargs = getattr(block, "_init_args", ((), {}))
+        deps = {}
+        for key, tid in target.resolve_requires():
+            stable = Result()
+            # Arrays are represented by the digest of their content.
+            stable._attrs.update((k, v) for k, v in sess.get_result(tid).attrs.items()
+                if k not in volatile_attrs)
+            # The standard library codec is used regardless of the codec of
+            # the session, so that keys do not depend on installed packages.
+            deps[key] = stable.json(sess, tid.block_id, tid.task_id, indent=None,
+                sort_keys=True, codec=StdlibCodec())
+        h.update(canonical_json({
+            "python": list(sys.version_info[:2]),
+            "block_id": block.id,
+            "task_id": target.id,
+            "class": f"{type(block).__module__}.{type(block).__qualname__}",
+            "args": args,
+            "kwargs": kwargs,
+            "deps": deps,
+        }).encode())
+        return h.hexdigest()
+
+    def entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def touch(self, entry: Path):
+        """
+        Records use of entry for LRU eviction.
+        """
+        try:
+            (entry / "last_used").touch()
+        except OSError:
+            # E.g. entry was published by another user.
+            pass
+
+    def restore(self, key: str, cwd: Path) -> str:
+        """
+        Copies the cached output files into cwd, which must be empty.
+
+        Returns:
+            Result JSON string, or None if key is not in the cache.
+        """
+        entry = self.entry_dir(key)
+        try:
+            with open(entry / self.manifest_name, "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        try:
+            for rel in manifest["dirs"]:
+                (cwd / rel).mkdir(exist_ok=True)
+            for rel, link in manifest["links"].items():
+                os.symlink(link, cwd / rel)
+            for rel, digest in manifest["files"].items():
+                if copy_hashed(entry / "files" / rel, cwd / rel)[0] != digest:
+                    raise CacheIntegrityError(f"{entry / 'files' / rel} is corrupt.")
+            with open(entry / "result.json", "rb") as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != manifest["result"]:
+                raise CacheIntegrityError(f"{entry / 'result.json'} is corrupt.")
+        except (OSError, CacheIntegrityError) as e:
+            # Entry was evicted while copying, or is corrupt.
+            shutil.rmtree(cwd, ignore_errors=True)
+            cwd.mkdir()
+            if isinstance(e, CacheIntegrityError):
+                self.discard(entry)
+            return None
+        self.touch(entry)
+        return data.decode("utf-8")
+
+    def store(self, key: str, cwd: Path, json_str: str):
+        """
+        Adds the output files in cwd and the result JSON string to the cache.
+
+        Raises:
+            OSError: If the entry cannot be written or published, e.g. due to
+                missing permissions in a shared cache.
+        """
+        entry = self.entry_dir(key)
+        if entry.exists():
+            self.touch(entry)
+            return
+        tmp_dir = self.cache_dir / "tmp" / f"{key}.{os.urandom(16).hex()}"
+        try:
+            self.assemble(tmp_dir, key, cwd, json_str)
+            self.make_dir(entry.parent)
+            try:
+                os.rename(tmp_dir, entry)
+            except OSError:
+                if not entry.exists():
+                    raise
+                # Entry was published concurrently.
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def assemble(self, tmp_dir: Path, key: str, cwd: Path, json_str: str):
+        """
+        Writes the entry for the output files in cwd and the result JSON
+        string to tmp_dir.
+        """
+        manifest = {"key": key, "dirs": [], "links": {}, "files": {}, "size": 0}
+        for root, dirs, files in os.walk(cwd):
+            root = Path(root)
+            rel_root = root.relative_to(cwd)
+            self.make_dir(tmp_dir / "files" / rel_root)
+            for name in dirs:
+                if (root / name).is_symlink():
+                    # os.walk lists symlinks to directories in dirs.
+                    files.append(name)
+                else:
+                    manifest["dirs"].append(str(rel_root / name))
+            for name in files:
+                rel = str(rel_root / name)
+                if (root / name).is_symlink():
+                    manifest["links"][rel] = os.readlink(root / name)
+                else:
+                    digest, size = copy_hashed(root / name, tmp_dir / "files" / rel)
+                    self.share(tmp_dir / "files" / rel, stat.S_IRGRP)
+                    manifest["files"][rel] = digest
+                    manifest["size"] += size
+        data = json_str.encode("utf-8")
+        with open(tmp_dir / "result.json", "wb") as f:
+            f.write(data)
+        manifest["result"] = hashlib.sha256(data).hexdigest()
+        manifest["size"] += len(data)
+        with open(tmp_dir / self.manifest_name, "w") as f:
+            json.dump(manifest, f)
+        (tmp_dir / "last_used").touch()
+        self.share(tmp_dir / "result.json", stat.S_IRGRP)
+        self.share(tmp_dir / self.manifest_name, stat.S_IRGRP)
+        # Other users record the use of the entry by touching last_used.
+        self.share(tmp_dir / "last_used", stat.S_IRGRP | stat.S_IWGRP)
+
+    def discard(self, entry: Path) -> bool:
+        """
+        Removes entry from the cache.
+
+        Returns:
+            False if entry could not be removed, e.g. because it was removed
+            concurrently or belongs to another user.
+        """
+        trash_dir = self.cache_dir / "trash"
+        trash = trash_dir / os.urandom(16).hex()
+        try:
+            self.make_dir(trash_dir)
+            os.rename(entry, trash)
+        except OSError:
+            return False
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """
+        Returns:
+            List of tuples (time of last use, size, entry directory) for
+            all published entries.
+        """
+        entries = []
+        for prefix_dir in self.cache_dir.glob("[0-9a-f][0-9a-f]"):
+            for entry in prefix_dir.iterdir():
+                try:
+                    with open(entry / self.manifest_name, "r") as f:
+                        size = json.load(f)["size"]
+                    last_used = (entry / "last_used").stat().st_mtime
+                except (OSError, ValueError, KeyError):
+                    continue
+                entries.append((last_used, size, entry))
+        return entries
+
+    def evict(self):
+        """
+        Removes least recently used entries until the total size of the cache
+        is within size_limit. If another process is already evicting entries,
+        nothing is done.
+        """
+        if self.size_limit is None:
+            return
+        self.make_dir(self.cache_dir)
+        lock_path = self.cache_dir / "evict.lock"
+        created = not lock_path.exists()
+        with open(lock_path, "a") as lock_file:
+            if created:
+                self.share(lock_path, stat.S_IRGRP | stat.S_IWGRP)
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            self.remove_stale_tmp()
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in entries:
+                if total <= self.size_limit:
+                    break
+                if self.discard(entry):
+                    total -= size
+
+    def remove_stale_tmp(self):
+        """
+        Removes temporary directories left behind by crashed processes.
+        """
+        for tmp_dir in (self.cache_dir / "tmp").glob("*"):
+            try:
+                age = time.time() - tmp_dir.stat().st_mtime
+            except OSError:
+                continue
+            if age > self.tmp_max_age:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -5,22 +5,67 @@ import sys
 import os
 from pathlib import Path
 
-try:
-    import argcomplete
-except:
-    argcomplete = None
-
 import argparse
 
 from .errors import ResultRequired
 from .ansiterm import ANSITerm, NoColor
 from .target import TargetId
-from .monitor import monitor
+from .resources import parse_resources
 
 class CLI:
     def __init__(self, flow):
         self.flow = flow
 
+    @staticmethod
+    def is_status_query(args: list[str]) -> bool:
+        """
+        Returns True if args only request the status table, i.e. the query
+        can be answered from a FlowSnapshot without importing the flow.
+        """
+        parsed = CLI.parse_query(args)
+        if parsed is None:
+            return False
+        if parsed.task or (parsed.block and '.' in parsed.block):
+            return False
+        return True
+
+    @staticmethod
+    def is_daemon_query(args: list[str]) -> bool:
+        """
+        Returns True if args request the status table or a dry-run build
+        plan, which can be answered by the daemon (flow --daemon).
+        """
+        parsed = CLI.parse_query(args)
+        if parsed is None:
+            return False
+        return parsed.dry_run or not (parsed.task or (parsed.block and '.' in parsed.block))
+
+    @staticmethod
+    def parse_query(args: list[str]) -> argparse.Namespace:
+        """
+        Parses args of a command that does not write any files.
+
+        Returns:
+            Parsed arguments, or None if args are invalid, request help or
+            might change the build directory or write a trace.
+        """
+        if ("-h" in args) or ("--help" in args) or (args[:1] == ["worker"]):
+            return None
+        parser = CLI(None).create_parser("flow")
+        def error(message):
+            # Invalid args are reported by the CLI that runs the command.
+            # ArgumentParser(exit_on_error=False) would still print some
+            # errors and requires Python 3.9.
+            raise argparse.ArgumentError(None, message)
+        parser.error = error
+        try:
+            parsed, unknown = parser.parse_known_args(args)
+        except (argparse.ArgumentError, SystemExit):
+            return None
+        if unknown or parsed.clean or parsed.monitor or parsed.daemon or parsed.trace:
+            return None
+        return parsed
+
     def create_parser(self, prog):
 
         def block_completer(prefix, parsed_args, **kwargs):
@@ -51,11 +96,25 @@ class CLI:
         parser.add_argument("--rebuild-dependencies", "-R", action="store_true",
             help="Re-build all dependencies, even if flow results were found.")
         parser.add_argument("--dry-run", "-d", action="store_true",
-            help="Print but do not run build plan.")
+            help="Print but do not run build plan. The estimated duration and critical path of the plan are printed, too.")
+        parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+            help="Run up to N independent targets concurrently. Console output of targets is prefixed with the target name, except output that subprocesses write directly to the terminal (use Block.run_tool to echo tool output with prefix).")
+        parser.add_argument("--resources", metavar="SPEC",
+            help="Resource pool for parallel builds, e.g. cpus=16,mem_gb=64,license:innovus=1. Overrides the resource pool of the flow.")
+        parser.add_argument("--executor", choices=["local", "workers", "slurm"], default="local",
+            help="Run targets in this process (local), publish them for worker processes started with 'flow worker' on hosts sharing the build directory (workers), or submit them as Slurm batch jobs (slurm).")
+        parser.add_argument("--no-cache", action="store_true",
+            help="Do not restore or store outputs of cached tasks.")
+        parser.add_argument("--no-compress", action="store_true",
+            help="Do not compress outputs of tasks declared with @task(compress=...).")
+        parser.add_argument("--trace", metavar="FILE",
+            help="Write trace of the build in Chrome trace event format to FILE.")
         parser.add_argument("--clean", "-c", action="store_true",
             help="Remove flow results.")
         parser.add_argument("--monitor", "-M", action="store_true",
             help="Continuously monitor build directory for changes. A message is printed whenever a new target build is started or finished.")
+        parser.add_argument("--daemon", action="store_true",
+            help="Keep the flow imported and serve status queries and dry runs of subsequent flow commands in this directory. The flow is imported again when its sources change.")
         parser.add_argument("--hidden", "-a", action="store_true",
             help="Show hidden target.")
         parser.add_argument("--no-color", "-n", action="store_true",
@@ -65,8 +124,14 @@ class CLI:
         parser.add_argument("block", nargs='?').completer = block_completer
         parser.add_argument("task", nargs='?').completer = task_completer
 
-        if argcomplete:
-            argcomplete.autocomplete(parser, always_complete_options=False)
+        if "_ARGCOMPLETE" in os.environ:
+            # Only import argcomplete when invoked for shell completion.
+            try:
+                import argcomplete
+            except ImportError:
+                pass
+            else:
+                argcomplete.autocomplete(parser, always_complete_options=False)
         return parser
 
     def main(self, args: list[str], prog: str):
@@ -78,8 +143,25 @@ class CLI:
         if len(self.flow.blocks) < 1:
             raise SystemExit("No blocks defined. Please define at least one block.")
 
+        if args[:1] == ["worker"]:
+            self.worker_main(args[1:], prog)
+            return
+
         self.args = self.create_parser(prog).parse_args(args)
 
+        if self.args.daemon:
+            raise SystemExit("--daemon must be used with the flow command.")
+
+        if self.args.jobs < 1:
+            raise SystemExit("--jobs must be at least 1.")
+
+        self.resources = None
+        if self.args.resources:
+            try:
+                self.resources = parse_resources(self.args.resources)
+            except ValueError as e:
+                raise SystemExit(str(e))
+
         if self.args.no_color or not sys.stdout.isatty():
             self.color = NoColor
         else:
@@ -96,11 +178,77 @@ class CLI:
         elif self.args.no_dependencies:
             self.build_dependencies = None
 
-        self.sess = self.flow.session_at(Path(self.args.build_dir))
+        tracer = None
+        if self.args.trace:
+            from .trace import Tracer
+            tracer = Tracer()
+        try:
+            self.run_command(tracer)
+        finally:
+            if tracer:
+                tracer.write(self.args.trace)
+
+    def worker_main(self, args: list[str], prog: str):
+        parser = argparse.ArgumentParser(
+            description='Run targets published by flow --executor workers, or a single target of a batch job.',
+            prog=f"{prog} worker",
+        )
+        parser.add_argument("--build-dir", "-B", default=str(Path.cwd() / "build"),
+            help="Shared build directory")
+        parser.add_argument("--idle-exit", type=float, metavar="SECONDS",
+            help="Exit after SECONDS without targets to run.")
+        parser.add_argument("--run", metavar="TARGET",
+            help="Run only TARGET (block.task), assuming its dependencies were built, and exit.")
+        parser.add_argument("--status-dir", metavar="DIR",
+            help="With --run, write status file of TARGET to DIR.")
+        parser.add_argument("--if-missing", action="store_true",
+            help="With --run, do not build TARGET if its result exists.")
+        parser.add_argument("--no-cache", action="store_true",
+            help="Do not restore or store outputs of cached tasks.")
+        parser.add_argument("--no-compress", action="store_true",
+            help="Do not compress outputs of tasks declared with @task(compress=...).")
+        parser.add_argument("--no-color", "-n", action="store_true",
+            help="Do not color output.")
+        args = parser.parse_args(args)
+
+        from .workers import Worker
+        sess = self.flow.session_at(Path(args.build_dir))
+        if args.no_cache:
+            sess.cache = None
+        if args.no_compress:
+            sess.compressor = None
+        color = NoColor if (args.no_color or not sys.stdout.isatty()) else ANSITerm
+        if args.run:
+            block_id, _, task_id = args.run.partition('.')
+            tid = TargetId(block_id, task_id)
+            if not self.flow.has_target(tid):
+                raise SystemExit(f"Target '{tid}' not found.")
+            error = Worker(sess, color=color).run_target(tid, if_missing=args.if_missing)
+            if args.status_dir:
+                from .batch import write_status
+                write_status(Path(args.status_dir), tid, error)
+            if error:
+                sys.exit(1)
+            return
+        try:
+            Worker(sess, color=color).run(idle_exit=args.idle_exit)
+        except KeyboardInterrupt:
+            pass
+
+    def open_session(self, build_dir: Path, tracer=None):
+        return self.flow.session_at(build_dir, tracer=tracer)
+
+    def run_command(self, tracer):
+        self.sess = self.open_session(Path(self.args.build_dir), tracer=tracer)
+        if self.args.no_cache:
+            self.sess.cache = None
+        if self.args.no_compress:
+            self.sess.compressor = None
 
         if self.args.monitor:
             if self.args.block != None:
                 raise SystemExit("Cannot specify --monitor together with block/task.")
+            from .monitor import monitor
             monitor(self.sess)
             return
 
@@ -129,8 +277,11 @@ class CLI:
             print(r)
         else:
             print(f"{self.color.FgBrightBlue}PyDesignFlow Build Plan:{self.color.Reset}\n{p}\n")
-            if not self.args.dry_run:
-                p.run(color=self.color)
+            if self.args.dry_run:
+                print(p.schedule().summary(jobs=self.args.jobs, resources=self.resources))
+            else:
+                p.run(color=self.color, jobs=self.args.jobs, resources=self.resources,
+                    executor=self.args.executor)
 
     def print_status(self):
         if self.args.no_dependencies:
@@ -0,0 +1,191 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compression of task outputs after a target has finished.
+
+Tasks select outputs to compress with glob patterns relative to their
+directory (@task(compress=["*.log", "reports/**/*.rpt"])). When the task
+function has returned, matching files are compressed by a pool of threads
+and replaced by <name>.zst or <name>.gz. Files that do not get smaller are
+kept as they are. The number of compressed files and the sizes before and
+after compression are recorded in the Result (result.compression).
+
+Paths stored in Results keep referring to the uncompressed names.
+open_output opens such a path, decompressing the compressed form
+transparently.
+
+zstd is used if the zstandard package is installed, otherwise gzip.
+"""
+
+import os
+import gzip
+import shutil
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+class GzipCompressor:
+    """
+    Compressor using the gzip module of the standard library.
+    """
+    name = "gzip"
+    suffix = ".gz"
+
+    def __init__(self, level: int=6):
+        self.level = level
+
+    def compress(self, src: Path, dst: Path):
+        with open(src, "rb") as fin, gzip.open(dst, "wb", compresslevel=self.level) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+
+    def open(self, path: Path, mode: str="rb", **kwargs):
+        return gzip.open(path, mode, **kwargs)
+
+class ZstdCompressor:
+    """
+    Compressor using the zstandard package.
+    """
+    name = "zstd"
+    suffix = ".zst"
+
+    def __init__(self, level: int=3):
+        import zstandard
+        self.zstandard = zstandard
+        self.level = level
+
+    def compress(self, src: Path, dst: Path):
+        cctx = self.zstandard.ZstdCompressor(level=self.level)
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            cctx.copy_stream(fin, fout, size=os.fstat(fin.fileno()).st_size)
+
+    def open(self, path: Path, mode: str="rb", **kwargs):
+        return self.zstandard.open(path, mode, **kwargs)
+
+compressors = {
+    "zstd": ZstdCompressor,
+    "gzip": GzipCompressor,
+}
+
+suffixes = {
+    ".zst": "zstd",
+    ".gz": "gzip",
+}
+
+def get_compressor(name: str=None):
+    """
+    Returns compressor by name ("zstd" or "gzip"). Without name, the
+    environment variable PYDESIGNFLOW_COMPRESSION selects the compressor. If
+    it is not set, zstd is used if zstandard is installed.
+    """
+    name = name or os.environ.get("PYDESIGNFLOW_COMPRESSION")
+    if name:
+        try:
+            cls = compressors[name]
+        except KeyError:
+            raise ValueError(f"Unknown compression \"{name}\".") from None
+        return cls()
+    try:
+        return ZstdCompressor()
+    except ImportError:
+        return GzipCompressor()
+
+def output_path(path: Path) -> Path:
+    """
+    Returns path if it exists, otherwise its compressed form.
+
+    Raises:
+        FileNotFoundError: If neither exists.
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    for suffix in suffixes:
+        compressed = path.with_name(path.name + suffix)
+        if compressed.exists():
+            return compressed
+    raise FileNotFoundError(f"No such file: '{path}'")
+
+def open_output(path: Path, mode: str="r", **kwargs):
+    """
+    Opens an output file of a task for reading, like open(). If the file
+    was compressed (@task(compress=...)), its compressed form is opened and
+    decompressed transparently.
+
+    Example::
+
+        with open_output(syn.timing_report) as f:
+            report = f.read()
+    """
+    if any(c in mode for c in "wax+"):
+        raise ValueError("open_output only opens files for reading.")
+    actual = output_path(path)
+    if actual == Path(path):
+        return open(actual, mode, **kwargs)
+    compressor = compressors[suffixes[actual.suffix]]()
+    if "b" not in mode and "t" not in mode:
+        mode += "t"
+    return compressor.open(actual, mode, **kwargs)
+
+def select_outputs(cwd: Path, patterns: list[str]) -> list[Path]:
+    """
+    Returns regular files in cwd matching any of the glob patterns, except
+    result files and files that are compressed already.
+    """
+    selected = set()
+    for pattern in patterns:
+        for path in cwd.glob(pattern):
+            if path.is_symlink() or not path.is_file():
+                continue
+            if path.suffix in suffixes or path.name.startswith("result."):
+                continue
+            selected.add(path)
+    return sorted(selected)
+
+def compress_outputs(cwd: Path, patterns: list[str], compressor, workers: int=None) -> dict:
+    """
+    Compresses the outputs of a task in cwd matching patterns.
+
+    Args:
+        workers: Number of compression threads, defaults to the number of
+            CPUs (at most 8).
+
+    Returns:
+        Dictionary with the compressor name, the number of compressed files
+        and their total size before and after compression in bytes.
+    """
+    def compress(path: Path) -> tuple[int, int]:
+        dst = path.with_name(path.name + compressor.suffix)
+        tmp = dst.with_name(dst.name + ".tmp")
+        compressor.compress(path, tmp)
+        size_in = os.stat(path).st_size
+        size_out = os.stat(tmp).st_size
+        if size_out >= size_in:
+            os.unlink(tmp)
+            return None
+        shutil.copystat(path, tmp)
+        os.replace(tmp, dst)
+        os.unlink(path)
+        return size_in, size_out
+
+    files = select_outputs(cwd, patterns)
+    workers = workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(workers) as pool:
+        sizes = [s for s in pool.map(compress, files) if s]
+    return {
+        "codec": compressor.name,
+        "files": len(sizes),
+        "bytes_in": sum(s[0] for s in sizes),
+        "bytes_out": sum(s[1] for s in sizes),
+    }
+
+def format_size(size: int) -> str:
+    """
+    Formats size in bytes, e.g. "12.3 GiB".
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
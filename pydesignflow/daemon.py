@@ -0,0 +1,274 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Daemon that keeps a flow imported between invocations of the flow command.
+
+``flow --daemon`` imports the flow once and listens on a Unix socket. The
+flow command forwards status queries and dry-run plans (see
+CLI.is_daemon_query) to the daemon, which answers them using the imported
+Flow, its dependency graph and BuildSessions that are kept in memory. The
+output of the command is sent back to the client, which prints it. All
+other commands, e.g. builds, run in the client process as before.
+
+Before each request, the daemon checks the modification times of the flow
+sources and imports the flow again if they have changed. BuildSessions are
+reloaded from the result index when the index or the build directory has
+changed, e.g. because a target was built by another process.
+
+The daemon serves one request at a time. It uses the environment variables
+that were set when it was started.
+"""
+
+import io
+import os
+import sys
+import json
+import socket
+import hashlib
+import traceback
+from pathlib import Path
+from contextlib import redirect_stdout, redirect_stderr
+
+from .cli import CLI
+from .paths import default_cache_dir
+from .index import dir_mtime
+from .schedule import DurationHistory
+
+def socket_path(base_dir: Path) -> Path:
+    """
+    Returns the location of the socket of the daemon for the flow in
+    base_dir.
+    """
+    digest = hashlib.sha256(str(base_dir.resolve()).encode()).hexdigest()[:16]
+    return default_cache_dir() / "daemon" / f"{digest}.sock"
+
+def recv_all(conn) -> bytes:
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+# Seconds after which a client stops waiting for the daemon, e.g. when it
+# is stopped or busy importing the flow, and runs the command itself.
+request_timeout = 10.0
+
+def request(base_dir: Path, args: list[str], isatty: bool) -> dict:
+    """
+    Sends a command to the daemon of the flow in base_dir.
+
+    Returns:
+        Reply with the keys "stdout", "stderr" and "exit", or None if no
+        daemon is running, the daemon does not reply within request_timeout
+        or cannot answer the command. In this case, the command must be run
+        by the caller.
+    """
+    path = socket_path(base_dir)
+    if not path.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(request_timeout)
+            conn.connect(str(path))
+            conn.sendall(json.dumps({"args": args, "isatty": isatty}).encode("utf-8"))
+            conn.shutdown(socket.SHUT_WR)
+            reply = json.loads(recv_all(conn))
+    except (OSError, ValueError):
+        return None
+    if reply.get("fallback"):
+        return None
+    return reply
+
+class CapturedOutput(io.StringIO):
+    """
+    Output stream of a request, which reports the terminal state of the
+    client.
+    """
+    def __init__(self, isatty: bool):
+        super().__init__()
+        self._isatty = isatty
+
+    def isatty(self):
+        return self._isatty
+
+class WarmSession:
+    """
+    BuildSession kept by the daemon, with the state of the build directory
+    when its results were loaded.
+    """
+    def __init__(self, sess):
+        self.sess = sess
+        self.cache = sess.cache
+        self.compressor = sess._compressor # Not created if unused
+        self.key = self.state_key()
+
+    def state_key(self) -> tuple:
+        sess = self.sess
+        try:
+            st = os.stat(sess.index.path)
+            index_key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            index_key = None
+        build_dir = sess.build_dir
+        return (index_key, dir_mtime(build_dir)) \
+            + tuple(dir_mtime(build_dir / block_id) for block_id in sess.flow)
+
+    def refresh(self):
+        """
+        Reloads the results if the build directory has changed and resets
+        the session state that a command may have modified.
+        """
+        sess = self.sess
+        key = self.state_key()
+        if key != self.key:
+            sess.reload_results()
+            # The index may have been rewritten by reload_results.
+            self.key = self.state_key()
+        sess.cache = self.cache
+        sess._compressor = self.compressor
+        sess.durations = DurationHistory(sess.durations.path)
+
+class FlowDaemon:
+    """
+    Serves commands of the flow in base_dir on a Unix socket.
+
+    Args:
+        base_dir: Directory of the flow (flow.py or flow/__init__.py).
+        import_flow: Function that imports the flow module from the current
+            working directory (see shortcut.import_flow).
+    """
+    def __init__(self, base_dir: Path, import_flow):
+        self.base_dir = base_dir.resolve()
+        self.import_flow = import_flow
+        self.socket_path = socket_path(base_dir)
+        self.flow = None
+        self.sources = {} # filename -> mtime_ns
+        self.sessions = {} # build directory -> WarmSession
+
+    def message(self, text):
+        print(f"[PyDesignFlow daemon] {text}")
+        sys.stdout.flush()
+
+    def load(self):
+        """
+        Imports the flow, removing previously imported flow modules first.
+        """
+        from .snapshot import FlowSnapshot, save_snapshot
+        for name, module in list(sys.modules.items()):
+            filename = getattr(module, "__file__", None)
+            if filename and self.base_dir in Path(filename).resolve().parents:
+                del sys.modules[name]
+        self.flow = None
+        self.sessions = {}
+        self.flow = self.import_flow().flow
+        self.sources = FlowSnapshot.from_flow(self.flow, self.base_dir).sources
+        save_snapshot(self.flow, self.base_dir)
+
+    def flow_current(self) -> bool:
+        if (self.flow is None) or not self.sources:
+            return False
+        for filename, mtime in self.sources.items():
+            try:
+                if os.stat(filename).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def session_at(self, build_dir: Path, tracer=None):
+        if tracer:
+            # Sessions with tracer are not kept.
+            return self.flow.session_at(build_dir, tracer)
+        key = str(build_dir.resolve())
+        warm = self.sessions.get(key)
+        if warm is None:
+            warm = WarmSession(self.flow.session_at(build_dir))
+            self.sessions[key] = warm
+        else:
+            warm.refresh()
+        return warm.sess
+
+    def handle(self, req: dict) -> dict:
+        args = req["args"]
+        if not CLI.is_daemon_query(args):
+            return {"fallback": True}
+        if not self.flow_current():
+            try:
+                self.message("Importing flow.")
+                self.load()
+            except Exception:
+                # The client imports the flow itself and reports the error.
+                self.message(f"Import failed:\n{traceback.format_exc()}")
+                self.flow = None
+                return {"fallback": True}
+        stdout = CapturedOutput(req.get("isatty", False))
+        stderr = CapturedOutput(req.get("isatty", False))
+        code = 0
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                DaemonCLI(self).main(args, "flow")
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+                    code = 1
+                else:
+                    code = e.code or 0
+            except Exception:
+                traceback.print_exc()
+                code = 1
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit": code}
+
+    def bind(self) -> socket.socket:
+        path = self.socket_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                    conn.connect(str(path))
+            except OSError:
+                os.unlink(path) # Left behind by a daemon that was killed.
+            else:
+                raise SystemExit(f"A daemon is already serving the flow in {self.base_dir}.")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(str(path))
+        sock.listen(16)
+        return sock
+
+    def serve(self):
+        """
+        Serves requests until interrupted.
+        """
+        self.load()
+        sock = self.bind()
+        self.message(f"Serving flow in {self.base_dir} on {self.socket_path}.")
+        try:
+            while True:
+                conn, _ = sock.accept()
+                with conn:
+                    try:
+                        req = json.loads(recv_all(conn))
+                        reply = self.handle(req)
+                        conn.sendall(json.dumps(reply).encode("utf-8"))
+                    except (OSError, ValueError):
+                        pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+class DaemonCLI(CLI):
+    """
+    CLI that uses the flow and the BuildSessions of a FlowDaemon.
+    """
+    def __init__(self, daemon: FlowDaemon):
+        super().__init__(daemon.flow)
+        self.daemon = daemon
+
+    def open_session(self, build_dir: Path, tracer=None):
+        return self.daemon.session_at(build_dir, tracer)
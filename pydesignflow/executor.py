@@ -0,0 +1,313 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Concurrent execution of BuildPlans.
+"""
+
+import sys
+import time
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+from .ansiterm import NoColor
+from .schedule import format_duration
+from .target import TargetId
+from .resources import ResourcePool
+
+class PrefixedOutput:
+    """
+    Replacement for sys.stdout / sys.stderr during parallel builds.
+
+    Text written from a thread that runs a target is split into lines, and
+    each complete line is written to the underlying stream prefixed with the
+    target name. This keeps lines of concurrently running targets from being
+    mixed up. Text written from other threads is passed through unchanged.
+
+    Output that subprocesses write directly to file descriptor 1 or 2 does
+    not pass through sys.stdout and is therefore not prefixed. Block.run_tool
+    echoes the output of tools through sys.stdout.
+    """
+    def __init__(self, stream, lock):
+        self.stream = stream
+        self.lock = lock
+        self.local = threading.local()
+
+    def begin(self, prefix):
+        self.local.prefix = prefix
+        self.local.buf = ""
+
+    def end(self):
+        if self.local.buf:
+            self._write_lines([self.local.buf])
+        self.local.prefix = None
+        self.local.buf = ""
+
+    def _write_lines(self, lines):
+        with self.lock:
+            for line in lines:
+                self.stream.write(f"{self.local.prefix}{line}\n")
+            self.stream.flush()
+
+    def write(self, s):
+        if getattr(self.local, "prefix", None) is None:
+            with self.lock:
+                self.stream.write(s)
+            return len(s)
+        *lines, self.local.buf = (self.local.buf + s).split("\n")
+        if lines:
+            self._write_lines(lines)
+        return len(s)
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def isatty(self):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class Executor:
+    """
+    Base class of executors, which run the targets of a BuildPlan.
+
+    Subclasses implement run(), which returns when all targets of the plan
+    have finished and raises an exception if a target failed. Executors are
+    selected with BuildPlan.run(executor=...) by name (see executor_class)
+    or by passing a subclass.
+
+    Args:
+        plan: BuildPlan
+        color: NoColor or ANSITerm
+        jobs: Maximum number of targets that run concurrently, if the
+            executor limits concurrency.
+        resources: Resource pool entries that override the resource pool of
+            the flow, if the executor does admission control.
+    """
+    def __init__(self, plan, color=NoColor, jobs: int=1, resources: dict=None):
+        self.plan = plan
+        self.sess = plan.sess
+        self.color = color
+        self.jobs = jobs
+        self.resources = resources
+
+    def plan_edges(self) -> tuple[dict, dict]:
+        """
+        Returns dependency edges between the targets of the plan.
+        Requirements outside the plan are satisfied by results that are
+        already present.
+
+        Returns:
+            Tuple of a dictionary mapping each TargetId to the set of its
+            requirements in the plan, and a dictionary mapping each TargetId
+            to the list of targets in the plan that require it.
+        """
+        graph = self.sess.flow.graph()
+        in_plan = set(self.plan.target_sequence)
+        deps = {}
+        dependents = {tid: [] for tid in self.plan.target_sequence}
+        for tid in self.plan.target_sequence:
+            deps[tid] = {graph.tids[d] for d in graph.deps[graph.index[tid]]} & in_plan
+            for dep in deps[tid]:
+                dependents[dep].append(tid)
+        return deps, dependents
+
+    def message(self, text):
+        style = self.color.FgBrightBlue
+        reset = self.color.Reset
+        print(f"{style}[PyDesignFlow]{reset} {text}")
+        sys.stdout.flush()
+
+    def run(self):
+        raise NotImplementedError()
+
+def executor_class(name: str) -> type:
+    """
+    Returns Executor subclass by name: "local" (ParallelExecutor), "workers"
+    (WorkerPoolExecutor) or "slurm" (SlurmExecutor).
+    """
+    if name == "local":
+        return ParallelExecutor
+    elif name == "workers":
+        from .workers import WorkerPoolExecutor
+        return WorkerPoolExecutor
+    elif name == "slurm":
+        from .batch import SlurmExecutor
+        return SlurmExecutor
+    raise ValueError(f"Unknown executor \"{name}\".")
+
+class ParallelExecutor(Executor):
+    """
+    Runs the targets of a BuildPlan, starting every target whose
+    dependencies have finished, with up to jobs targets running at a time.
+
+    If a target fails, no further targets are started. Targets that are
+    already running are allowed to finish, then the exception of the first
+    failed target is re-raised.
+
+    When more targets are ready than can be started, the targets with the
+    longest estimated remaining path (see Schedule) are started first.
+
+    A target is only started when the resources it declares
+    (@task(resources=...)) are available in the resource pool of the flow.
+    If a target has to wait for resources, targets with lower priority that
+    use the same resources are held back as well. The time each target
+    waited after its dependencies had finished is reported when it starts.
+
+    With jobs=1, targets run in the calling thread in the order of
+    plan.target_sequence. Otherwise, each target runs in a daemon thread. If
+    the build is interrupted (KeyboardInterrupt), no further targets are
+    started and run() waits for the running targets before re-raising the
+    KeyboardInterrupt. Tools started by the targets receive the interrupt
+    from the terminal as well. A second KeyboardInterrupt stops waiting.
+    """
+    def __init__(self, plan, color=NoColor, jobs: int=1, resources: dict=None):
+        if jobs < 1:
+            raise ValueError("jobs must be at least 1.")
+        super().__init__(plan, color, jobs, resources)
+        self.lock = threading.RLock()
+
+        capacity = dict(self.sess.flow.resources)
+        capacity.update(resources or {})
+        self.pool = ResourcePool(capacity)
+        self.requests = {}
+        for tid in plan.target_sequence:
+            self.requests[tid] = self.sess.flow.target(tid).resources
+            self.pool.check(tid, self.requests[tid])
+        self.time_ready = {}
+        self.queue_times = {} # TargetId -> seconds waited after becoming ready
+
+        self.order = {tid: idx for idx, tid in enumerate(plan.target_sequence)}
+        deps, self.dependents = self.plan_edges()
+        self.pending_deps = {tid: len(d) for tid, d in deps.items()}
+        self.priority = None
+        if jobs > 1:
+            self.priority = plan.schedule().priority
+
+    def ready_entry(self, tid: TargetId) -> tuple:
+        # Sort key of ready targets: longest remaining path first, then plan order.
+        return (-self.priority[tid], self.order[tid], tid)
+
+    def message(self, text):
+        with self.lock:
+            super().message(text)
+
+    def run_target(self, tid: TargetId):
+        target = self.sess.flow.target(tid)
+        with self.sess.tracer.span(str(tid), cat="target"):
+            target.run(self.sess, if_missing=self.plan.if_missing(tid))
+
+    def run_target_prefixed(self, tid: TargetId):
+        prefix = f"[{tid}] "
+        sys.stdout.begin(prefix)
+        sys.stderr.begin(prefix)
+        try:
+            self.run_target(tid)
+        finally:
+            sys.stdout.end()
+            sys.stderr.end()
+
+    def start_target(self, tid: TargetId, future: Future):
+        """
+        Runs tid in a new daemon thread and sets the result of future when
+        it has finished. The number of threads is limited by run_parallel.
+        """
+        future.set_running_or_notify_cancel()
+        def body():
+            try:
+                self.run_target_prefixed(tid)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(None)
+        threading.Thread(target=body, name=f"target {tid}", daemon=True).start()
+
+    def run(self):
+        if self.jobs == 1:
+            self.run_sequential()
+        else:
+            stdout, stderr = sys.stdout, sys.stderr
+            sys.stdout = PrefixedOutput(stdout, self.lock)
+            sys.stderr = PrefixedOutput(stderr, self.lock)
+            try:
+                self.run_parallel()
+            finally:
+                sys.stdout, sys.stderr = stdout, stderr
+
+    def run_sequential(self):
+        for tid in self.plan.target_sequence:
+            self.message(f"Running target {tid}.")
+            self.run_target(tid)
+            self.message(f"Finished target {tid}.")
+
+    def make_ready(self, ready: list, tid: TargetId):
+        ready.append(self.ready_entry(tid))
+        self.time_ready[tid] = time.monotonic()
+
+    def start_message(self, tid: TargetId) -> str:
+        queued = time.monotonic() - self.time_ready[tid]
+        self.queue_times[tid] = queued
+        if queued < 0.1:
+            return f"Running target {tid}."
+        elif queued < 60:
+            return f"Running target {tid} (queued {queued:.1f}s)."
+        else:
+            return f"Running target {tid} (queued {format_duration(queued)})."
+
+    def run_parallel(self):
+        ready = []
+        for tid, count in self.pending_deps.items():
+            if count == 0:
+                self.make_ready(ready, tid)
+        running = {}
+        failures = []
+        finished = 0
+
+        try:
+            while ready or running:
+                if ready and not failures:
+                    ready.sort()
+                    candidates = [(entry, self.requests[entry[-1]]) for entry in ready]
+                    for entry in self.pool.admit(candidates, self.jobs - len(running)):
+                        ready.remove(entry)
+                        tid = entry[-1]
+                        self.message(self.start_message(tid))
+                        # Registered before the thread starts, so that an
+                        # interrupt cannot miss it.
+                        future = Future()
+                        running[future] = tid
+                        self.start_target(tid, future)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: self.order[running[f]]):
+                    tid = running.pop(future)
+                    self.pool.release(self.requests[tid])
+                    exc = future.exception()
+                    if exc:
+                        self.message(f"Failed target {tid}: {exc!r}")
+                        failures.append(exc)
+                        continue
+                    finished += 1
+                    self.message(f"Finished target {tid}.")
+                    for dependent in self.dependents[tid]:
+                        self.pending_deps[dependent] -= 1
+                        if self.pending_deps[dependent] == 0:
+                            self.make_ready(ready, dependent)
+        except KeyboardInterrupt:
+            if running:
+                names = ", ".join(str(tid) for tid in sorted(running.values(), key=self.order.get))
+                self.message(f"Interrupted, waiting for running target(s) {names}. Interrupt again to stop waiting.")
+                try:
+                    wait(running)
+                except KeyboardInterrupt:
+                    self.message("Interrupted again, not waiting for running targets.")
+            raise
+
+        if failures:
+            skipped = len(self.plan.target_sequence) - finished - len(failures)
+            if skipped > 0:
+                self.message(f"{skipped} target(s) not run due to failure.")
+            raise failures[0]
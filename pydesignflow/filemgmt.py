@@ -11,7 +11,17 @@ the core PyDesignFlow functionality.
 
 from pathlib import Path
 from dataclasses import dataclass
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+import os
 import re
+import json
+import itertools
+import time
+import hashlib
+import threading
+
+from .paths import default_cache_dir
 
 class FileManagementError(Exception):
     """Exception raised for file management related errors."""
@@ -55,6 +65,214 @@ def checkdir(path: Path) -> Path:
         raise FileManagementError(f"'{path}' is not a directory.")
     return path
 
+def scan_cache_dir() -> Path:
+    """
+    Returns the directory of the directory listing cache of
+    FileCollection.frompattern. Defaults to the "scan" subdirectory of the
+    PyDesignFlow cache directory. The environment variable
+    PYDESIGNFLOW_SCAN_CACHE_DIR overrides it.
+    """
+    env = os.environ.get("PYDESIGNFLOW_SCAN_CACHE_DIR")
+    if env:
+        return Path(env)
+    return default_cache_dir() / "scan"
+
+class DirectoryScanner:
+    """
+    Lists the files of a directory tree using os.scandir.
+
+    The listing of each directory is cached in a JSON file in cache_dir,
+    together with the modification time of the directory, which changes
+    whenever entries are added, removed or renamed. Unchanged directories
+    are therefore not listed again, only a stat call per directory is
+    needed. Listings are also kept in memory, so that blocks scanning the
+    same directory in one process share them.
+
+    Args:
+        root: Directory to scan.
+        cache_dir: Directory of cache files, defaults to scan_cache_dir().
+            If False, no cache is used.
+        max_workers: Number of threads listing subdirectories in parallel.
+    """
+    version = 1
+    # Directories modified less than racy_window seconds before they are
+    # listed are not cached, as a further modification could leave the
+    # modification time unchanged.
+    racy_window = 2.0
+
+    # Listings shared in this process: cache file path -> listings
+    loaded = {}
+    loaded_lock = threading.Lock()
+
+    def __init__(self, root: Path, cache_dir: Path=None, max_workers: int=8):
+        self.root = os.path.abspath(root)
+        self.max_workers = max_workers
+        self.dirs = {} # relative path -> [[mtime_ns, inode], [[name, kind], ...]]
+        self.changed = False
+        if cache_dir is False:
+            self.cache_path = None
+        else:
+            digest = hashlib.sha256(self.root.encode("utf-8")).hexdigest()[:32]
+            self.cache_path = Path(cache_dir or scan_cache_dir()) / f"{digest}.json"
+            self.load()
+
+    def load(self):
+        with self.loaded_lock:
+            dirs = self.loaded.get(self.cache_path)
+        if dirs is None:
+            try:
+                with open(self.cache_path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == self.version and data.get("root") == self.root:
+                    dirs = data["dirs"]
+            except (OSError, ValueError, AttributeError):
+                pass
+        self.dirs = dict(dirs or {})
+
+    def save(self):
+        with self.loaded_lock:
+            self.loaded[self.cache_path] = self.dirs
+        if not self.changed:
+            return
+        data = {"version": self.version, "root": self.root, "dirs": self.dirs}
+        tmp_path = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # The cache is only used to speed up scanning.
+            pass
+
+    def listing(self, rel: str) -> list:
+        """
+        Returns the entries of a directory as list of [name, kind] pairs.
+        Kind is "f" for files (including symlinks to files), "d" for
+        directories (excluding symlinks) and "o" for other entries.
+        """
+        path = os.path.join(self.root, rel)
+        st = os.stat(path)
+        key = [st.st_mtime_ns, st.st_ino]
+        cached = self.dirs.get(rel)
+        if cached and cached[0] == key:
+            return cached[1]
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        kind = "d"
+                    elif entry.is_file():
+                        kind = "f"
+                    else:
+                        kind = "o"
+                except OSError:
+                    kind = "o"
+                entries.append([entry.name, kind])
+        entries.sort()
+        if self.cache_path and (time.time() - st.st_mtime >= self.racy_window):
+            self.dirs[rel] = [key, entries]
+            self.changed = True
+        return entries
+
+    def scan(self, recursive: bool=False) -> list[tuple[str, str]]:
+        """
+        Lists the directory tree. Symlinks to directories are not followed.
+
+        Args:
+            recursive: If False, only the root directory is listed.
+
+        Returns:
+            List of (relative path, kind) pairs sorted by path, with "/" as
+            path separator. Kinds are as in listing().
+        """
+        result = []
+        level = [""]
+        visited = []
+        # The pool is only started once a level has multiple directories.
+        pool = None
+        try:
+            while level:
+                visited += level
+                if len(level) > 1:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(self.max_workers)
+                    listings = pool.map(self.listing, level)
+                else:
+                    listings = map(self.listing, level)
+                next_level = []
+                for rel, entries in zip(level, listings):
+                    for name, kind in entries:
+                        rel_path = f"{rel}/{name}" if rel else name
+                        result.append((rel_path, kind))
+                        if recursive and kind == "d":
+                            next_level.append(rel_path)
+                level = next_level
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if self.cache_path:
+            if recursive:
+                # Forget listings of directories that were removed.
+                visited = set(visited)
+                for rel in list(self.dirs):
+                    if rel not in visited:
+                        del self.dirs[rel]
+                        self.changed = True
+            self.save()
+        result.sort()
+        return result
+
+_attrs_changes = 0 # Number of modifications of item attributes
+
+def attrs_changed():
+    """
+    Records a modification of the attributes of a FileCollectionItem, which
+    invalidates the indexes of all FileCollections.
+    """
+    global _attrs_changes
+    _attrs_changes += 1
+
+class TrackedAttrs(dict):
+    """
+    Attribute dictionary of a FileCollectionItem, which records its
+    modifications (see attrs_changed).
+    """
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        attrs_changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        attrs_changed()
+
+    def __ior__(self, other):
+        attrs_changed()
+        return super().__ior__(other)
+
+    def clear(self):
+        super().clear()
+        attrs_changed()
+
+    def pop(self, *args):
+        attrs_changed()
+        return super().pop(*args)
+
+    def popitem(self):
+        attrs_changed()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        attrs_changed()
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        attrs_changed()
+
 @dataclass
 class FileCollectionItem:
     """
@@ -63,13 +281,121 @@ class FileCollectionItem:
     Attributes:
         path: File path.
         attrs: Dictionary of attributes (e.g., process corner, temperature).
+            A dict is stored as TrackedAttrs copy.
     """
     path: Path
     attrs: dict[str, object]
 
+    def __setattr__(self, name, value):
+        if name == "attrs":
+            if type(value) is dict:
+                value = TrackedAttrs(value)
+            if "attrs" in self.__dict__:
+                attrs_changed()
+        object.__setattr__(self, name, value)
+
     def __iter__(self):
         return iter((self.path, self.attrs))
 
+class ItemList(list):
+    """
+    List of the items of a FileCollection, which counts modifications other
+    than appending items (version).
+    """
+    __slots__ = ("version",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+
+def _modifying(name):
+    method = getattr(list, name)
+    def modify(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    modify.__name__ = name
+    return modify
+
+for _name in ("__setitem__", "__delitem__", "__imul__", "insert", "pop",
+        "remove", "sort", "reverse", "clear"):
+    setattr(ItemList, _name, _modifying(_name))
+del _name
+
+class LayeredAttrs(MutableMapping):
+    """
+    Attribute dictionary of an item tagged by LazyFileCollection.tag.
+
+    The dictionaries of the original item and of the tag call are shared
+    instead of being merged into a new dictionary for every item. Values of
+    later layers take precedence. The layers are merged into a private
+    dictionary when the attributes are modified (copy-on-write).
+    """
+    __slots__ = ("_layers",)
+
+    def __init__(self, base, overlay: dict):
+        if isinstance(base, LayeredAttrs):
+            self._layers = (overlay,) + base._layers
+        else:
+            self._layers = (overlay, base)
+
+    def __getitem__(self, key):
+        for layer in self._layers:
+            try:
+                return layer[key]
+            except KeyError:
+                pass
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(key in layer for layer in self._layers)
+
+    def __iter__(self):
+        seen = set()
+        for layer in reversed(self._layers):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return len(set().union(*self._layers))
+
+    def _own(self) -> dict:
+        if len(self._layers) > 1:
+            self._layers = (dict(self),)
+        return self._layers[0]
+
+    def __setitem__(self, key, value):
+        self._own()[key] = value
+        attrs_changed()
+
+    def __delitem__(self, key):
+        del self._own()[key]
+        attrs_changed()
+
+    def __or__(self, other):
+        return dict(self) | other
+
+    def __ror__(self, other):
+        return dict(other) | dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+def matches(attrs, filters: dict, missing_key_deselects: bool=False) -> bool:
+    """
+    Returns True if an item with attrs passes the filters of
+    FileCollection.filter.
+    """
+    for key, value in filters.items():
+        try:
+            if attrs[key] != value:
+                return False
+        except KeyError:
+            if missing_key_deselects:
+                return False
+    return True
+
 class FileCollection:
     """
     A collection of files with associated attributes.
@@ -77,6 +403,13 @@ class FileCollection:
     Manages files of the same type (e.g., timing libraries, design files) that differ
     in attributes such as voltage, process corner, or temperature. Supports filtering,
     tagging, and pattern-based creation from directories.
+
+    Filtering uses an index per attribute key, which maps attribute values to
+    item positions. Indexes are built on first use of a key and are updated
+    when items are added. Results of :meth:`one` are memoized. Any other
+    modification of the items list (see ItemList) or of the attributes of
+    items (see TrackedAttrs) resets the indexes. Attributes stored in other
+    mapping types must not be modified.
     """
 
     def __init__(self, items: list[FileCollectionItem]=None):
@@ -89,6 +422,97 @@ class FileCollection:
         if items == None:
             items = []
         self.items = items
+        self._reset_index()
+
+    @property
+    def items(self) -> ItemList:
+        return self._items
+
+    @items.setter
+    def items(self, items: list[FileCollectionItem]):
+        if not isinstance(items, ItemList):
+            items = ItemList(items)
+        self._items = items
+
+    def _reset_index(self):
+        self._indexed_items = self.items
+        self._indexed_version = self.items.version
+        self._indexed_attrs_changes = _attrs_changes
+        self._indexed_count = 0
+        self._index = {} # key -> (dict: value -> positions, list of positions without key)
+        self._unindexable = set() # keys with unhashable values
+        self._one_cache = {}
+
+    def _update_index(self):
+        """
+        Brings indexes up to date with self.items. Items appended to the list
+        are added to the indexes. Any other change resets the indexes.
+        """
+        items = self.items
+        if (items is not self._indexed_items) or (items.version != self._indexed_version) \
+                or (_attrs_changes != self._indexed_attrs_changes) \
+                or (len(items) < self._indexed_count):
+            self._reset_index()
+        elif len(items) == self._indexed_count:
+            return
+        start = self._indexed_count
+        self._indexed_count = len(items)
+        self._one_cache = {}
+        for key in list(self._index):
+            self._index_items(key, start)
+
+    def _index_items(self, key: str, start: int):
+        by_value, missing = self._index[key]
+        items = self.items
+        try:
+            for pos in range(start, len(items)):
+                attrs = items[pos].attrs
+                if key in attrs:
+                    by_value.setdefault(attrs[key], []).append(pos)
+                else:
+                    missing.append(pos)
+        except TypeError:
+            # Unhashable attribute value
+            del self._index[key]
+            self._unindexable.add(key)
+
+    def _key_index(self, key: str):
+        """
+        Returns index of key, or None if key cannot be indexed.
+        """
+        if key in self._unindexable:
+            return None
+        if key not in self._index:
+            self._index[key] = ({}, [])
+            self._index_items(key, 0)
+        return self._index.get(key)
+
+    def _match_positions(self, key: str, value, missing_key_deselects: bool):
+        """
+        Returns positions of the items that pass the filter key=value.
+        """
+        index = self._key_index(key)
+        matched = None
+        # NaN does not compare equal to itself, but would be found in the
+        # index by identity.
+        if (index is not None) and (value == value):
+            by_value, missing = index
+            try:
+                matched = by_value.get(value, [])
+            except TypeError:
+                pass # Unhashable filter value
+        if matched is None:
+            matched = []
+            for pos, item in enumerate(self.items):
+                try:
+                    if item.attrs[key] == value:
+                        matched.append(pos)
+                except KeyError:
+                    pass
+            missing = [pos for pos, item in enumerate(self.items) if key not in item.attrs]
+        if missing_key_deselects or not missing:
+            return matched
+        return matched + missing
 
     def __add__(self, other):
         """Combine two FileCollections."""
@@ -118,6 +542,13 @@ class FileCollection:
             ret.items.append(FileCollectionItem(i.path, i.attrs | attrs))
         return ret
 
+    def lazy(self) -> "LazyFileCollection":
+        """
+        Returns a LazyFileCollection of the items, on which tag, filter and
+        + operations are chained without copying the items.
+        """
+        return LazyFileCollection(lambda: iter(self.items))
+
     def add(self, path: Path, **attrs: dict[str, object]):
         """
         Add a file to the collection.
@@ -147,17 +578,18 @@ class FileCollection:
             New FileCollection with matching files.
         """
 
-        def filter_func(item):
-            for key, value in filters.items():
-                try:
-                    if item.attrs[key] != value:
-                        return False
-                except KeyError:
-                    if missing_key_deselects:
-                        return False
-            return True
-
-        return FileCollection(list(filter(filter_func, self.items)))
+        self._update_index()
+        if not filters:
+            return FileCollection(list(self.items))
+        candidates = [self._match_positions(key, value, missing_key_deselects)
+            for key, value in filters.items()]
+        candidates.sort(key=len)
+        positions = set(candidates[0])
+        for other in candidates[1:]:
+            if not positions:
+                break
+            positions.intersection_update(other)
+        return FileCollection([self.items[pos] for pos in sorted(positions)])
 
     def one(self, missing_key_deselects: bool = False, **filters: dict[str, object]):
         """
@@ -173,12 +605,22 @@ class FileCollection:
         Raises:
             FileManagementError: If no match or multiple matches found.
         """
+        self._update_index()
+        try:
+            cache_key = (missing_key_deselects, frozenset(filters.items()))
+            return self._one_cache[cache_key]
+        except TypeError:
+            cache_key = None # Unhashable filter value
+        except KeyError:
+            pass
         res = self.filter(missing_key_deselects=missing_key_deselects, **filters)
         if len(res) < 1:
             raise FileManagementError(f"No result for FileCollection filters {filters}.")
         elif len(res) > 1:
             raise FileManagementError(f"Ambiguous result for FileCollection filters {filters}.")
         else:
+            if cache_key is not None:
+                self._one_cache[cache_key] = res[0].path
             return res[0].path
 
     def __call__(self, *args, **kwargs):
@@ -188,31 +630,144 @@ class FileCollection:
         return self.one(*args, **kwargs)
 
     @classmethod
-    def frompattern(cls, dir: Path, pattern: str, decoder):
+    def frompattern(cls, dir: Path, pattern: str, decoder, recursive: bool=False,
+            cache: bool=True):
         """
         Create FileCollection using pattern and decoder function.
 
         Args:
             dir: Directory (Path) in which to locate files.
             pattern: Regular expression (Python's re module) for finding
-                desired files.
+                desired files. It is matched against the file name, or, if
+                recursive is set, against the path relative to dir with "/"
+                as separator.
             decoder: Decoder function, receives first regular expression
                 group string as argument, returns dictionary of file
                 attributes.
+            recursive: Also locate files in subdirectories of dir.
+            cache: Cache directory listings across invocations (see
+                DirectoryScanner).
 
         Returns:
             new FileCollection object
         """
-        coll = cls()
-
-        for fn in dir.iterdir():
-            m = re.match(pattern, fn.name)
+        regex = re.compile(pattern)
+        scanner = DirectoryScanner(dir, cache_dir=None if cache else False)
+        try:
+            entries = scanner.scan(recursive)
+        except FileNotFoundError:
+            checkdir(Path(dir))
+            raise
+        items = []
+        for rel_path, kind in entries:
+            m = regex.match(rel_path)
             if m:
-                attr_str = m.group(1)
-                attrs = decoder(attr_str)
-                coll.add(fn, **attrs)
+                path = dir / rel_path
+                if kind != "f":
+                    checkfile(path)
+                attrs = decoder(m.group(1))
+                items.append(FileCollectionItem(path, attrs))
 
-        if len(coll) < 1:
+        if len(items) < 1:
             raise FileManagementError("No files matched in FileCollection.frompattern.")
 
-        return coll
+        return cls(items)
+
+class LazyFileCollection:
+    """
+    FileCollection whose tag, filter and + operations build a generator
+    pipeline instead of copying the items, see FileCollection.lazy().
+
+    Iteration streams the items through the pipeline. len(), indexing,
+    one() and the items attribute evaluate the pipeline once into a
+    FileCollection (see collect()), which is reused afterwards. Items are
+    not copied by filter and +, and tag shares the attribute dictionaries
+    of the items using LayeredAttrs. The pipeline reads the source
+    collection when it is evaluated, not when it is built.
+
+    Example::
+
+        libs = c.lazy().filter(corner='tt').tag(view='nldm') + other.lazy()
+        lib = libs(voltage=0.9)
+    """
+
+    def __init__(self, source):
+        """
+        Initialize LazyFileCollection.
+
+        Args:
+            source: Function returning an iterator of FileCollectionItems.
+        """
+        self._source = source
+        self._collection = None
+
+    def _stream(self):
+        if self._collection is not None:
+            return iter(self._collection.items)
+        return self._source()
+
+    def collect(self) -> FileCollection:
+        """
+        Evaluates the pipeline.
+
+        Returns:
+            FileCollection with the resulting items.
+        """
+        if self._collection is None:
+            self._collection = FileCollection(list(self._source()))
+        return self._collection
+
+    @property
+    def items(self) -> list[FileCollectionItem]:
+        return self.collect().items
+
+    def lazy(self) -> "LazyFileCollection":
+        return self
+
+    def __iter__(self):
+        return self._stream()
+
+    def __len__(self):
+        return len(self.collect())
+
+    def __getitem__(self, key):
+        return self.collect()[key]
+
+    def __add__(self, other):
+        """Combine with a FileCollection or LazyFileCollection."""
+        return LazyFileCollection(lambda: itertools.chain(self._stream(), iter(other)))
+
+    def tag(self, **attrs: dict[str, object]):
+        """
+        Add attributes to all items, see FileCollection.tag.
+
+        Returns:
+            New LazyFileCollection.
+        """
+        return LazyFileCollection(lambda: (
+            FileCollectionItem(i.path, LayeredAttrs(i.attrs, attrs)) for i in self._stream()))
+
+    def filter(self, missing_key_deselects: bool = False, **filters: dict[str, object]):
+        """
+        Filter items by attributes, see FileCollection.filter.
+
+        Returns:
+            New LazyFileCollection.
+        """
+        return LazyFileCollection(lambda: (
+            i for i in self._stream() if matches(i.attrs, filters, missing_key_deselects)))
+
+    def one(self, missing_key_deselects: bool = False, **filters: dict[str, object]):
+        """
+        Get the single file matching the filters, see FileCollection.one.
+        """
+        return self.collect().one(missing_key_deselects=missing_key_deselects, **filters)
+
+    def __call__(self, *args, **kwargs):
+        """
+        Shorthand for :meth:`one`.
+        """
+        return self.one(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyFileCollection:{self.items}"
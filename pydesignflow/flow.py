@@ -5,10 +5,14 @@
 Provides the Flow class and a corresponding 'flow' command-line interface.
 """
 
+import os
 from pathlib import Path
 from .session import BuildSession
 from .cli import CLI
 from .target import TargetId, Target
+from .cache import parse_size
+from .paths import default_cache_dir
+from .resources import parse_resources
 import subprocess
 
 class Flow:
@@ -38,17 +42,71 @@ class Flow:
         flow synthesis.run
         flow simulation.run
     """
-    def __init__(self, hide_subprocess_errors=True):
+    def __init__(self, hide_subprocess_errors=True, cache_dir=None, cache_size_limit=None,
+            resources=None, result_codec=None, compact_results=None, compression=None,
+            snapshot=True):
         """
         Initialize a Flow.
 
         Args:
             hide_subprocess_errors: If True, subprocess errors are converted to
-                SystemExit with a concise error message. If False, the full
-                CalledProcessError exception is raised. Defaults to True.
+                SystemExit with a concise error message, which includes the
+                last lines of the output and the log file for tools run with
+                Block.run_tool. If False, the full CalledProcessError
+                exception is raised. Defaults to True.
+            cache_dir: Directory for outputs of tasks declared with
+                @task(cache=True). The directory can be shared by multiple
+                users. Defaults to the environment variable
+                PYDESIGNFLOW_CACHE_DIR or ~/.cache/pydesignflow/tasks.
+            cache_size_limit: Maximum size of the cache in bytes or as string
+                such as "500G". Least recently used entries are evicted when
+                the limit is exceeded. Defaults to the environment variable
+                PYDESIGNFLOW_CACHE_SIZE or no limit.
+            resources: Resource pool for parallel builds, as dictionary
+                mapping resource name to available amount, e.g.
+                ``{'cpus': 32, 'mem_gb': 256, 'license:innovus': 2}``.
+                Resources declared by tasks that are not part of the pool
+                are not limited. The pool is merged with the environment
+                variable PYDESIGNFLOW_RESOURCES (e.g. "cpus=32,mem_gb=256"),
+                which describes the machine; entries given here take
+                precedence.
+            result_codec: Codec for result.json files, "json" or "orjson"
+                (see serialization). Defaults to the environment variable
+                PYDESIGNFLOW_RESULT_CODEC, or orjson if it is installed.
+            compact_results: If True, result.json files are written without
+                indentation on a single line. Defaults to the environment
+                variable PYDESIGNFLOW_COMPACT_RESULTS or False.
+            compression: Compression of outputs selected by
+                @task(compress=...), "zstd" or "gzip" (see compression).
+                Defaults to the environment variable
+                PYDESIGNFLOW_COMPRESSION, or zstd if zstandard is installed.
+            snapshot: If False, status queries and shell completion always
+                import the flow instead of using the cached snapshot of its
+                structure (see snapshot). Disable the snapshot if the
+                structure of the flow depends on inputs other than its
+                source files and installed packages, e.g. environment
+                variables or the contents of directories. Defaults to True.
         """
         self.blocks = {}
+        self._graph = None
         self.hide_subprocess_errors = hide_subprocess_errors
+        if cache_dir is None:
+            cache_dir = os.environ.get("PYDESIGNFLOW_CACHE_DIR") \
+                or (default_cache_dir() / "tasks")
+        self.cache_dir = Path(cache_dir)
+        if cache_size_limit is None:
+            cache_size_limit = os.environ.get("PYDESIGNFLOW_CACHE_SIZE")
+        if cache_size_limit is not None:
+            cache_size_limit = parse_size(cache_size_limit)
+        self.cache_size_limit = cache_size_limit
+        self.resources = parse_resources(os.environ.get("PYDESIGNFLOW_RESOURCES", ""))
+        self.resources.update(resources or {})
+        self.result_codec = result_codec
+        if compact_results is None:
+            compact_results = bool(os.environ.get("PYDESIGNFLOW_COMPACT_RESULTS"))
+        self.compact_results = compact_results
+        self.compression = compression
+        self.snapshot = snapshot
 
     def __iter__(self):
         return iter(self.blocks)
@@ -60,8 +118,22 @@ class Flow:
         if key in self.blocks:
             raise TypeError(f"Block {key} assigned multiple times.")
         self.blocks[key]=value
+        self._graph = None
         value.register(self, key)
 
+    def graph(self) -> "FlowGraph":
+        """
+        Returns the dependency graph of all targets. It is built on first use
+        and rebuilt only when blocks are added.
+
+        Raises:
+            FlowError: If a task requires an unknown target.
+        """
+        if self._graph is None:
+            from .graph import FlowGraph
+            self._graph = FlowGraph(self)
+        return self._graph
+
     @property
     def base_dir(self):
         """
@@ -71,8 +143,15 @@ class Flow:
         """
         return Path.cwd()
 
-    def session_at(self, build_dir):
-        return BuildSession(self, build_dir)
+    def session_at(self, build_dir, tracer=None):
+        """
+        Returns BuildSession for build_dir.
+
+        Args:
+            build_dir: Build directory
+            tracer: Optional Tracer recording trace events of the session.
+        """
+        return BuildSession(self, build_dir, tracer)
 
     def cli_main(self, args: list[str], prog="flow") -> None:
         """
@@ -87,7 +166,13 @@ class Flow:
             CLI(self).main(args, prog)
         except subprocess.CalledProcessError as e:
             if self.hide_subprocess_errors:
-                raise SystemExit(f"Subprocess {e.cmd[0]} exited with return code {e.returncode}.")
+                message = f"Subprocess {e.cmd[0]} exited with return code {e.returncode}."
+                tail = getattr(e, "tail", None)
+                if tail is not None:
+                    # ToolError from Block.run_tool
+                    message += "".join(f"\n  {line}" for line in tail[-10:])
+                    message += f"\nSee log {e.log}."
+                raise SystemExit(message)
             else:
                 raise
 
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Precompiled dependency graph of a Flow.
+"""
+
+from .errors import FlowError
+from .target import TargetId
+
+class FlowGraph:
+    """
+    Dependency graph of all targets of a flow, with targets numbered by
+    integer indices. Requirement specs are resolved once when the graph is
+    built, and references to unknown blocks or targets are reported as
+    FlowError.
+
+    Attributes:
+        tids: List mapping index to TargetId.
+        index: Dictionary mapping TargetId to index.
+        targets: List mapping index to Target.
+        deps: List mapping index to tuple of the indices of the required
+            targets, in the order of the task's requires dictionary.
+        dependents: List mapping index to tuple of the indices of the
+            targets requiring it (reverse edges).
+        always_rebuild: List mapping index to always_rebuild flag.
+    """
+    def __init__(self, flow):
+        self.tids = []
+        self.targets = []
+        for block_id in flow:
+            for task_id, target in flow[block_id].tasks.items():
+                self.tids.append(TargetId(block_id, task_id))
+                self.targets.append(target)
+        self.index = {tid: idx for idx, tid in enumerate(self.tids)}
+        self.always_rebuild = [bool(t.always_rebuild) for t in self.targets]
+
+        self.deps = []
+        dependents = [[] for _ in self.tids]
+        for idx, target in enumerate(self.targets):
+            deps = []
+            try:
+                for _, dep_tid in target.resolve_requires():
+                    try:
+                        dep = self.index[dep_tid]
+                    except KeyError:
+                        raise FlowError(f"Target {self.tids[idx]} requires "
+                            f"unknown target {dep_tid}.") from None
+                    deps.append(dep)
+                    dependents[dep].append(idx)
+            except KeyError as e:
+                raise FlowError(f"Target {self.tids[idx]} uses undefined "
+                    f"block reference {e}.") from None
+            self.deps.append(tuple(deps))
+        self.dependents = [tuple(d) for d in dependents]
+
+    def __len__(self):
+        return len(self.tids)
+
+    def dependency_order(self, root: int, skip: bytearray=None) -> list[int]:
+        """
+        Returns the targets that root (transitively) requires, followed by
+        root, in topological order. The requirements are visited by
+        depth-first search in the order in which they are declared. The
+        search is iterative, so there is no limit on the depth of the graph.
+
+        Args:
+            root: Index of the requested target.
+            skip: Optional bytearray with one element per target. Required
+                targets whose element is non-zero are neither included in
+                the list nor searched for further requirements.
+        """
+        deps = self.deps
+        visited = bytearray(skip) if skip else bytearray(len(self.tids))
+        visited[root] = 1
+        order = []
+        # Stack of nodes and of the position of the next requirement to
+        # visit. Plain ints are used, as they are not tracked by the garbage
+        # collector, which would repeatedly scan a deep stack of tuples.
+        nodes = [root]
+        positions = [0]
+        while nodes:
+            node_deps = deps[nodes[-1]]
+            pos = positions[-1]
+            while pos < len(node_deps):
+                dep = node_deps[pos]
+                pos += 1
+                if not visited[dep]:
+                    visited[dep] = 1
+                    positions[-1] = pos
+                    nodes.append(dep)
+                    positions.append(0)
+                    break
+            else:
+                positions.pop()
+                order.append(nodes.pop())
+        return order
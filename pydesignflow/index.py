@@ -0,0 +1,277 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Persistent index of the results in a build directory.
+
+The index is an append-only log file in the build directory, stored as
+.pydesignflow/index.log. It allows a
+BuildSession to learn the state of all targets with a single file read
+instead of opening every result.json file. Each line is one record with
+tab-separated fields::
+
+    <op> <block_id> <task_id> <payload>
+
+The following operations are recorded:
+
+- ``R``: Result written. The payload is the result JSON string.
+- ``S``: Target started, i.e. its directory was (re-)created.
+- ``D``: Result(s) deleted. An empty task_id deletes all results of the
+  block.
+- ``M``: Modification time of a directory after a change made through the
+  index. An empty block_id refers to the build directory itself. The payload
+  is the mtime in nanoseconds or empty if the directory does not exist.
+
+The result.json files remain the primary data. The ``M`` records are used
+to detect changes to the build directory that were made without the index
+(e.g. rm -rf of a block directory), in which case the affected part of the
+build directory is scanned again. Changes inside target directories, such as
+an edited or deleted result.json, do not change these modification times
+and are not detected.
+
+Records superseded by later records are removed when the index is loaded
+and their number exceeds ResultIndex.compact_threshold and the number of
+current records (compaction). Appending records holds a shared flock on
+.pydesignflow/index.lock, replacing the index an exclusive one, so that no
+records are lost when they are appended during compaction. Loading the
+index works without write access to the build directory; the index is then
+neither rebuilt nor compacted.
+"""
+
+import os
+import re
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .target import TargetId
+
+def dir_mtime(path) -> int:
+    """
+    Returns modification time of path in nanoseconds or None if path does
+    not exist.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def file_size(path) -> int:
+    """
+    Returns size of file path in bytes or None if path does not exist.
+    """
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+class IndexState:
+    """
+    In-memory state of a ResultIndex.
+
+    Attributes:
+        entries: Dictionary mapping TargetId to result JSON string, or to
+            None for started targets without result.
+        dir_mtimes: Dictionary mapping block_id ('' for the build directory)
+            to last recorded modification time.
+        records: Number of records applied.
+        size: Size of the index file in bytes when it was loaded.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.dir_mtimes = {}
+        self.records = 0
+        self.size = None
+
+    def superseded(self) -> int:
+        """
+        Returns the number of applied records that no longer contribute to
+        the state.
+        """
+        return max(0, self.records - len(self.entries) - len(self.dir_mtimes))
+
+    def apply(self, op, block_id, task_id, payload=""):
+        self.records += 1
+        if op == "R":
+            self.entries[TargetId(block_id, task_id)] = payload
+        elif op == "S":
+            self.entries[TargetId(block_id, task_id)] = None
+        elif op == "D":
+            for tid in list(self.entries):
+                if (not block_id) or (tid.block_id == block_id
+                        and ((not task_id) or tid.task_id == task_id)):
+                    del self.entries[tid]
+        elif op == "M":
+            self.dir_mtimes[block_id] = int(payload) if payload else None
+        else:
+            raise ValueError(f"Unknown index operation {op!r}.")
+
+class ResultIndex:
+    """
+    Append-only log of result changes in a build directory.
+    """
+    meta_dirname = ".pydesignflow"
+    filename = "index.log"
+    lock_filename = "index.lock"
+    header = "pydesignflow-index 1\n"
+    compact_threshold = 1000 # Minimum number of superseded records to compact.
+
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+        self.meta_dir = build_dir / self.meta_dirname
+        self.path = self.meta_dir / self.filename
+
+    def create_meta_dir(self):
+        """
+        Creates the directory holding the index, if the build directory
+        exists. It is a separate directory so that rewriting the index does
+        not change the modification time of the build directory.
+        """
+        if self.build_dir.exists():
+            self.meta_dir.mkdir(exist_ok=True)
+
+    @contextmanager
+    def locked(self, exclusive: bool):
+        """
+        Holds a shared or exclusive lock of the index while in the with
+        statement.
+
+        Raises:
+            FileNotFoundError: If the meta directory does not exist.
+        """
+        if not fcntl:
+            yield
+            return
+        with open(self.meta_dir / self.lock_filename, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    @staticmethod
+    def compact_json(json_str: str) -> str:
+        """
+        Removes line breaks and indentation from a JSON string. JSON strings
+        cannot contain raw newlines, therefore all newlines are whitespace
+        between tokens.
+        """
+        if "\n" not in json_str:
+            return json_str
+        return re.sub(r"\n\s*", "", json_str)
+
+    @staticmethod
+    def format_record(op, block_id="", task_id="", payload="") -> str:
+        return f"{op}\t{block_id}\t{task_id}\t{payload}\n"
+
+    def mtime_records(self, block_id: str) -> list[tuple]:
+        """
+        Returns M records for the build directory and the directory of the
+        given block.
+        """
+        # Creating the meta directory later would invalidate the mtime of
+        # the build directory.
+        self.create_meta_dir()
+        return [
+            ("M", "", "", dir_mtime(self.build_dir) or ""),
+            ("M", block_id, "", dir_mtime(self.build_dir / block_id) or ""),
+        ]
+
+    def load(self) -> IndexState:
+        """
+        Reads the index file.
+
+        Returns:
+            IndexState or None if the index is missing or unreadable.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            data = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        if not data.startswith(self.header):
+            return None
+        state = IndexState()
+        state.size = len(raw)
+        lines = data[len(self.header):].split("\n")
+        # The last line is either empty or a record that is currently being
+        # appended by another process. In both cases, it is ignored.
+        for line in lines[:-1]:
+            try:
+                op, block_id, task_id, payload = line.split("\t", 3)
+                state.apply(op, block_id, task_id, payload)
+            except ValueError:
+                return None
+        return state
+
+    def needs_compaction(self, state: IndexState) -> bool:
+        """
+        Returns True if most records of the loaded index are superseded.
+        """
+        superseded = state.superseded()
+        return superseded > self.compact_threshold \
+            and superseded > len(state.entries) + len(state.dir_mtimes)
+
+    def append(self, records: list[tuple]) -> bool:
+        """
+        Appends records (tuples of op, block_id, task_id, payload) to the
+        index. All records are written using a single write call, which
+        prevents interleaving with records written concurrently by other
+        processes.
+
+        Returns:
+            False if the index file does not exist. In this case, nothing is
+            written, as appending to an index without complete history is
+            pointless.
+        """
+        data = "".join(self.format_record(*r) for r in records).encode("utf-8")
+        try:
+            with self.locked(exclusive=False):
+                try:
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+                except FileNotFoundError:
+                    return False
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+        except FileNotFoundError:
+            # No meta directory
+            return False
+        return True
+
+    def rewrite(self, state: IndexState, expected_size: int=None) -> bool:
+        """
+        Atomically replaces the index with a new one representing state.
+
+        Args:
+            expected_size: If given, the index is only replaced if its size
+                is still expected_size, i.e. no records were appended by
+                other processes since it was loaded.
+
+        Returns:
+            True if the index was replaced.
+        """
+        if not self.meta_dir.exists():
+            return False
+        lines = [self.header]
+        for tid, json_str in state.entries.items():
+            if json_str is None:
+                lines.append(self.format_record("S", tid.block_id, tid.task_id))
+            else:
+                lines.append(self.format_record("R", tid.block_id, tid.task_id, json_str))
+        for block_id, mtime in state.dir_mtimes.items():
+            lines.append(self.format_record("M", block_id, "", mtime or ""))
+        tmp_path = self.path.with_name(f"{self.filename}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write("".join(lines))
+        with self.locked(exclusive=True):
+            if expected_size is not None and file_size(self.path) != expected_size:
+                os.unlink(tmp_path)
+                return False
+            os.replace(tmp_path, self.path)
+        return True
@@ -0,0 +1,105 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Minimal ctypes wrapper for the Linux inotify API.
+"""
+
+import os
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+from collections import namedtuple
+
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_ISDIR       = 0x40000000
+
+IN_CLOEXEC     = 0o2000000
+
+InotifyEvent = namedtuple("InotifyEvent", ["wd", "mask", "cookie", "name"])
+
+_event_header = struct.Struct("iIII")
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify is only available on Linux.")
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    try:
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except AttributeError:
+        raise OSError("inotify is not supported by the C library.")
+    return libc
+
+class Inotify:
+    """
+    inotify instance.
+
+    Raises:
+        OSError: If inotify is not available.
+    """
+    def __init__(self):
+        self.libc = _load_libc()
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask: int) -> int:
+        """
+        Returns:
+            Watch descriptor.
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def rm_watch(self, wd: int):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float=None) -> list[InotifyEvent]:
+        """
+        Waits up to timeout seconds for events.
+
+        Returns:
+            List of events, empty if the timeout expired.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = os.fsdecode(data[offset:offset+length].rstrip(b"\0"))
+            offset += length
+            events.append(InotifyEvent(wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
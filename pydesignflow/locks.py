@@ -0,0 +1,241 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Per-target lock files, which prevent concurrent flow invocations on the
+same build directory from building the same target twice.
+
+A target is locked while it runs, by creating ``.pydesignflow/locks/
+<block>.<task>.lock`` exclusively. The holder renews the modification time
+of the lock (heartbeat). A lock whose heartbeat is older than the timeout
+is stale, e.g. because the holding process was killed, and is broken by
+the next process that needs the target. Locks held by processes of the
+same host that no longer exist are broken immediately.
+
+A process that finds a target locked waits until the lock is released and
+then uses the result of the other process instead of building the target
+again. Targets that are only built because their result was missing are
+checked for a result after acquiring the lock as well, as the other process
+may have finished before (see Target.run).
+"""
+
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from contextlib import contextmanager
+
+from .target import TargetId
+
+LOCK_TIMEOUT = 60.0 # Seconds without heartbeat after which a lock is stale.
+HEARTBEAT_INTERVAL = 10.0
+
+def fs_time(clock_path: Path) -> float:
+    """
+    Returns the current time of the file system holding clock_path, by
+    touching clock_path. Comparing modification times against it is not
+    affected by clock skew between hosts. If clock_path cannot be written,
+    the local time is returned.
+    """
+    try:
+        with open(clock_path, "w"):
+            pass
+        return os.stat(clock_path).st_mtime
+    except OSError:
+        return time.time()
+
+def owner_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class TargetLocks:
+    """
+    Lock files of the targets of a build directory.
+
+    Args:
+        path: Directory of the lock files.
+        timeout: Seconds without heartbeat after which a lock is stale.
+        heartbeat_interval: Seconds between renewals of held locks.
+        poll_interval: Seconds between checks while waiting for a lock.
+    """
+    def __init__(self, path: Path, timeout: float=LOCK_TIMEOUT,
+            heartbeat_interval: float=HEARTBEAT_INTERVAL, poll_interval: float=0.5):
+        self.path = path
+        self.timeout = timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.owner = owner_name()
+        self.held = set() # TargetIds locked by this object
+        self.cond = threading.Condition()
+        self.heartbeat_thread = None
+
+    def lock_path(self, tid: TargetId) -> Path:
+        return self.path / f"{tid}.lock"
+
+    def holder(self, tid: TargetId) -> str:
+        """
+        Returns owner of the lock of tid, or None if it is not locked.
+        """
+        try:
+            with open(self.lock_path(tid), "r") as f:
+                return f.read().strip() or "unknown"
+        except FileNotFoundError:
+            return None
+
+    def owner_gone(self, owner: str) -> bool:
+        host, _, pid = owner.rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    @staticmethod
+    def lock_state(path: Path) -> tuple:
+        """
+        Returns tuple of inode, modification time and owner of lock file
+        path.
+
+        Raises:
+            FileNotFoundError: If path does not exist.
+        """
+        st = os.stat(path)
+        with open(path, "r") as f:
+            owner = f.read().strip()
+        return st.st_ino, st.st_mtime, owner
+
+    def is_stale(self, path: Path, now: float, state: tuple=None) -> bool:
+        """
+        Returns True if lock file path (with lock_state state, if given) has
+        no recent heartbeat or belongs to a process that has exited.
+        """
+        try:
+            _, mtime, owner = state or self.lock_state(path)
+        except FileNotFoundError:
+            return False
+        if now - mtime > self.timeout:
+            return True
+        return bool(owner) and self.owner_gone(owner)
+
+    def try_acquire(self, tid: TargetId) -> bool:
+        path = self.lock_path(tid)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            try:
+                state = self.lock_state(path)
+            except FileNotFoundError:
+                return False
+            if not self.is_stale(path, fs_time(self.path / "clock"), state):
+                return False
+            # Break the stale lock by renaming it away. Another process may
+            # have broken the same lock and acquired a new one since it was
+            # judged stale. This is detected by comparing the renamed file
+            # with the stale one, in which case the new lock is restored.
+            broken = path.with_name(f"{path.name}.{os.urandom(4).hex()}.stale")
+            try:
+                os.rename(path, broken)
+            except FileNotFoundError:
+                return False
+            try:
+                renamed = self.lock_state(broken)
+            except FileNotFoundError:
+                return False
+            if renamed != state:
+                try:
+                    os.link(broken, path)
+                except FileExistsError:
+                    # Yet another process holds the lock now.
+                    pass
+                os.unlink(broken)
+                return False
+            os.unlink(broken)
+            return self.try_acquire(tid)
+        try:
+            os.write(fd, f"{self.owner}\n".encode("utf-8"))
+        finally:
+            os.close(fd)
+        with self.cond:
+            self.held.add(tid)
+            if not self.heartbeat_thread:
+                self.heartbeat_thread = threading.Thread(target=self.heartbeat, daemon=True)
+                self.heartbeat_thread.start()
+        return True
+
+    def release(self, tid: TargetId):
+        with self.cond:
+            self.held.discard(tid)
+        try:
+            os.unlink(self.lock_path(tid))
+        except FileNotFoundError:
+            pass
+
+    def heartbeat(self):
+        with self.cond:
+            while self.held:
+                self.cond.wait(self.heartbeat_interval)
+                for tid in self.held:
+                    try:
+                        os.utime(self.lock_path(tid))
+                    except FileNotFoundError:
+                        pass
+            self.heartbeat_thread = None
+
+    @contextmanager
+    def hold(self, tid: TargetId, on_wait=None):
+        """
+        Locks tid for the duration of the with statement, waiting for other
+        processes to release it first.
+
+        Args:
+            on_wait: Optional function called with the owner of the lock
+                when this process has to wait.
+
+        Yields:
+            True if the lock was held by another process before.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        waited = False
+        while not self.try_acquire(tid):
+            if not waited:
+                owner = self.holder(tid)
+                if owner is None:
+                    continue # Released in the meantime
+                waited = True
+                if on_wait:
+                    on_wait(owner)
+            time.sleep(self.poll_interval)
+        try:
+            yield waited
+        finally:
+            self.release(tid)
+
+    def running(self) -> set[TargetId]:
+        """
+        Returns targets that are locked by a process with recent heartbeat.
+
+        The heartbeats are compared against the local time instead of
+        fs_time, as this is only used for reporting and must not write to
+        the build directory. This assumes that the clocks of the hosts
+        sharing the build directory differ by much less than the timeout.
+        Otherwise, targets of other hosts may be reported as not running.
+        Breaking stale locks is not affected, as try_acquire uses fs_time.
+        """
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return set()
+        running = set()
+        now = time.time()
+        for name in names:
+            if not name.endswith(".lock"):
+                continue
+            if self.is_stale(self.path / name, now):
+                continue
+            block_id, _, task_id = name[:-len(".lock")].partition(".")
+            running.add(TargetId(block_id, task_id))
+        return running
@@ -2,42 +2,231 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from .target import TargetId
+from . import inotify
 import time
 import sys
 
-def monitor(sess: "BuildSession", refresh_interval: float = 10.0):
+class BuildDirWatcher:
     """
-    Continuously monitors build directory of provided sess. The build directory
-    state is refreshed every refresh_interval seconds. When a target changes
-    its state to incomplete (started) or finished, a message is printed to
-    stdout.
+    Watches the build directory of a session using inotify.
+
+    Watches are placed on the build directory, on the directories of all
+    blocks and on the directories of all targets of the flow. Watches for
+    newly created directories are added as the corresponding events arrive.
+
+    Raises:
+        OSError: If inotify is not available, or if the watches cannot be
+            added, e.g. because the limit of inotify watches
+            (fs.inotify.max_user_watches) is reached.
     """
+    dir_mask = inotify.IN_CREATE | inotify.IN_DELETE \
+        | inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO \
+        | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF | inotify.IN_ONLYDIR
+    task_dir_mask = dir_mask | inotify.IN_CLOSE_WRITE
 
-    status_last = None
-    status = None
-    while True:
-        status_last = status
-        status = {}
+    def __init__(self, sess):
+        self.sess = sess
+        self.inotify = inotify.Inotify()
+        self.keys = {} # watch descriptor -> key
+        # Keys are () for the build directory, (block_id,) for block
+        # directories and (block_id, task_id) for target directories.
+        self.build_dir_watched = False
+        try:
+            self.sync(())
+        except OSError:
+            self.inotify.close()
+            raise
+
+    def path(self, key):
+        return self.sess.build_dir.joinpath(*key)
+
+    def sync(self, key) -> set[TargetId]:
+        """
+        Adds watches for the directory identified by key and all
+        directories below it.
+
+        Returns:
+            Set of TargetIds whose directories are below key. Their state
+            might have changed before the watches were in place.
+
+        Raises:
+            OSError: If a watch cannot be added for an existing directory.
+        """
+        mask = self.task_dir_mask if len(key) == 2 else self.dir_mask
+        try:
+            wd = self.inotify.add_watch(self.path(key), mask)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        else:
+            self.keys[wd] = key
+            if key == ():
+                self.build_dir_watched = True
+
+        changed = set()
+        if key == ():
+            for block_id in self.sess.flow:
+                changed |= self.sync((block_id,))
+        elif len(key) == 1:
+            for task_id in self.sess.flow[key[0]].tasks:
+                changed |= self.sync((key[0], task_id))
+        else:
+            changed.add(TargetId(*key))
+        return changed
+
+    def child_key(self, key, name):
+        """
+        Returns key of directory entry name in the directory of key, or None
+        if the entry is not relevant.
+        """
+        if key == ():
+            if self.sess.flow.has_block(name):
+                return (name,)
+        elif len(key) == 1:
+            if self.sess.flow.has_target(TargetId(key[0], name)):
+                return (key[0], name)
+        elif name == "result.json":
+            return key
+        return None
+
+    def wait(self, timeout: float=None) -> set[TargetId]:
+        """
+        Waits up to timeout seconds for changes in the build directory.
+
+        Returns:
+            Set of TargetIds whose state might have changed.
+
+        Raises:
+            OSError: If a watch cannot be added for a new directory.
+        """
+        if not self.build_dir_watched:
+            # Build directory did not exist so far.
+            time.sleep(timeout or 1.0)
+            return self.sync(())
+
+        changed = set()
+        for event in self.inotify.read(timeout):
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                changed |= self.sync(())
+                continue
+            key = self.keys.get(event.wd)
+            if key is None:
+                continue
+            if event.mask & inotify.IN_IGNORED:
+                del self.keys[event.wd]
+                if key == ():
+                    self.build_dir_watched = False
+                continue
+            if event.mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                if key == ():
+                    self.build_dir_watched = False
+                continue
+            child = self.child_key(key, event.name)
+            if child is None:
+                continue
+            if child == key:
+                changed.add(TargetId(*key))
+            else:
+                changed |= self.sync(child)
+        return changed
+
+    def close(self):
+        self.inotify.close()
+
+class Monitor:
+    """
+    Tracks the state of the targets in the build directory of sess.
+
+    By default, the build directory is watched using inotify, which reports
+    changes with low latency and only re-reads results of targets that
+    changed. inotify does not report changes made by other hosts on network
+    file systems, e.g. by workers or batch jobs on compute nodes. Therefore,
+    the complete state is reloaded every reload_interval seconds in
+    addition. If inotify is unavailable, or if watches cannot be added for
+    all directories (e.g. because of the limit of inotify watches), the
+    complete state is reloaded every refresh_interval seconds.
+    """
+    def __init__(self, sess, refresh_interval: float = 10.0, use_inotify: bool = True,
+            reload_interval: float = 60.0):
+        self.sess = sess
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.last_reload = time.monotonic()
+        self.watcher = None
+        if use_inotify:
+            try:
+                self.watcher = BuildDirWatcher(sess)
+            except OSError:
+                pass
+        self.monitored = []
         for block_id in sess.flow:
             block = sess.flow[block_id]
             for task_id, task in block.tasks.items():
                 if task.always_rebuild or task.hidden:
                     continue
-                tid = TargetId(block_id, task_id)
-                if tid in sess.results:
-                    status[tid] = f"finished on {sess.results[tid].time_finished:%y-%m-%d %H:%M}"
-                elif tid in sess.incomplete:
-                    status[tid] = "started"
-                else:
-                    status[tid] = "missing"
-
-        if status_last != None:
-            for tid in status:
-                if status[tid] == "missing":
-                    continue
-                if status[tid] != status_last[tid]:
-                    print(f"{tid}: {status[tid]}")
-                    sys.stdout.flush()
-        
-        time.sleep(refresh_interval)
-        sess.reload_results()
+                self.monitored.append(TargetId(block_id, task_id))
+        self.status = {tid: self.target_status(tid) for tid in self.monitored}
+
+    def target_status(self, tid: TargetId) -> str:
+        sess = self.sess
+        if tid in sess.results:
+            return f"finished on {sess.results[tid].time_finished:%y-%m-%d %H:%M}"
+        elif tid in sess.incomplete:
+            return "started"
+        else:
+            return "missing"
+
+    def step(self) -> list[str]:
+        """
+        Waits for changes in the build directory.
+
+        Returns:
+            List of messages for targets whose state has changed.
+        """
+        changed = set()
+        if self.watcher:
+            try:
+                changed = self.watcher.wait(timeout=1.0)
+            except OSError:
+                # Fall back to polling.
+                self.watcher.close()
+                self.watcher = None
+        if self.watcher:
+            if time.monotonic() - self.last_reload >= self.reload_interval:
+                self.last_reload = time.monotonic()
+                self.sess.reload_results()
+                changed = set(self.monitored)
+            else:
+                for tid in changed:
+                    self.sess.refresh_target(tid)
+        else:
+            time.sleep(self.refresh_interval)
+            self.sess.reload_results()
+            changed = set(self.monitored)
+
+        messages = []
+        for tid in self.monitored:
+            if tid not in changed:
+                continue
+            status = self.target_status(tid)
+            if status == self.status[tid]:
+                continue
+            self.status[tid] = status
+            if status != "missing":
+                messages.append(f"{tid}: {status}")
+        return messages
+
+def monitor(sess: "BuildSession", refresh_interval: float = 10.0):
+    """
+    Continuously monitors build directory of provided sess. When a target
+    changes its state to incomplete (started) or finished, a message is
+    printed to stdout.
+
+    Changes are detected using inotify where available, and the build
+    directory state is refreshed every minute in addition. Without inotify,
+    the build directory state is refreshed every refresh_interval seconds.
+    """
+    m = Monitor(sess, refresh_interval)
+    while True:
+        for message in m.step():
+            print(message)
+            sys.stdout.flush()
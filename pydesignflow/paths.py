@@ -0,0 +1,24 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Locations of per-user files of PyDesignFlow.
+
+This module has no dependencies on other PyDesignFlow modules, so that
+independent helpers such as pydesignflow.filemgmt can use it.
+"""
+
+import os
+from pathlib import Path
+
+def default_cache_dir() -> Path:
+    """
+    Returns the per-user cache directory of PyDesignFlow, following the XDG
+    base directory specification.
+    """
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        base = Path(xdg_cache_home)
+    else:
+        base = Path.home() / ".cache"
+    return base / "pydesignflow"
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Resource pools for admission control of concurrently running targets.
+
+Tasks declare the resources they use with @task(resources={...}), e.g.
+``{'cpus': 8, 'mem_gb': 120, 'license:innovus': 1}``. The capacity of each
+resource is defined by the resource pool of the flow. Resources that are not
+part of the pool are not limited.
+"""
+
+from .errors import FlowError
+
+def parse_resources(spec: str) -> dict:
+    """
+    Parses a resource specification such as "cpus=32,mem_gb=256,license:innovus=2".
+    """
+    resources = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, amount = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Malformed resource specification \"{item}\".")
+        try:
+            amount = int(amount)
+        except ValueError:
+            amount = float(amount)
+        resources[name.strip()] = amount
+    return resources
+
+class ResourcePool:
+    """
+    Capacity and current usage of resources.
+
+    Args:
+        capacity: Dictionary mapping resource name to available amount.
+    """
+    def __init__(self, capacity: dict):
+        self.capacity = dict(capacity)
+        self.used = {name: 0 for name in self.capacity}
+
+    def check(self, name: str, request: dict):
+        """
+        Raises FlowError if request can never be satisfied by the pool.
+        """
+        for res, amount in request.items():
+            if res in self.capacity and amount > self.capacity[res]:
+                raise FlowError(f"Target {name} requires {amount} {res}, "
+                    f"but only {self.capacity[res]} are available.")
+
+    def shortage(self, request: dict) -> set:
+        """
+        Returns names of the resources of request that are currently not
+        available in sufficient amount.
+        """
+        return {res for res, amount in request.items()
+            if res in self.capacity and self.used[res] + amount > self.capacity[res]}
+
+    def acquire(self, request: dict):
+        for res, amount in request.items():
+            if res in self.capacity:
+                self.used[res] += amount
+
+    def release(self, request: dict):
+        for res, amount in request.items():
+            if res in self.capacity:
+                self.used[res] -= amount
+
+    def admit(self, candidates: list, slots: int) -> list:
+        """
+        Selects candidates to start and acquires their resources.
+
+        Candidates are considered in the given order. A candidate that does
+        not fit blocks the resources it is short of: candidates after it
+        that use one of these resources are not started either, so that
+        small requests cannot starve a large one.
+
+        Args:
+            candidates: List of (key, request) tuples in order of priority.
+            slots: Maximum number of candidates to start.
+
+        Returns:
+            List of keys of the started candidates.
+        """
+        started = []
+        blocked = set()
+        for key, request in candidates:
+            if len(started) >= slots:
+                break
+            if any((res in blocked) for res, amount in request.items() if amount > 0):
+                continue
+            short = self.shortage(request)
+            if short:
+                blocked |= short
+                continue
+            self.acquire(request)
+            started.append(key)
+        return started
@@ -1,10 +1,47 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+import sys
+import mmap
+import array
+import hashlib
 from pathlib import Path
-import json
 from datetime import datetime
 
+from .serialization import get_codec
+
+def is_ndarray(value) -> bool:
+    # numpy is optional. If value is a NumPy array, numpy was imported.
+    np = sys.modules.get("numpy")
+    return (np is not None) and isinstance(value, np.ndarray)
+
+def load_array(path: Path, typecode: str, byteorder: str):
+    """
+    Loads an array.array sidecar file as read-only memory-mapped memoryview.
+    Files written on a machine of different byte order are loaded as copied
+    array.array instead.
+    """
+    if byteorder != sys.byteorder:
+        arr = array.array(typecode, path.read_bytes())
+        arr.byteswap()
+        return arr
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"").cast(typecode)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast(typecode)
+
+class EncodedValue:
+    """
+    Attribute value of a Result that was loaded from JSON, but not yet
+    converted to Python objects.
+    """
+    __slots__ = ("raw",)
+
+    def __init__(self, raw):
+        self.raw = raw
+
 class Result:
     """
     Container for task output data.
@@ -15,6 +52,8 @@ class Result:
 
     Attributes can be assigned dynamically and support common Python types: str, bool, int,
     float, Path, datetime, as well as lists and dictionaries containing these types.
+    NumPy arrays and array.array objects are stored in binary sidecar files next to
+    result.json and are loaded as read-only memory-mapped arrays.
 
     Example of creating and returning a Result::
 
@@ -39,10 +78,21 @@ class Result:
 
     def __init__(self):
         """Initialize an empty Result object."""
-        self.__dict__["attrs"] = {}
+        self.__dict__["_attrs"] = {}
+        self.__dict__["_decode"] = None
+        self.__dict__["_lossy"] = False
+
+    @property
+    def attrs(self) -> dict:
+        """Dictionary of all attributes."""
+        self.decode_all()
+        return self._attrs
 
     def check_value(self, value):
         if isinstance(value, (list, tuple)):
+            if isinstance(value, tuple):
+                # Tuples are decoded as lists.
+                self.__dict__["_lossy"] = True
             for elem in value:
                 self.check_value(elem)
         elif isinstance(value, dict):
@@ -50,56 +100,168 @@ class Result:
                 if not isinstance(k, str):
                     raise ValueError(f"Attribute dict keys must be str.")
                 self.check_value(v)
+        elif is_ndarray(value):
+            if value.dtype.hasobject:
+                raise ValueError(f"Unsupported array dtype: {value.dtype}")
+        elif isinstance(value, array.array):
+            # Decoded as memoryview.
+            self.__dict__["_lossy"] = True
         elif not isinstance(value, self.supported_scalar_types):
             raise ValueError(f"Unsupported attribute type: {value}")
 
     def __setattr__(self, key, value):
         self.check_value(value)
-        self.attrs[key]=value
+        self._attrs[key]=value
 
     def __getattr__(self, key):
-        return self.attrs[key]
+        attrs = self.__dict__["_attrs"]
+        value = attrs[key]
+        if isinstance(value, EncodedValue):
+            value = self._decode(value.raw)
+            attrs[key] = value
+        return value
+
+    def decode_all(self):
+        """
+        Decodes all attributes that were not yet decoded after from_json.
+        """
+        for key, value in self._attrs.items():
+            if isinstance(value, EncodedValue):
+                self._attrs[key] = self._decode(value.raw)
 
-    def json(self, sess, block_id, task_id) -> str:
+    def json(self, sess, block_id, task_id, indent=2, sort_keys=False, codec=None) -> str:
+        """
+        Encodes Result as JSON string.
+
+        Args:
+            indent: Indentation, or None for compact JSON on a single line.
+            codec: Codec (see serialization), defaults to get_codec().
+        """
+        return self.encode(sess, block_id, task_id, indent, sort_keys, codec)[0]
+
+    def encode(self, sess, block_id, task_id, indent=2, sort_keys=False, codec=None,
+            sidecar_dir: Path=None) -> tuple[str, bool]:
+        """
+        Encodes Result as JSON string, like json().
+
+        Args:
+            sidecar_dir: Directory to which arrays are written as sidecar
+                files (result.<n>.npy for NumPy arrays, result.<n>.bin for
+                array.array), normally the directory of the target. If None,
+                arrays are represented by a digest of their content, which
+                cannot be decoded.
+
+        Returns:
+            Tuple of the JSON string and a bool that is True if from_json
+            returns a Result equal to this one. This is not the case if the
+            Result contains tuples, which are decoded as lists, relative
+            Paths, which are decoded relative to the build directory, or
+            array.array objects, which are decoded as memoryview.
+        """
+        # Paths in the build directory are stored relative to it. Comparing
+        # strings is much faster than Path.parents for large file lists.
+        build_dir_prefix = os.path.join(str(sess.build_dir), "")
+        exact = not self._lossy
+        sidecar_count = 0
+        def encode_array(obj, kind, ext, write, **info):
+            nonlocal sidecar_count
+            if sidecar_dir is None:
+                digest = hashlib.sha256(memoryview(obj).cast("B")).hexdigest()
+                return {"_type": kind, "sha256": digest, **info}
+            name = f"result.{sidecar_count}.{ext}"
+            sidecar_count += 1
+            write(sidecar_dir / name)
+            return {"_type": kind, "file": name, **info}
         def default(obj):
+            nonlocal exact
             if isinstance(obj, Path):
-                if sess.build_dir in obj.parents:
-                    obj = obj.relative_to(sess.build_dir)
-                return {"_type":"Path","value":str(obj)}
+                path_str = str(obj)
+                if path_str.startswith(build_dir_prefix):
+                    path_str = path_str[len(build_dir_prefix):]
+                elif not obj.is_absolute():
+                    exact = False
+                return {"_type":"Path","value":path_str}
             elif isinstance(obj, datetime):
                 return {"_type":"Time","value":obj.timestamp()}
+            elif isinstance(obj, EncodedValue):
+                # Undecoded values are already in their JSON representation.
+                return obj.raw
+            elif is_ndarray(obj):
+                import numpy as np
+                def write(path):
+                    np.save(path, obj, allow_pickle=False)
+                return encode_array(np.ascontiguousarray(obj), "NDArray", "npy", write,
+                    dtype=obj.dtype.str, shape=list(obj.shape))
+            elif isinstance(obj, array.array):
+                def write(path):
+                    with open(path, "wb") as f:
+                        obj.tofile(f)
+                return encode_array(obj, "Array", "bin", write,
+                    typecode=obj.typecode, byteorder=sys.byteorder)
             else:
-                return super().default(obj)
-                
-        e = json.JSONEncoder(indent=2, default=default)
-        return e.encode({
+                raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+        codec = codec or get_codec()
+        json_str = codec.dumps({
             "block_id":  block_id,
             "task_id": task_id,
-            "data":      self.attrs,
-        })
+            "data":      self._attrs,
+        }, default, indent=indent, sort_keys=sort_keys)
+        return json_str, exact
 
     @classmethod
-    def from_json(self, sess, json_str):
-        def object_hook(obj):
-            if not "_type" in obj:
-                return obj
-            t = obj["_type"]
+    def from_json(self, sess, json_str, codec=None):
+        """
+        Creates Result from JSON string, using codec (see serialization) or
+        get_codec().
+
+        Only the JSON syntax is parsed immediately. Conversion of the
+        attribute values to Path and datetime objects is deferred until an
+        attribute is accessed for the first time.
+
+        Returns:
+            Tuple of block_id, task_id and Result.
+        """
+        build_dir = sess.build_dir
+        task_dir = None
+        def decode(value):
+            if isinstance(value, list):
+                return [decode(v) for v in value]
+            elif not isinstance(value, dict):
+                return value
+            t = value.get("_type")
             if t == "Path":
-                return sess.build_dir / Path(obj["value"])
+                # Joining with an absolute path returns the absolute path.
+                return build_dir / value["value"]
             elif t == "Time":
-                return datetime.fromtimestamp(obj["value"])
+                return datetime.fromtimestamp(value["value"])
+            elif t in ("NDArray", "Array"):
+                if "file" not in value:
+                    raise ValueError("Array data was not stored.")
+                if t == "Array":
+                    return load_array(task_dir / value["file"], value["typecode"], value["byteorder"])
+                import numpy as np
+                # Empty files cannot be memory-mapped.
+                mmap_mode = "r" if all(value["shape"]) else None
+                return np.load(task_dir / value["file"], mmap_mode=mmap_mode, allow_pickle=False)
+            return {k: decode(v) for k, v in value.items()}
 
-        result_json = json.loads(json_str, object_hook=object_hook)
+        result_json = (codec or get_codec()).loads(json_str)
         
         assert set(result_json.keys()) == set(("block_id", "task_id", "data"))
 
         block_id  = result_json["block_id"]
         task_id = result_json["task_id"]
         attrs     = result_json["data"]
+        task_dir = build_dir / block_id / task_id
         
         res = Result()
+        res.__dict__["_decode"] = decode
         for k, v in attrs.items():
-            res.attrs[k] = v
+            if isinstance(v, (list, dict)):
+                res._attrs[k] = EncodedValue(v)
+            else:
+                res._attrs[k] = v
 
         return block_id, task_id, res
 
@@ -0,0 +1,251 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Duration estimates and critical-path priorities for BuildPlans.
+"""
+
+import os
+import json
+import heapq
+import threading
+import statistics
+
+from .target import TargetId
+from .resources import ResourcePool
+
+def format_duration(seconds: float) -> str:
+    """
+    Formats duration, e.g. "6h 05m", "5m 10s" or "12s".
+    """
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    elif seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    else:
+        return f"{seconds}s"
+
+def task_type(target) -> str:
+    """
+    Returns identifier of the task of target, which is shared by all
+    instances of the Block class.
+    """
+    cls = type(target.block)
+    return f"{cls.__module__}.{cls.__qualname__}.{target.id}"
+
+class DurationHistory:
+    """
+    Recent durations of targets and task types, stored as JSON file in the
+    build directory. Durations of targets that have never been run are
+    estimated from other instances of the same task.
+
+    The file is read on first use. Durations recorded during a session are
+    merged into the file by save(), so that concurrent sessions do not
+    overwrite each other's records.
+    """
+    keep = 5 # Number of durations kept per target / task type.
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.new_records = []
+
+    def empty(self) -> dict:
+        return {"version": self.version, "targets": {}, "types": {}}
+
+    def read(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self.empty()
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            return self.empty()
+        return data
+
+    def load(self):
+        if self.data is None:
+            self.data = self.read()
+
+    def apply(self, data: dict, tid_str: str, type_str: str, seconds: float):
+        for table, key in (data["targets"], tid_str), (data["types"], type_str):
+            durations = table.setdefault(key, [])
+            durations.append(seconds)
+            del durations[:-self.keep]
+
+    def record(self, target, seconds: float):
+        """
+        Records duration of a finished target.
+        """
+        rec = (str(target.target_id()), task_type(target), seconds)
+        with self.lock:
+            self.load()
+            self.apply(self.data, *rec)
+            self.new_records.append(rec)
+
+    def save(self):
+        """
+        Merges the durations recorded since the last save into the file.
+        """
+        with self.lock:
+            if not self.new_records:
+                return
+            data = self.read()
+            for rec in self.new_records:
+                self.apply(data, *rec)
+            self.new_records = []
+            self.data = data
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                # The history is only used for estimates.
+                pass
+
+    def estimate(self, target, result=None) -> float:
+        """
+        Returns estimated duration of target in seconds, or None if unknown.
+
+        Args:
+            target: Target
+            result: Present Result of target or None. Its duration is used
+                if the target has no recorded history.
+        """
+        with self.lock:
+            self.load()
+            durations = self.data["targets"].get(str(target.target_id()))
+            if durations:
+                return statistics.median(durations)
+            if result is not None:
+                try:
+                    return (result.time_finished - result.time_started).total_seconds()
+                except (KeyError, AttributeError, TypeError):
+                    pass
+            durations = self.data["types"].get(task_type(target))
+            if durations:
+                return statistics.median(durations)
+            return None
+
+class Schedule:
+    """
+    Estimated durations and critical-path priorities of the targets of a
+    BuildPlan.
+
+    The priority of a target is the estimated duration of the longest path
+    from the start of the target to the end of the plan (its bottom level).
+    Targets without duration estimate count as zero.
+
+    Attributes:
+        estimates: Dictionary mapping TargetId to estimated duration in
+            seconds or None.
+        priority: Dictionary mapping TargetId to length of the longest
+            remaining path in seconds.
+    """
+    def __init__(self, plan, history: DurationHistory):
+        sess = plan.sess
+        graph = sess.flow.graph()
+        self.plan = plan
+        self.sequence = plan.target_sequence
+        self.estimates = {}
+        for tid in self.sequence:
+            result = sess.results[tid] if tid in sess.results else None
+            self.estimates[tid] = history.estimate(sess.flow.target(tid), result)
+
+        in_plan = set(self.sequence)
+        self.deps = {}
+        self.dependents = {tid: [] for tid in self.sequence}
+        for tid in self.sequence:
+            deps = [graph.tids[d] for d in graph.deps[graph.index[tid]]]
+            self.deps[tid] = [d for d in deps if d in in_plan]
+            for dep in self.deps[tid]:
+                self.dependents[dep].append(tid)
+
+        self.priority = {}
+        self.next_on_path = {}
+        for tid in reversed(self.sequence):
+            best = None
+            for dependent in self.dependents[tid]:
+                if (best is None) or self.priority[dependent] > self.priority[best]:
+                    best = dependent
+            remaining = self.priority[best] if best else 0.0
+            self.priority[tid] = self.duration(tid) + remaining
+            self.next_on_path[tid] = best
+
+    def duration(self, tid: TargetId) -> float:
+        return self.estimates[tid] or 0.0
+
+    def unknown(self) -> list[TargetId]:
+        """
+        Returns targets without duration estimate.
+        """
+        return [tid for tid in self.sequence if self.estimates[tid] is None]
+
+    def critical_path(self) -> list[TargetId]:
+        """
+        Returns the longest chain of dependent targets of the plan.
+        """
+        starts = [tid for tid in self.sequence if not self.deps[tid]]
+        if not starts:
+            return []
+        tid = max(starts, key=lambda t: self.priority[t])
+        path = []
+        while tid:
+            path.append(tid)
+            tid = self.next_on_path[tid]
+        return path
+
+    def makespan(self, jobs: int=1, resources: dict=None) -> float:
+        """
+        Returns estimated total duration of the plan, simulating the
+        scheduling of ParallelExecutor with the given number of jobs and the
+        resource pool of the flow (updated with resources).
+        """
+        if jobs == 1:
+            return sum(self.duration(tid) for tid in self.sequence)
+        flow = self.plan.sess.flow
+        capacity = dict(flow.resources)
+        capacity.update(resources or {})
+        pool = ResourcePool(capacity)
+        requests = {tid: flow.target(tid).resources for tid in self.sequence}
+        order = {tid: idx for idx, tid in enumerate(self.sequence)}
+        pending = {tid: len(self.deps[tid]) for tid in self.sequence}
+        ready = [(-self.priority[tid], order[tid], tid) for tid in self.sequence if pending[tid] == 0]
+        running = [] # heap of (finish time, order, tid)
+        now = 0.0
+        while ready or running:
+            ready.sort()
+            candidates = [(entry, requests[entry[-1]]) for entry in ready]
+            for entry in pool.admit(candidates, jobs - len(running)):
+                ready.remove(entry)
+                tid = entry[-1]
+                heapq.heappush(running, (now + self.duration(tid), order[tid], tid))
+            if not running:
+                break
+            now, _, tid = heapq.heappop(running)
+            pool.release(requests[tid])
+            for dependent in self.dependents[tid]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append((-self.priority[dependent], order[dependent], dependent))
+        return now
+
+    def summary(self, jobs: int=1, resources: dict=None) -> str:
+        """
+        Returns text with estimated makespan and critical path.
+        """
+        makespan = self.makespan(jobs, resources)
+        lines = [f"Estimated makespan: {format_duration(makespan)} (jobs={jobs})"]
+        unknown = self.unknown()
+        if unknown:
+            lines.append(f"No duration history for {len(unknown)} of {len(self.sequence)} target(s).")
+        path = []
+        for tid in self.critical_path():
+            est = self.estimates[tid]
+            path.append(f"{tid} ({format_duration(est) if est is not None else '?'})")
+        lines.append("Critical path: " + " → ".join(path))
+        return "\n".join(lines)
@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+JSON codecs for result.json files.
+
+All codecs read and write the same JSON format, so result files written by
+one codec are read by every other codec. The orjson codec is used if orjson
+is installed, otherwise the json module of the standard library.
+"""
+
+import os
+import json
+import math
+
+def is_finite(obj) -> bool:
+    """
+    Returns False if obj is or contains (in dicts, lists or tuples) a NaN or
+    infinite float.
+    """
+    if isinstance(obj, float):
+        return math.isfinite(obj)
+    if isinstance(obj, dict):
+        return all(is_finite(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return all(is_finite(v) for v in obj)
+    return True
+
+class StdlibCodec:
+    """
+    Codec using the json module of the standard library.
+    """
+    name = "json"
+
+    def dumps(self, obj, default, indent: int=None, sort_keys: bool=False) -> str:
+        """
+        Encodes obj.
+
+        Args:
+            default: Function called for objects that cannot be encoded
+                natively, returning an encodable replacement.
+            indent: Number of spaces per level, or None for compact output
+                on a single line.
+            sort_keys: Sort keys of dictionaries.
+        """
+        return json.JSONEncoder(indent=indent, sort_keys=sort_keys, default=default).encode(obj)
+
+    def loads(self, json_str: str):
+        return json.loads(json_str)
+
+class OrjsonCodec(StdlibCodec):
+    """
+    Codec using orjson. Objects that orjson cannot encode, such as integers
+    exceeding 64 bits, are encoded with the standard library. This includes
+    NaN and infinite floats, which orjson would encode as null. Strings that
+    orjson cannot decode, such as NaN written by the standard library, are
+    decoded with the standard library as well.
+    """
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        # datetime objects are passed to default, like with the standard
+        # library, instead of being encoded as ISO strings.
+        self.options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS
+
+    def dumps(self, obj, default, indent: int=None, sort_keys: bool=False) -> str:
+        if indent not in (None, 2):
+            return super().dumps(obj, default, indent, sort_keys)
+        options = self.options
+        if indent:
+            options |= self.orjson.OPT_INDENT_2
+        if sort_keys:
+            options |= self.orjson.OPT_SORT_KEYS
+        # Replacements returned by default are kept, so that the standard
+        # library does not call default again for the same objects when
+        # falling back to it.
+        replaced = {}
+        def record_default(o):
+            r = default(o)
+            replaced[id(o)] = (o, r)
+            return r
+        def replay_default(o):
+            try:
+                return replaced[id(o)][1]
+            except KeyError:
+                return default(o)
+        try:
+            json_bytes = self.orjson.dumps(obj, default=record_default, option=options)
+        except self.orjson.JSONEncodeError:
+            return super().dumps(obj, replay_default, indent, sort_keys)
+        if b"null" in json_bytes and not (is_finite(obj)
+                and all(is_finite(r) for _, r in replaced.values())):
+            return super().dumps(obj, replay_default, indent, sort_keys)
+        return json_bytes.decode("utf-8")
+
+    def loads(self, json_str: str):
+        try:
+            return self.orjson.loads(json_str)
+        except self.orjson.JSONDecodeError:
+            return super().loads(json_str)
+
+codecs = {
+    "json": StdlibCodec,
+    "orjson": OrjsonCodec,
+}
+
+_default_codec = None
+
+def get_codec(name: str=None):
+    """
+    Returns codec by name ("json" or "orjson"). Without name, the
+    environment variable PYDESIGNFLOW_RESULT_CODEC selects the codec. If it
+    is not set, orjson is used if installed.
+    """
+    global _default_codec
+    name = name or os.environ.get("PYDESIGNFLOW_RESULT_CODEC")
+    if name:
+        try:
+            return codecs[name]()
+        except KeyError:
+            raise ValueError(f"Unknown result codec \"{name}\".") from None
+    if _default_codec is None:
+        try:
+            _default_codec = OrjsonCodec()
+        except ImportError:
+            _default_codec = StdlibCodec()
+    return _default_codec
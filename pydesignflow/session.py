@@ -1,17 +1,25 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-import shutil
-import tabulate
+import os
 import re
+import threading
+from pathlib import Path
+from collections.abc import MutableMapping
 from typing import Literal
 
 from .result import Result
 from .errors import ResultRequired
 from .target import TargetId
 from .ansiterm import NoColor
-
-tabulate.PRESERVE_WHITESPACE = True
+from .index import ResultIndex, IndexState, dir_mtime
+from .cache import TaskCache
+from .trace import NoTracer
+from .trash import Trash
+from .schedule import DurationHistory
+from .locks import TargetLocks
+from .serialization import get_codec
+from .compression import get_compressor
 
 def compact_docstr(docstr: str, maxlen=40, ellipsis="...") -> str:
     """
@@ -27,47 +35,185 @@ def compact_docstr(docstr: str, maxlen=40, ellipsis="...") -> str:
     return docstr
 
 class BuildPlan:
-    def __init__(self, sess, main_target: TargetId, target_sequence: list[TargetId]):
+    def __init__(self, sess, main_target: TargetId, target_sequence: list[TargetId],
+            rebuild: bool=False):
         self.sess = sess
         self.target_sequence = target_sequence
         self.main_target = main_target
+        self.rebuild = rebuild
 
     def missing_targets(self) -> bool:
         """
         Returns True if BuildPlan contains targets that are not the main_target
         and are not marked as always rebuild.
         """
-        def is_missing(tid):
-            if tid == self.main_target:
-                return False
-            target = self.sess.flow.target(tid)
-            if target.always_rebuild:
-                return False
-            return True
+        graph = self.sess.flow.graph()
+        main_idx = graph.index[self.main_target]
+        missing = []
+        for tid in self.target_sequence:
+            idx = graph.index[tid]
+            if idx != main_idx and not graph.always_rebuild[idx]:
+                missing.append(tid)
+        return missing
+
+    def if_missing(self, tid: TargetId) -> bool:
+        """
+        Returns True if tid is only part of the plan because its result was
+        missing, i.e. it is neither the main_target nor marked as always
+        rebuild, and dependencies are not rebuilt. Such targets are not
+        built if their result exists when they are run (see Target.run).
+        """
+        if self.rebuild or tid == self.main_target:
+            return False
+        return not self.sess.flow.target(tid).always_rebuild
 
-        return list(filter(is_missing, self.target_sequence))
+    def schedule(self) -> "Schedule":
+        """
+        Returns Schedule with duration estimates and critical path.
+        """
+        from .schedule import Schedule
+        return Schedule(self, self.sess.durations)
 
     def __repr__(self):
         status_list = [f" ‣ {tid.block_id}.{tid.task_id}" for tid in self.target_sequence] 
         return "\n".join(status_list)
 
-    def run(self, color=NoColor):
-        style = color.FgBrightBlue
-        reset = color.Reset
-        for tid in self.target_sequence:
-            print(f"{style}[PyDesignFlow]{reset} Running target {tid.block_id}.{tid.task_id}.")
-            target = self.sess.flow.target(tid)
-            target.run(self.sess)
-            print(f"{style}[PyDesignFlow]{reset} Finished target {tid.block_id}.{tid.task_id}.")
+    def run(self, color=NoColor, jobs: int=1, trace: Path=None, resources: dict=None,
+            executor="local", executor_options: dict=None):
+        """
+        Runs all targets of the plan.
+
+        Args:
+            color: NoColor or ANSITerm
+            jobs: Maximum number of targets that are run concurrently. With
+                jobs > 1, every target whose dependencies have finished is
+                started, and console output of each target is prefixed with
+                its name. Ready targets are started in the order of their
+                longest remaining path, estimated from the durations of
+                previous runs (see schedule).
+            trace: If given, a trace of the run is written to this file in
+                Chrome trace event format. Events are recorded by the Tracer
+                of the session. If the session has no Tracer, one is
+                created for the duration of the run.
+            resources: Resource pool entries that override the resource
+                pool of the flow for this run.
+            executor: Name of an executor or Executor subclass (see
+                executor.executor_class). "local" runs the targets in this
+                process. "workers" publishes the targets as leases in the
+                build directory, which are run by ``flow worker`` processes
+                (see workers). "slurm" submits the targets as batch jobs
+                (see batch). jobs and resources only apply to "local".
+            executor_options: Additional keyword arguments of the executor.
+        """
+        from .executor import executor_class
+        if isinstance(executor, str):
+            executor_cls = executor_class(executor)
+        else:
+            executor_cls = executor
+        sess = self.sess
+        prev_tracer = sess.tracer
+        if trace and isinstance(sess.tracer, NoTracer):
+            from .trace import Tracer
+            sess.tracer = Tracer()
+        tracer = sess.tracer
+        try:
+            with tracer.span("run", jobs=jobs, executor=executor_cls.__name__):
+                executor_cls(self, color=color, jobs=jobs, resources=resources,
+                    **(executor_options or {})).run()
+        finally:
+            sess.durations.save()
+            # One purge for the outputs of all rebuilt targets:
+            if sess.trash.pending():
+                sess.trash.purge_async()
+            sess.tracer = prev_tracer
+            if trace:
+                tracer.write(trace)
 
 
+class ResultMap(MutableMapping):
+    """
+    Mapping of TargetId to Result, which decodes results lazily.
+
+    Results can be added in their JSON form using set_encoded. Result.from_json
+    is only called when the result is accessed for the first time, while
+    checking whether a result exists is cheap.
+    """
+    def __init__(self, sess):
+        self.sess = sess
+        self.entries = {} # TargetId -> Result or JSON string
+
+    def set_encoded(self, tid: TargetId, json_str: str):
+        self.entries[tid] = json_str
+
+    def __getitem__(self, tid: TargetId) -> Result:
+        value = self.entries[tid]
+        if isinstance(value, str):
+            block_id_json, task_id_json, value = Result.from_json(self.sess, value, self.sess.codec)
+            assert block_id_json == tid.block_id
+            assert task_id_json == tid.task_id
+            self.entries[tid] = value
+        return value
+
+    def __setitem__(self, tid: TargetId, res: Result):
+        self.entries[tid] = res
+
+    def __delitem__(self, tid: TargetId):
+        del self.entries[tid]
+
+    def __contains__(self, tid):
+        return tid in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+_default_compressor = object() # Placeholder for compressor created on first use
+
 class BuildSession:
 
-    def __init__(self, flow, build_dir):
+    def __init__(self, flow, build_dir, tracer=None):
+        """
+        Args:
+            flow: Flow
+            build_dir: Build directory
+            tracer: Tracer recording trace events of the session, or None.
+        """
         self.flow = flow
         self.build_dir = build_dir
-        self.results = None # (block_id, task_id) -> Result map
-        self.reload_results()
+        self.tracer = tracer or NoTracer()
+        with self.tracer.span("session open"):
+            self.index = ResultIndex(build_dir)
+            self.index_lock = threading.Lock()
+            self.cache = TaskCache(flow.cache_dir, flow.cache_size_limit) # None disables the cache
+            self.trash = Trash(self.index.meta_dir)
+            self.durations = DurationHistory(self.index.meta_dir / "durations.json")
+            self.locks = TargetLocks(self.index.meta_dir / "locks")
+            self.codec = get_codec(flow.result_codec)
+            self.result_indent = None if flow.compact_results else 2
+            self._compressor = _default_compressor
+            if self.trash.pending():
+                # Resume purge that was interrupted.
+                self.trash.purge_async()
+            self.results = None # TargetId -> Result map (ResultMap)
+            self.reload_results()
+
+    @property
+    def compressor(self):
+        """
+        Compressor of task outputs (see compression), or None to disable
+        compression. It is created on first use, so that sessions that do
+        not compress outputs do not import zstandard or fail on an invalid
+        PYDESIGNFLOW_COMPRESSION.
+        """
+        if self._compressor is _default_compressor:
+            self._compressor = get_compressor(self.flow.compression)
+        return self._compressor
+
+    @compressor.setter
+    def compressor(self, compressor):
+        self._compressor = compressor
 
     def plan(self, block_id, task_id, build_dependencies:Literal[None, 'missing', 'all']=None) -> BuildPlan:
         """
@@ -77,9 +223,10 @@ class BuildSession:
         assert build_dependencies in (None, "missing", "all")
         requested_tid = TargetId(block_id, task_id)
         rebuild = (build_dependencies == "all")
-        target_list = self._dependency_list(requested_tid, rebuild)
-        plan = BuildPlan(self, requested_tid, target_list)
-        missing = plan.missing_targets()
+        with self.tracer.span("plan"):
+            target_list = self._dependency_list(requested_tid, rebuild)
+            plan = BuildPlan(self, requested_tid, target_list, rebuild)
+            missing = plan.missing_targets()
         if (not build_dependencies) and len(missing) > 0:
             raise ResultRequired(missing[0])
         return plan
@@ -87,59 +234,174 @@ class BuildSession:
     def _dependency_list(self, tid: TargetId, rebuild:bool) -> list[TargetId]:
         """
         Returns list of dependencies of target tid, including tid.
-        Performs topological sorting by depth-first search.
+        Performs topological sorting by depth-first search over the
+        dependency graph of the flow (see Flow.graph).
         Args:
             tid: target_id. Will not be included in output list.
             rebuild: Set to True to rebuild targets that are already present.
         """
-        # See https://guides.codepath.com/compsci/Topological-Sort
-
-        topo_order = []
-        visited = set()
-        def dfs(tid):
-            visited.add(tid)
-            target =  self.flow.target(tid)
-            for neighbor_tid in target.missing_requires(self, rebuild=rebuild):
-                if not (neighbor_tid in visited):
-                    dfs(neighbor_tid)
-            topo_order.append(tid)
-        dfs(tid)
-        return topo_order
-    
+        graph = self.flow.graph()
+        skip = bytearray(len(graph))
+        if not rebuild:
+            # Present results are skipped, unless their task is always_rebuild.
+            for present_tid in self.results:
+                idx = graph.index.get(present_tid)
+                if (idx is not None) and not graph.always_rebuild[idx]:
+                    skip[idx] = 1
+        order = graph.dependency_order(graph.index[tid], skip)
+        return [graph.tids[idx] for idx in order]
+
     def task_dir(self, block_id, task_id):
         return self.build_dir / block_id / task_id
 
-    def write_result(self, block_id, task_id, json_str):
+    def write_result(self, block_id, task_id, json_str, result: Result=None):
+        """
+        Writes result.json of a target and records it in the index.
+
+        Args:
+            json_str: Encoded result.
+            result: Result that was encoded to json_str. If given, it is
+                stored in the session as is, instead of decoding json_str
+                when the result is accessed.
+        """
         fn = self.task_dir(block_id, task_id) / "result.json"
-        with open(fn, "w") as f:
+        # Readers must never see a partially written result.json file:
+        tmp_fn = fn.with_name("result.json.tmp")
+        with open(tmp_fn, "w") as f:
             f.write(json_str)
+        os.replace(tmp_fn, fn)
 
-        loaded_block_id, loaded_task_id, loaded_result = Result.from_json(self, json_str)
-        
+        if result is None:
+            self.results.set_encoded(TargetId(block_id, task_id), json_str)
+        else:
+            self.results[TargetId(block_id, task_id)] = result
+        self.incomplete.discard(TargetId(block_id, task_id))
+        self.record([("R", block_id, task_id, ResultIndex.compact_json(json_str))])
 
-        assert loaded_task_id == task_id
-        assert loaded_block_id == block_id
+    def target_started(self, block_id, task_id):
+        """
+        Called by Target.run after the target directory was created.
+        """
+        self.incomplete.add(TargetId(block_id, task_id))
+        self.record([("S", block_id, task_id)] + self.index.mtime_records(block_id))
 
-        self.results[TargetId(block_id, task_id)] = loaded_result
+    def record(self, records: list[tuple]):
+        """
+        Applies records to the in-memory index state and appends them to the
+        index file. If the index file does not exist, it is written from
+        scratch.
+        """
+        with self.index_lock:
+            for r in records:
+                self.index_state.apply(*r)
+            if not self.index.append(records):
+                self.index.rewrite(self.index_state)
 
-    def reload_results(self):
-        self.results = {}
-        self.incomplete = set()
+    def read_target_dir(self, tid: TargetId) -> tuple[bool, str]:
+        """
+        Reads the state of a target from the build directory.
+
+        Returns:
+            Tuple of a bool indicating whether the target directory exists,
+            and the result JSON string or None if there is no result.
+        """
+        target_dir = self.task_dir(tid.block_id, tid.task_id)
+        try:
+            with open(target_dir / "result.json", "r") as f:
+                return True, ResultIndex.compact_json(f.read())
+        except FileNotFoundError:
+            return target_dir.exists(), None
+
+    def scan_block(self, block_id, state: IndexState):
+        """
+        Reads the state of all targets of a block from the build directory
+        into state.
+        """
+        block = self.flow[block_id]
+        for task_id in block.tasks:
+            tid = TargetId(block_id, task_id)
+            exists, json_str = self.read_target_dir(tid)
+            if exists:
+                state.entries[tid] = json_str
+
+    def refresh_target(self, tid: TargetId):
+        """
+        Re-reads the state of a single target from the build directory,
+        bypassing the index.
+        """
+        self.results.pop(tid, None)
+        self.incomplete.discard(tid)
+        exists, json_str = self.read_target_dir(tid)
+        if json_str is not None:
+            self.results.set_encoded(tid, json_str)
+        elif exists:
+            self.incomplete.add(tid)
+
+    def load_index(self) -> IndexState:
+        """
+        Loads the result index. If the index is missing, or if the build
+        directory was changed without updating the index, the build
+        directory is scanned and the index is rebuilt. If the build
+        directory is not writable, the scanned state is used without
+        updating the index.
+        """
+        state = self.index.load()
+        if (state is None) or (state.dir_mtimes.get("") != dir_mtime(self.build_dir)):
+            # Full rescan
+            try:
+                self.index.create_meta_dir()
+            except OSError:
+                pass
+            state = IndexState()
+            state.dir_mtimes[""] = dir_mtime(self.build_dir)
+            for block_id in self.flow:
+                state.dir_mtimes[block_id] = dir_mtime(self.build_dir / block_id)
+                self.scan_block(block_id, state)
+            try:
+                self.index.rewrite(state)
+            except OSError:
+                pass
+            return state
+
+        records = []
         for block_id in self.flow:
-            block = self.flow[block_id]
-            for task_id, task in block.tasks.items():
-                tid = TargetId(block_id, task_id)
-                target_dir = self.build_dir / block_id / task_id
-                result_json_fn = target_dir / "result.json"
-                if result_json_fn.exists():
-                    with open(result_json_fn, "r") as f:
-                        json_str = f.read()
-                    block_id_json, task_id_json, res = Result.from_json(self, json_str)
-                    assert block_id_json == block_id
-                    assert task_id_json == task_id
-                    self.results[tid] = res        
-                elif target_dir.exists():
-                    self.incomplete.add(tid)            
+            mtime = dir_mtime(self.build_dir / block_id)
+            if state.dir_mtimes.get(block_id) == mtime:
+                continue
+            # Rescan of a single block
+            block_state = IndexState()
+            self.scan_block(block_id, block_state)
+            records.append(("D", block_id, ""))
+            for tid, json_str in block_state.entries.items():
+                if json_str is None:
+                    records.append(("S", tid.block_id, tid.task_id))
+                else:
+                    records.append(("R", tid.block_id, tid.task_id, json_str))
+            records.append(("M", block_id, "", mtime or ""))
+        size = state.size
+        for r in records:
+            state.apply(*r)
+        try:
+            compacted = self.index.needs_compaction(state) \
+                and self.index.rewrite(state, expected_size=size)
+            if records and not compacted:
+                self.index.append(records)
+        except OSError:
+            pass
+        return state
+
+    def reload_results(self):
+        with self.tracer.span("reload_results"):
+            self.index_state = self.load_index()
+            self.results = ResultMap(self)
+            self.incomplete = set()
+            for tid, json_str in self.index_state.entries.items():
+                if not self.flow.has_target(tid):
+                    continue
+                if json_str is None:
+                    self.incomplete.add(tid)
+                else:
+                    self.results.set_encoded(tid, json_str)
 
     def get_result(self, result_id):
         try:
@@ -160,25 +422,42 @@ class BuildSession:
             assert i.find("..") < 0
             assert i.find("/") < 0
 
+        # Directories are moved to the trash and deleted in the background.
         if block_id and task_id:
-            shutil.rmtree(self.build_dir / block_id / task_id, ignore_errors=True)
+            self.trash.move(self.build_dir / block_id / task_id)
+            self.record([("D", block_id, task_id)] + self.index.mtime_records(block_id))
         elif block_id:
-            shutil.rmtree(self.build_dir / block_id, ignore_errors=True)
+            self.trash.move(self.build_dir / block_id)
+            self.record([("D", block_id, "")] + self.index.mtime_records(block_id))
         else:
             assert not task_id
-            # Remote all results
-            shutil.rmtree(self.build_dir, ignore_errors=True)
+            # Remove all results and the index. The directory holding the
+            # index also holds the trash and is kept.
+            if self.build_dir.exists():
+                for path in self.build_dir.iterdir():
+                    if path != self.index.meta_dir:
+                        self.trash.move(path, purge=False)
+                self.trash.purge_async()
+            try:
+                os.unlink(self.index.path)
+            except FileNotFoundError:
+                pass
         self.reload_results()
 
-    def status_block(self, block_id:str, show_hidden:bool=True, show_targets:bool=False, color=NoColor):
-        
+    def status_block(self, block_id:str, show_hidden:bool=True, show_targets:bool=False, color=NoColor, running:set=frozenset()):
+        """
+        Args:
+            running: Targets that are currently built (see TargetLocks.running).
+        """
         block = self.flow[block_id]
         yield [color.FgBlue+block_id+color.Reset, "",
             color.FgBlue+compact_docstr(block.__doc__)+color.Reset]
         for task_id, task in block.tasks.items():
             tid = TargetId(block_id, task_id)
             target = self.flow.target(tid)
-            if tid in self.results:
+            if tid in running:
+                status = color.FgCyan + "running" + color.Reset
+            elif tid in self.results:
                 if (not show_hidden) and task.hidden and task.always_rebuild:
                     continue
                 res=self.get_result(tid)
@@ -204,17 +483,22 @@ class BuildSession:
                 When true, only first column is returned and no table headers,
                 i.e. only block and task names without status information.
         """
+        # Targets with lock file are running, unless the heartbeat of the
+        # lock has expired, in which case they are shown as incomplete.
+        running = self.locks.running()
         if block_id:
-            status_list = list(self.status_block(block_id, show_hidden=True, show_targets=True, color=color))
+            status_list = list(self.status_block(block_id, show_hidden=True, show_targets=True, color=color, running=running))
         else:
             status_list = []
             for block_id in self.flow:
-                status_list += list(self.status_block(block_id, show_targets=show_hidden, show_hidden=False, color=color))
+                status_list += list(self.status_block(block_id, show_targets=show_hidden, show_hidden=False, color=color, running=running))
         
 
         if brief:
             return "\n".join([row[0] for row in status_list])
         else:
+            import tabulate
+            tabulate.PRESERVE_WHITESPACE = True
             header = [["Target", "Status", "Help"]]
             table = header + status_list
             return tabulate.tabulate(table, headers="firstrow", tablefmt="simple")
@@ -43,9 +43,57 @@ They should both do roughly the same.
 """
 
 
+def use_snapshot(args: list[str]) -> bool:
+    """
+    Returns True if the command can be answered from a FlowSnapshot.
+    """
+    if os.environ.get("PYDESIGNFLOW_NO_SNAPSHOT"):
+        return False
+    if "_ARGCOMPLETE" in os.environ:
+        return True
+    from .cli import CLI
+    return CLI.is_status_query(args)
+
+def use_daemon(args: list[str]) -> bool:
+    """
+    Returns True if the command can be answered by a daemon (flow --daemon).
+    """
+    if os.environ.get("PYDESIGNFLOW_NO_DAEMON") or "_ARGCOMPLETE" in os.environ:
+        return False
+    from .cli import CLI
+    return CLI.is_daemon_query(args)
+
 def main():
     warnings.simplefilter('always', DeprecationWarning)
 
+    prog = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+
+    if "--daemon" in args:
+        from .daemon import FlowDaemon
+        if not (Path.cwd() / "flow" / "__init__.py").exists() and not (Path.cwd() / "flow.py").exists():
+            print("Error: Could not import flow module.")
+            print("Ensure that your working directory has either flow.py or flow/__init__.py.")
+            sys.exit(1)
+        FlowDaemon(Path.cwd(), lambda: import_flow()).serve()
+        return
+
+    if use_daemon(args):
+        from .daemon import request
+        reply = request(Path.cwd(), args, sys.stdout.isatty())
+        if reply:
+            sys.stdout.write(reply["stdout"])
+            sys.stderr.write(reply["stderr"])
+            sys.stdout.flush()
+            sys.exit(reply["exit"])
+
+    if use_snapshot(args):
+        from .snapshot import load_snapshot
+        snap = load_snapshot(Path.cwd())
+        if snap:
+            snap.cli_main(args)
+            return
+
     try:
         flow = import_flow()
     except FileNotFoundError:
@@ -53,8 +101,11 @@ def main():
         print("Ensure that your working directory has either flow.py or flow/__init__.py.")
         sys.exit(1)
 
-    prog = os.path.basename(sys.argv[0])
-    args = sys.argv[1:]
+    if not os.environ.get("PYDESIGNFLOW_NO_SNAPSHOT"):
+        from .snapshot import load_snapshot, save_snapshot
+        if not (flow.flow.snapshot and load_snapshot(Path.cwd())):
+            save_snapshot(flow.flow, Path.cwd())
+
     flow.flow.cli_main(args)
 
 
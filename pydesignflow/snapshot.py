@@ -0,0 +1,248 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Cached snapshot of the structure of a Flow.
+
+Importing a flow package executes all of its code, including Block
+constructors and setup methods. For shell completion and status queries,
+only the names, flags, docstrings and dependencies of blocks and tasks are
+needed. These are stored in a snapshot file after each import of the flow,
+together with the settings of the Flow that BuildSessions use.
+
+The snapshot is valid as long as the modification times of the source files
+of the flow and of the installed packages it imported are unchanged, and
+the Python installation (sys.prefix) is the same. Other inputs that the
+structure of a flow may depend on, such as environment variables or
+directory scans, are not detected. Flows that depend on them can disable the
+snapshot with Flow(snapshot=False).
+"""
+
+import os
+import sys
+import json
+import sysconfig
+from pathlib import Path
+
+from .target import TargetId
+from .paths import default_cache_dir
+
+class TaskSnapshot:
+    """
+    Stand-in for a Target in a FlowSnapshot.
+    """
+    def __init__(self, doc, hidden, always_rebuild, requires):
+        self.__doc__ = doc
+        self.hidden = hidden
+        self.always_rebuild = always_rebuild
+        self.requires = requires # dict: key -> "block_id.task_id"
+
+    def resolve_requires(self):
+        for key, spec in self.requires.items():
+            yield key, TargetId(*spec.split(".", 1))
+
+class BlockSnapshot:
+    """
+    Stand-in for a Block in a FlowSnapshot.
+    """
+    def __init__(self, doc, tasks):
+        self.__doc__ = doc
+        self.tasks = tasks # dict: task_id -> TaskSnapshot
+
+class FlowSnapshot:
+    """
+    Structure of a Flow (blocks, tasks and their dependencies) without the
+    code of the flow. It provides the parts of the Flow interface that are
+    required for status queries and shell completion.
+    """
+    version = 2
+
+    # Flow attributes stored in the snapshot.
+    settings = ("hide_subprocess_errors", "cache_size_limit", "resources",
+        "result_codec", "compact_results", "compression")
+
+    def __init__(self, blocks, sources, cache_dir, prefix=None, hide_subprocess_errors=True,
+            cache_size_limit=None, resources=None, result_codec=None, compact_results=False,
+            compression=None):
+        self.blocks = blocks # dict: block_id -> BlockSnapshot
+        self.sources = sources # dict: filename -> mtime_ns
+        self.prefix = prefix # sys.prefix of the Python installation
+        self.cache_dir = Path(cache_dir)
+        self.hide_subprocess_errors = hide_subprocess_errors
+        self.cache_size_limit = cache_size_limit
+        self.resources = resources or {}
+        self.result_codec = result_codec
+        self.compact_results = compact_results
+        self.compression = compression
+        self._graph = None
+
+    @classmethod
+    def from_flow(cls, flow, base_dir: Path):
+        """
+        Creates snapshot of flow. All loaded modules from base_dir and from
+        outside the standard library, e.g. installed packages, are
+        considered sources of the flow.
+        """
+        blocks = {}
+        for block_id in flow:
+            block = flow[block_id]
+            tasks = {}
+            for task_id, target in block.tasks.items():
+                tasks[task_id] = TaskSnapshot(
+                    doc=target.__doc__,
+                    hidden=target.hidden,
+                    always_rebuild=target.always_rebuild,
+                    requires={k: str(tid) for k, tid in target.resolve_requires()},
+                )
+            blocks[block_id] = BlockSnapshot(block.__doc__, tasks)
+        sources = {}
+        stdlib_dirs = {Path(sysconfig.get_path(name)).resolve() for name in ("stdlib", "platstdlib")}
+        for module in list(sys.modules.values()):
+            filename = getattr(module, "__file__", None)
+            if not filename:
+                continue
+            path = Path(filename).resolve()
+            if base_dir in path.parents or not is_stdlib(path, stdlib_dirs):
+                try:
+                    sources[str(path)] = path.stat().st_mtime_ns
+                except OSError:
+                    pass
+        settings = {name: getattr(flow, name) for name in cls.settings}
+        return cls(blocks, sources, flow.cache_dir, sys.prefix, **settings)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "version": self.version,
+            "sources": self.sources,
+            "prefix": self.prefix,
+            "cache_dir": str(self.cache_dir),
+            "settings": {name: getattr(self, name) for name in self.settings},
+            "blocks": {
+                block_id: {
+                    "doc": block.__doc__,
+                    "tasks": {
+                        task_id: {
+                            "doc": task.__doc__,
+                            "hidden": task.hidden,
+                            "always_rebuild": task.always_rebuild,
+                            "requires": task.requires,
+                        } for task_id, task in block.tasks.items()
+                    }
+                } for block_id, block in self.blocks.items()
+            }
+        })
+
+    @classmethod
+    def from_json(cls, json_str):
+        data = json.loads(json_str)
+        if data.get("version") != cls.version:
+            raise ValueError("Unsupported snapshot version.")
+        blocks = {}
+        for block_id, block in data["blocks"].items():
+            tasks = {task_id: TaskSnapshot(**task) for task_id, task in block["tasks"].items()}
+            blocks[block_id] = BlockSnapshot(block["doc"], tasks)
+        return cls(blocks, data["sources"], data["cache_dir"], data["prefix"], **data["settings"])
+
+    def is_current(self) -> bool:
+        """
+        Returns True if none of the source files has changed and the Python
+        installation is the same.
+        """
+        if len(self.sources) < 1 or self.prefix != sys.prefix:
+            return False
+        for filename, mtime in self.sources.items():
+            try:
+                if os.stat(filename).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    # Flow interface:
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __getitem__(self, key):
+        return self.blocks[key]
+
+    def target(self, tid: TargetId) -> TaskSnapshot:
+        return self.blocks[tid.block_id].tasks[tid.task_id]
+
+    def has_target(self, tid: TargetId) -> bool:
+        if not self.has_block(tid.block_id):
+            return False
+        return tid.task_id in self.blocks[tid.block_id].tasks
+
+    def has_block(self, block_id: str) -> bool:
+        return block_id in self.blocks
+
+    def graph(self):
+        if self._graph is None:
+            from .graph import FlowGraph
+            self._graph = FlowGraph(self)
+        return self._graph
+
+    def session_at(self, build_dir, tracer=None):
+        from .session import BuildSession
+        return BuildSession(self, build_dir, tracer)
+
+    def cli_main(self, args: list[str], prog="flow") -> None:
+        from .cli import CLI
+        CLI(self).main(args, prog)
+
+def is_stdlib(path: Path, stdlib_dirs: set[Path]) -> bool:
+    """
+    Returns True if path is in one of the standard library directories
+    stdlib_dirs, but not in a site-packages directory within them.
+    """
+    if "site-packages" in path.parts or "dist-packages" in path.parts:
+        return False
+    return not stdlib_dirs.isdisjoint(path.parents)
+
+def snapshot_path(base_dir: Path) -> Path:
+    """
+    Returns the location of the snapshot file for the flow in base_dir.
+    """
+    import hashlib
+    digest = hashlib.sha256(str(base_dir.resolve()).encode()).hexdigest()[:16]
+    return default_cache_dir() / "snapshots" / f"{digest}.json"
+
+def load_snapshot(base_dir: Path) -> FlowSnapshot:
+    """
+    Returns:
+        Current FlowSnapshot of the flow in base_dir, or None if no
+        snapshot exists or the flow sources have changed.
+    """
+    try:
+        with open(snapshot_path(base_dir), "r") as f:
+            snap = FlowSnapshot.from_json(f.read())
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not snap.is_current():
+        return None
+    return snap
+
+def save_snapshot(flow, base_dir: Path):
+    """
+    Writes snapshot of flow, which was imported from base_dir. If the flow
+    has disabled snapshots (Flow(snapshot=False)), an existing snapshot is
+    removed instead.
+    """
+    path = snapshot_path(base_dir)
+    if not flow.snapshot:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        return
+    snap = FlowSnapshot.from_flow(flow, base_dir.resolve())
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            f.write(snap.to_json())
+        os.replace(tmp_path, path)
+    except OSError:
+        # The snapshot is only an optimization.
+        pass
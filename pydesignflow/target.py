@@ -2,17 +2,48 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import re
-import shutil
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import FrozenInstanceError
 
 from .errors import FlowError
 from .result import Result
 
-@dataclass(frozen=True, eq=True)
 class TargetId:
-    block_id: str
-    task_id: str
+    """
+    Immutable identifier of a target (block_id, task_id).
+
+    This was a frozen dataclass. It is written out by hand to use __slots__
+    (dataclass(slots=True) requires Python 3.10), as large flows hold many
+    TargetIds.
+    """
+    __slots__ = ("block_id", "task_id", "_hash")
+
+    def __init__(self, block_id: str, task_id: str):
+        object.__setattr__(self, "block_id", block_id)
+        object.__setattr__(self, "task_id", task_id)
+        object.__setattr__(self, "_hash", hash((block_id, task_id)))
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.block_id, self.task_id) == (other.block_id, other.task_id)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"TargetId(block_id={self.block_id!r}, task_id={self.task_id!r})"
+
+    def __reduce__(self):
+        return (TargetId, (self.block_id, self.task_id))
 
     def __str__(self):
         return f"{self.block_id}.{self.task_id}"
@@ -27,6 +58,14 @@ def parse_requirement_spec(spec):
 
     return is_direct_ref, block_ref, task_id
 
+def parse_requirements(requires: dict[str, str]) -> tuple:
+    """
+    Returns:
+        Tuple of (key, is_direct_ref, block_ref, task_id) tuples for the
+        requires dictionary of a task.
+    """
+    return tuple((k, *parse_requirement_spec(v)) for k, v in requires.items())
+
 class TargetPrototype:
     """
     TargetPrototypes exist once per class. They are created from the @task
@@ -40,28 +79,52 @@ class TargetPrototype:
     This is only a problem if there are multiple instances of the same Target
     e.g. due to multiple instances of a block.
     """
-    def __init__(self, func, requires, always_rebuild, hidden):
+    def __init__(self, func, requires, always_rebuild, hidden, cache=False, resources=None,
+            compress=None):
         self.func = func
         self.requires = requires
         self.always_rebuild = always_rebuild
         self.hidden = hidden
+        self.cache = cache
+        self.resources = resources or {}
+        self.compress = tuple(compress or ())
+        self._parsed_requires = None
+
+    def parse_requires(self) -> tuple:
+        """
+        Returns:
+            Tuple of (key, is_direct_ref, block_ref, task_id) tuples. The
+            requirement specs are only parsed once.
+        """
+        if self._parsed_requires is None:
+            self._parsed_requires = parse_requirements(self.requires)
+        return self._parsed_requires
 
     def create(self):
-        return Target(self.func, self.requires, self.always_rebuild, self.hidden)
+        return Target(self.func, self.requires, self.always_rebuild, self.hidden,
+            self.cache, self.parse_requires(), self.resources, self.compress)
 
 class Target:
+    __slots__ = ("func", "requires", "block", "id", "always_rebuild", "hidden",
+        "cache", "resources", "compress", "_registered", "_parsed_requires")
+
     @property
     def __doc__(self):
         return self.func.__doc__
 
-    def __init__(self, func, requires, always_rebuild, hidden):
+    def __init__(self, func, requires, always_rebuild, hidden, cache=False,
+            parsed_requires=None, resources=None, compress=()):
         self.func = func
         self.requires = requires
         self.block = None
         self.id = None
         self.always_rebuild = always_rebuild
         self.hidden = hidden
+        self.cache = cache
+        self.resources = resources or {}
+        self.compress = compress
         self._registered = False
+        self._parsed_requires = parsed_requires
 
     def register(self, block, task_id):
         """
@@ -74,10 +137,10 @@ class Target:
         self._registered = True
 
     def parse_requires(self):
-        for k, v in self.requires.items():
-            is_direct_ref, block_ref, task_id = parse_requirement_spec(v)
-            yield k, is_direct_ref, block_ref, task_id
-        
+        if self._parsed_requires is None:
+            self._parsed_requires = parse_requirements(self.requires)
+        return self._parsed_requires
+
     def resolve_requires(self):
         for key, is_direct_ref, block_ref, task_id in self.parse_requires():
             if is_direct_ref:
@@ -107,18 +170,68 @@ class Target:
     def target_id(self):
         return TargetId(self.block.id, self.id)
 
-    def run(self, sess):
+    def run(self, sess, if_missing: bool=False):
+        """
+        Runs the target while holding its lock (see locks). If another
+        process is building the target, its result is used once it has
+        finished instead of building the target again.
+
+        Args:
+            if_missing: True if the target is only run because its result
+                was missing when the build was planned. The target is not
+                built if a result exists once the lock is held, e.g. because
+                another process built it in the meantime.
+        """
+        tid = self.target_id()
+        def on_wait(owner):
+            print(f"Waiting for target {tid}, which is being built by {owner}.")
+        with sess.locks.hold(tid, on_wait=on_wait) as waited:
+            if waited or if_missing:
+                sess.refresh_target(tid)
+                if tid in sess.results:
+                    print(f"Using result of target {tid} built by other process.")
+                    return
+            self.build(sess)
+
+    def build(self, sess):
         cwd = sess.task_dir(self.block.id, self.id)
+        tracer = sess.tracer
 
-        shutil.rmtree(cwd, ignore_errors=True)
+        with tracer.span("rmtree", cat="target"):
+            # The previous output is deleted in the background after the
+            # build (see BuildPlan.run).
+            sess.trash.move(cwd, purge=False)
 
         cwd.mkdir(parents=True, exist_ok=True)
+        sess.target_started(self.block.id, self.id)
+
+        with tracer.span("load dependencies", cat="target"):
+            kwargs = self.dependency_results(sess)
 
-        kwargs = self.dependency_results(sess)
+        block_id = self.block.id
+        task_id = self.id
+        cache_key = None
+        if self.cache and sess.cache:
+            from .cache import CacheKeyError
+            with tracer.span("cache restore", cat="target"):
+                try:
+                    cache_key = sess.cache.key(self, sess)
+                except CacheKeyError as e:
+                    print(f"Warning: Not caching {block_id}.{task_id}: {e}")
+                    json_str = None
+                else:
+                    json_str = sess.cache.restore(cache_key, cwd)
+            if json_str is not None:
+                print(f"Restored {block_id}.{task_id} from cache.")
+                sess.write_result(block_id, task_id, json_str)
+                return
 
-        time_started = datetime.now()
-        res = self.func(self.block, cwd, **kwargs)
-        time_finished = datetime.now()
+        with tracer.span("task", cat="target"), \
+                tracer.sample_resources(f"{block_id}.{task_id}") as usage:
+            time_started = datetime.now()
+            res = self.func(self.block, cwd, **kwargs)
+            time_finished = datetime.now()
+        sess.durations.record(self, (time_finished - time_started).total_seconds())
         if res:
             res.returned_data = True
         else:
@@ -126,7 +239,28 @@ class Target:
             res.returned_data = False
         res.time_started = time_started
         res.time_finished = time_finished
-        block_id = self.block.id
-        task_id = self.id
-        json_str = res.json(sess, block_id, task_id)
-        sess.write_result(block_id, task_id, json_str)
+        if usage.peak_rss is not None:
+            res.peak_cpu_percent = usage.peak_cpu_percent
+            res.peak_rss = usage.peak_rss
+        if cache_key:
+            res.cache_key = cache_key
+        if self.compress and sess.compressor:
+            from .compression import compress_outputs, format_size
+            with tracer.span("compress", cat="target"):
+                stats = compress_outputs(cwd, self.compress, sess.compressor)
+            res.compression = stats
+            if stats["files"]:
+                saved = format_size(stats["bytes_in"] - stats["bytes_out"])
+                print(f"Compressed {stats['files']} output(s) of {block_id}.{task_id}, saved {saved}.")
+        with tracer.span("serialize result", cat="target"):
+            json_str, exact = res.encode(sess, block_id, task_id, indent=sess.result_indent,
+                codec=sess.codec, sidecar_dir=cwd)
+        if cache_key:
+            with tracer.span("cache store", cat="target"):
+                try:
+                    sess.cache.store(cache_key, cwd, json_str)
+                except OSError as e:
+                    print(f"Warning: Could not store {block_id}.{task_id} in cache: {e}")
+        with tracer.span("write result", cat="target"):
+            # The Result is kept in memory unless decoding would change it.
+            sess.write_result(block_id, task_id, json_str, res if exact else None)
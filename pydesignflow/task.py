@@ -5,7 +5,8 @@ from warnings import warn
 
 from .target import TargetPrototype
 
-def task(requires:dict[str,str]={}, always_rebuild=False, hidden=False):
+def task(requires:dict[str,str]={}, always_rebuild=False, hidden=False, cache=False,
+        resources:dict[str,float]=None, compress:list[str]=None):
     """
     Decorator for defining tasks within a Block.
 
@@ -19,6 +20,19 @@ def task(requires:dict[str,str]={}, always_rebuild=False, hidden=False):
         always_rebuild: If True, this task is always rebuilt when it is a dependency of another
             task, even if a result already exists. Defaults to False.
         hidden: If True, the task is not shown in CLI help or status output. Defaults to False.
+        cache: If True, the outputs of the task are stored in a content-addressed cache.
+            When the task is run again with the same task code, Block constructor
+            parameters and dependency results, its outputs are restored from the cache
+            instead of running the task. Defaults to False.
+        resources: Dictionary of resources used by the task while it runs, e.g.
+            ``{'cpus': 8, 'mem_gb': 120, 'license:innovus': 1}``. In parallel builds,
+            the task is only started when these resources are available in the
+            resource pool of the Flow. Defaults to no resources.
+        compress: List of glob patterns relative to the task directory, e.g.
+            ``['*.log', 'reports/**/*.rpt']``. Matching outputs are compressed
+            after the task has finished (see compression). Paths to compressed
+            outputs can be opened with compression.open_output. Defaults to no
+            compression.
 
     Returns:
         Decorator function that converts the method into a task.
@@ -41,6 +55,9 @@ def task(requires:dict[str,str]={}, always_rebuild=False, hidden=False):
         requires=requires,
         always_rebuild=always_rebuild,
         hidden=hidden,
+        cache=cache,
+        resources=resources,
+        compress=compress,
     )
 
 def action(*args, **kwargs):
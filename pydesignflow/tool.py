@@ -0,0 +1,233 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Running external tools from tasks (see Block.run_tool).
+
+The output of the tool (stdout and stderr, merged into one pipe to
+preserve the order of lines) is read by a thread and written to a
+gzip-compressed log file in the directory of the target. Only a bounded
+number of lines is kept in memory: the last lines of the output (tail),
+which are shown when the tool fails, and a buffer of lines that are
+waiting to be echoed to the console. Echo to the console is rate-limited,
+so that tools printing millions of lines are not slowed down by the
+terminal. Lines that are not echoed are only counted.
+
+Lines are echoed by the thread that called run_tool, so that they are
+prefixed with the target name in parallel builds.
+"""
+
+import sys
+import gzip
+import time
+import shlex
+import threading
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass
+from collections import deque
+
+MAX_LINE = 1 << 20 # Longer lines are split in the tail and echo.
+
+class ToolError(subprocess.CalledProcessError):
+    """
+    Raised by run_tool if a tool exits with non-zero return code.
+
+    Attributes:
+        log: Path of the log file.
+        tail: Last lines of the output.
+    """
+    def __init__(self, returncode: int, cmd: list[str], log: Path, tail: list[str]):
+        super().__init__(returncode, cmd, output="\n".join(tail))
+        self.log = log
+        self.tail = tail
+
+    def __str__(self):
+        return f"{super().__str__()} See log {self.log}."
+
+@dataclass
+class ToolRun:
+    """
+    Outcome of run_tool.
+
+    Attributes:
+        cmd: Command.
+        returncode: Exit code of the tool.
+        log: Path of the gzip-compressed log file.
+        lines: Number of lines of output.
+        tail: Last lines of the output.
+    """
+    cmd: list[str]
+    returncode: int
+    log: Path
+    lines: int
+    tail: list[str]
+
+def log_path(cwd: Path, cmd: list[str]) -> Path:
+    """
+    Returns a path for a new log file of cmd in cwd: <tool>.log.gz, or
+    <tool>.<n>.log.gz if the tool was run before.
+    """
+    name = Path(cmd[0]).name
+    path = cwd / f"{name}.log.gz"
+    n = 2
+    while path.exists():
+        path = cwd / f"{name}.{n}.log.gz"
+        n += 1
+    return path
+
+class OutputPump:
+    """
+    Reads output pipes of a process and distributes the lines to the log
+    file, the tail and the echo buffer.
+
+    Attributes:
+        error: Exception raised while reading a pipe, e.g. while writing the
+            log file, or None.
+    """
+    def __init__(self, log_file, tail_lines: int, echo_buffer: int, block: bool):
+        self.log_file = log_file
+        self.tail = deque(maxlen=tail_lines)
+        self.lines = 0
+        self.echo = deque()
+        self.echo_buffer = echo_buffer # 0 disables echo
+        self.block = block # Wait for echo instead of dropping lines.
+        self.dropped = 0
+        self.open_pipes = 0
+        self.error = None
+        self.cond = threading.Condition()
+
+    def add_lines(self, lines: list[bytes], data: bytes):
+        with self.cond:
+            self.log_file.write(data)
+            self.lines += len(lines)
+            self.tail.extend(lines[-self.tail.maxlen:])
+            if not self.echo_buffer:
+                return
+            while lines:
+                room = self.echo_buffer - len(self.echo)
+                if room <= 0 and self.block:
+                    self.cond.wait()
+                    continue
+                self.echo.extend(lines[:room])
+                self.dropped += len(lines[room:])
+                self.cond.notify_all()
+                break
+
+    def pump(self, pipe):
+        try:
+            pending = b""
+            while True:
+                chunk = pipe.read1(65536)
+                if not chunk:
+                    break
+                *lines, rest = (pending + chunk).split(b"\n")
+                if lines:
+                    self.add_lines(lines, b"\n".join(lines) + b"\n")
+                pending = rest
+                if len(pending) > MAX_LINE:
+                    self.add_lines([pending], pending + b"\n")
+                    pending = b""
+            if pending:
+                self.add_lines([pending], pending + b"\n")
+        except BaseException as e:
+            self.error = e
+        finally:
+            # Closing the pipe stops the process on its next write if the
+            # pipe was not read to the end.
+            pipe.close()
+            with self.cond:
+                self.open_pipes -= 1
+                self.cond.notify_all()
+
+    def start(self, pipes) -> list[threading.Thread]:
+        self.open_pipes = len(pipes)
+        threads = [threading.Thread(target=self.pump, args=(p,), daemon=True) for p in pipes]
+        for t in threads:
+            t.start()
+        return threads
+
+    def echo_lines(self, out, rate: float, log: Path):
+        """
+        Writes lines from the echo buffer to out until all pipes are closed,
+        at most rate lines per second (None: unlimited).
+        """
+        tokens = rate or 0.0
+        last = time.monotonic()
+        last_report = last
+        omitted = 0
+        while True:
+            with self.cond:
+                if not self.echo and self.open_pipes > 0:
+                    self.cond.wait(0.5)
+                lines = list(self.echo)
+                self.echo.clear()
+                omitted += self.dropped
+                self.dropped = 0
+                finished = (self.open_pipes == 0) and not self.echo
+                self.cond.notify_all()
+            if rate is not None:
+                now = time.monotonic()
+                tokens = min(rate, tokens + (now - last) * rate)
+                last = now
+                shown = int(tokens)
+                tokens -= min(shown, len(lines))
+                omitted += len(lines[shown:])
+                lines = lines[:shown]
+            for line in lines:
+                out.write(line.decode("utf-8", errors="replace") + "\n")
+            now = time.monotonic()
+            if omitted and (finished or now - last_report >= 1.0):
+                out.write(f"[{omitted} line(s) not shown, see {log}]\n")
+                omitted = 0
+                last_report = now
+            out.flush()
+            if finished:
+                return
+            if (rate is not None) and tokens < 1:
+                # Lines arriving until the next token are dropped.
+                time.sleep(min(0.1, (1 - tokens) / rate))
+
+def run_tool(cmd: list[str], cwd: Path, log: Path=None, env: dict=None, check: bool=True,
+        echo_rate: float=20.0, tail_lines: int=50, result=None) -> ToolRun:
+    """
+    Runs a tool, see Block.run_tool.
+    """
+    cmd = [str(arg) for arg in cmd]
+    cwd = Path(cwd)
+    if log is None:
+        log = log_path(cwd, cmd)
+    if echo_rate is None:
+        echo_buffer, block = 10000, True
+    elif echo_rate > 0:
+        echo_buffer, block = max(1, int(echo_rate)), False
+    else:
+        echo_buffer, block = 0, False
+
+    with gzip.open(log, "wb", compresslevel=1) as log_file:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        pump = OutputPump(log_file, tail_lines, echo_buffer, block)
+        threads = pump.start([proc.stdout])
+        try:
+            if echo_buffer:
+                pump.echo_lines(sys.stdout, echo_rate, log)
+            for t in threads:
+                t.join()
+            if pump.error:
+                raise pump.error
+            returncode = proc.wait()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    tail = [line.decode("utf-8", errors="replace") for line in pump.tail]
+    run = ToolRun(cmd, returncode, log, pump.lines, tail)
+    if result is not None:
+        runs = list(result.attrs.get("tool_runs", []))
+        runs.append({"cmd": shlex.join(cmd), "returncode": returncode, "log": log, "lines": pump.lines})
+        result.tool_runs = runs
+    if check and returncode != 0:
+        raise ToolError(returncode, cmd, log, tail)
+    return run
@@ -0,0 +1,263 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Tracing of build sessions in the Chrome trace event format.
+
+Trace files can be viewed with https://ui.perfetto.dev or chrome://tracing.
+Spans are recorded as complete ("X") events, resource usage of subprocesses
+as counter ("C") events. Resource usage is sampled without tracer as well,
+at a lower rate, for the peak values stored in Results.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+_clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def child_pids(pid: int, thread_id: int=None) -> list[int]:
+    """
+    Returns PIDs of the child processes of pid. If thread_id is given, only
+    children started by this thread of pid are returned.
+
+    Raises:
+        OSError: If /proc/<pid>/task/<tid>/children is not available.
+    """
+    if thread_id is None:
+        thread_ids = os.listdir(f"/proc/{pid}/task")
+    else:
+        thread_ids = [thread_id]
+    pids = []
+    for tid in thread_ids:
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children", "r") as f:
+                pids += [int(p) for p in f.read().split()]
+        except FileNotFoundError:
+            if thread_id is not None:
+                raise
+            # Thread exited.
+    return pids
+
+def process_tree(pid: int, thread_id: int=None) -> list[int]:
+    """
+    Returns PIDs of all descendants of pid (optionally only of those started
+    by thread thread_id of pid).
+    """
+    tree = []
+    todo = child_pids(pid, thread_id)
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        try:
+            todo += child_pids(p)
+        except OSError:
+            # Process exited.
+            pass
+    return tree
+
+def process_usage(pid: int) -> tuple[int, int]:
+    """
+    Returns:
+        Tuple of CPU time in clock ticks (user + system) and resident set
+        size in bytes of process pid.
+
+    Raises:
+        OSError: If the process does not exist (anymore).
+    """
+    with open(f"/proc/{pid}/stat", "r") as f:
+        stat = f.read()
+    # The command name (2nd field) can contain spaces and parentheses.
+    fields = stat[stat.rindex(")")+2:].split()
+    # Fields 14 (utime), 15 (stime) and 24 (rss), counting from 1.
+    ticks = int(fields[11]) + int(fields[12])
+    rss = int(fields[21]) * _page_size
+    return ticks, rss
+
+class ResourceSampler:
+    """
+    Samples CPU usage and RSS of the subprocess tree started by the calling
+    thread, in a background thread.
+
+    Only the subprocesses are included, not the calling Python process
+    itself. CPU time of subprocesses that exit between two samples is not
+    accounted for.
+
+    Attributes:
+        peak_cpu_percent: Highest CPU usage seen, in percent of a single
+            core. Set when sampling has stopped.
+        peak_rss: Highest total resident set size seen in bytes. Set when
+            sampling has stopped.
+    """
+    def __init__(self, tracer, name: str, interval: float=0.1):
+        self.tracer = tracer
+        self.name = name
+        self.interval = interval
+        self.peak_cpu_percent = None
+        self.peak_rss = None
+        self.pid = os.getpid()
+        self.thread_id = threading.get_native_id()
+        try:
+            child_pids(self.pid, self.thread_id)
+        except OSError:
+            # Children are not tracked per thread: include all subprocesses.
+            self.thread_id = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sample(self, last: dict, last_time: float) -> tuple[dict, float]:
+        now = time.monotonic()
+        ticks = {}
+        rss = 0
+        try:
+            pids = process_tree(self.pid, self.thread_id)
+        except OSError:
+            pids = []
+        for pid in pids:
+            try:
+                ticks[pid], pid_rss = process_usage(pid)
+            except (OSError, ValueError, IndexError):
+                continue
+            rss += pid_rss
+        delta = sum(t - last.get(pid, 0) for pid, t in ticks.items())
+        cpu_percent = 100.0 * delta / _clock_ticks / (now - last_time)
+        cpu_percent = round(cpu_percent, 1)
+        self.peak_rss = max(self.peak_rss or 0, rss)
+        self.peak_cpu_percent = max(self.peak_cpu_percent or 0.0, cpu_percent)
+        self.tracer.counter(f"{self.name} resources", {
+            "cpu_percent": cpu_percent,
+            "rss_mib": round(rss / 2**20, 1),
+        })
+        return ticks, now
+
+    def run(self):
+        last, last_time = {}, time.monotonic()
+        # The interval starts short and is doubled up to self.interval, so
+        # that subprocesses of short tasks are sampled, too.
+        interval = min(0.05, self.interval)
+        while not self.stop_event.wait(interval):
+            last, last_time = self.sample(last, last_time)
+            interval = min(2 * interval, self.interval)
+        # Final sample, so that peak values are set for short tasks, too.
+        self.sample(last, last_time)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+class NoResourceSampler:
+    peak_cpu_percent = None
+    peak_rss = None
+
+@contextmanager
+def sample_resources(tracer, name: str, interval: float):
+    """
+    Context manager sampling the resource usage of subprocesses started by
+    the calling thread within the context, see Tracer.sample_resources.
+    """
+    if not os.path.isdir("/proc/self/task"):
+        yield NoResourceSampler()
+        return
+    sampler = ResourceSampler(tracer, name, interval)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+
+class Tracer:
+    """
+    Records trace events of a build session.
+
+    Events can be recorded from multiple threads.
+    """
+    def __init__(self, sample_interval: float=0.1):
+        self.sample_interval = sample_interval
+        self.lock = threading.Lock()
+        self.events = []
+        self.pid = os.getpid()
+        self.start_ns = time.perf_counter_ns()
+        self.thread_names = {}
+
+    def timestamp(self) -> float:
+        """
+        Returns microseconds since creation of the tracer.
+        """
+        return (time.perf_counter_ns() - self.start_ns) / 1000
+
+    def add_event(self, event: dict):
+        thread_id = threading.get_native_id()
+        event["pid"] = self.pid
+        event["tid"] = thread_id
+        with self.lock:
+            if thread_id not in self.thread_names:
+                name = threading.current_thread().name
+                self.thread_names[thread_id] = name
+                self.events.append({"name": "thread_name", "ph": "M",
+                    "pid": self.pid, "tid": thread_id, "args": {"name": name}})
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str="session", **args):
+        """
+        Context manager recording a span from entering to leaving the context.
+        """
+        ts = self.timestamp()
+        try:
+            yield
+        finally:
+            event = {"name": name, "cat": cat, "ph": "X", "ts": ts,
+                "dur": self.timestamp() - ts}
+            if args:
+                event["args"] = args
+            self.add_event(event)
+
+    def counter(self, name: str, values: dict):
+        self.add_event({"name": name, "ph": "C", "ts": self.timestamp(),
+            "args": values})
+
+    def sample_resources(self, name: str):
+        """
+        Context manager sampling the resource usage of subprocesses started
+        by the calling thread within the context.
+
+        Yields:
+            ResourceSampler, whose peak values are available after leaving
+            the context, or NoResourceSampler if /proc is not available.
+        """
+        return sample_resources(self, name, self.sample_interval)
+
+    def to_json(self) -> str:
+        with self.lock:
+            return json.dumps({
+                "traceEvents": list(self.events),
+                "displayTimeUnit": "ms",
+            })
+
+    def write(self, filename: Path):
+        with open(filename, "w") as f:
+            f.write(self.to_json())
+
+class NoTracer:
+    """
+    Tracer that does not record anything. Resource usage is still sampled
+    for the peak values, at a lower rate (see ResourceSampler.run).
+    """
+    sample_interval = 1.0
+
+    def span(self, name: str, cat: str="session", **args):
+        return nullcontext()
+
+    def counter(self, name: str, values: dict):
+        pass
+
+    def sample_resources(self, name: str):
+        return sample_resources(self, name, self.sample_interval)
@@ -0,0 +1,175 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Non-blocking removal of directories in the build directory.
+
+Deleting large directory trees can take minutes, especially on network
+file systems. Instead of deleting them in place, directories are renamed
+into a trash directory inside the build directory, which is atomic and
+fast. The trash directory is then purged by a detached background process,
+so that neither the running build nor ``flow --clean`` has to wait. Outputs
+of rebuilt targets are collected in the trash during a build and purged by
+a single process when the build has finished.
+
+If a purge is interrupted, the remaining directories stay in the trash and
+are purged when the next BuildSession is opened.
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class Trash:
+    """
+    Trash directory of a build directory.
+
+    Args:
+        meta_dir: Directory that holds the trash directory. It must be on
+            the same file system as the directories that are removed.
+        background: If False, the trash is purged synchronously.
+    """
+    dirname = "trash"
+    lock_name = "trash.lock"
+
+    def __init__(self, meta_dir: Path, background: bool=True):
+        self.meta_dir = meta_dir
+        self.path = meta_dir / self.dirname
+        self.lock_path = meta_dir / self.lock_name
+        self.background = background and (fcntl is not None)
+        self.purger = None # Popen of the last background purge
+
+    def move(self, path: Path, purge: bool=True) -> bool:
+        """
+        Moves path into the trash, and starts purging the trash unless purge
+        is False. If path cannot be renamed (e.g. because it is on a
+        different file system), it is deleted synchronously.
+
+        Returns:
+            False if path did not exist.
+        """
+        if not os.path.lexists(path):
+            return False
+        self.path.mkdir(parents=True, exist_ok=True)
+        dest = self.path / f"{os.urandom(8).hex()}-{path.name}"
+        try:
+            os.rename(path, dest)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        if purge:
+            self.purge_async()
+        return True
+
+    def pending(self) -> bool:
+        """
+        Returns True if there are directories in the trash.
+        """
+        try:
+            with os.scandir(self.path) as it:
+                return any(True for _ in it)
+        except FileNotFoundError:
+            return False
+
+    def is_purging(self) -> bool:
+        """
+        Returns True if another process is purging the trash.
+        """
+        if not fcntl:
+            return False
+        try:
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def purge_entries(self):
+        # Directories can be added while purging.
+        while True:
+            try:
+                entries = list(self.path.iterdir())
+            except FileNotFoundError:
+                break
+            if not entries:
+                break
+            for entry in entries:
+                if entry.is_dir() and not entry.is_symlink():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    try:
+                        os.unlink(entry)
+                    except OSError:
+                        pass
+
+    def purge(self):
+        """
+        Deletes all directories in the trash. If another process is already
+        purging the trash, nothing is done.
+        """
+        if not self.meta_dir.exists():
+            return
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            self.purge_entries()
+
+    def purge_async(self):
+        """
+        Purges the trash in a detached background process, unless a purge is
+        already in progress.
+        """
+        if not self.background:
+            self.purge()
+            return
+        if self.purger and (self.purger.poll() is None):
+            # Our purge process is still running (or not yet holding the lock).
+            return
+        if self.is_purging():
+            return
+        # The package might not be installed, e.g. when running from a
+        # source checkout.
+        env = dict(os.environ)
+        package_parent = str(Path(__file__).resolve().parent.parent)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None,
+            [package_parent, env.get("PYTHONPATH")]))
+        self.purger = subprocess.Popen(
+            [sys.executable, "-m", __name__, str(self.meta_dir)],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    def wait(self):
+        """
+        Waits until the trash is empty. If no other process is purging the
+        trash, it is purged by the calling process.
+        """
+        if not self.meta_dir.exists():
+            return
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.purge_entries()
+
+def main(args: list[str]):
+    Trash(Path(args[0]), background=False).purge()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
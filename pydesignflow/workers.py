@@ -0,0 +1,400 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Distribution of targets to worker processes on multiple hosts that share
+the build directory, e.g. via NFS.
+
+The coordinator (BuildPlan.run with executor="workers") publishes every
+target whose dependencies have finished as lease file in the build
+directory. Workers (``flow worker``) claim leases by renaming them, which is
+atomic even on NFS, so every target is claimed by exactly one worker. While
+a worker runs a target, it renews the modification time of its lease
+(heartbeat). Leases whose heartbeat has expired, e.g. because the host of
+the worker crashed, are returned to the ready set by the coordinator.
+
+Lease files are stored in ``.pydesignflow/leases``:
+
+- ``ready/<rank>-<target>``: published targets. Workers claim the leases
+  in the order of their names, i.e. critical-path targets first. The file
+  contains ``if_missing`` for targets that are only run if their result is
+  missing (see Target.run).
+- ``claimed/<rank>-<target>@<worker>``: targets that are running.
+- ``done/<rank>-<target>``: finished targets, removed by the coordinator.
+- ``failed/<rank>-<target>``: failed targets, holding the error message.
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import traceback
+from pathlib import Path
+
+from .ansiterm import NoColor
+from .errors import FlowError
+from .target import TargetId
+from .executor import Executor
+from .locks import fs_time
+
+LEASE_TIMEOUT = 60.0 # Seconds without heartbeat after which a lease expires.
+HEARTBEAT_INTERVAL = 10.0
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class LeaseBoard:
+    """
+    Lease files of a build directory.
+
+    Args:
+        meta_dir: Directory holding the lease directory (.pydesignflow).
+    """
+    states = ("ready", "claimed", "done", "failed")
+
+    def __init__(self, meta_dir: Path):
+        self.path = meta_dir / "leases"
+        self.dirs = {state: self.path / state for state in self.states}
+        self.clock_path = self.path / "clock"
+
+    def create(self):
+        for d in self.dirs.values():
+            d.mkdir(parents=True, exist_ok=True)
+
+    def entries(self, state: str) -> list[str]:
+        try:
+            return sorted(os.listdir(self.dirs[state]))
+        except FileNotFoundError:
+            return []
+
+    def reset(self):
+        """
+        Removes all leases, e.g. left behind by a coordinator that was
+        interrupted.
+        """
+        for state in self.states:
+            for name in self.entries(state):
+                try:
+                    os.unlink(self.dirs[state] / name)
+                except FileNotFoundError:
+                    pass
+
+    def now(self) -> float:
+        """
+        Returns the current time of the file system. Comparing modification
+        times against it is not affected by clock skew between hosts.
+        """
+        return fs_time(self.clock_path)
+
+    @staticmethod
+    def lease_name(rank: int, tid: TargetId) -> str:
+        return f"{rank:06d}-{tid}"
+
+    @staticmethod
+    def parse_name(name: str) -> tuple[TargetId, str]:
+        """
+        Returns TargetId and worker (or None) of a lease file name.
+        """
+        name, _, worker = name.partition("@")
+        block_id, task_id = name.split("-", 1)[1].split(".", 1)
+        return TargetId(block_id, task_id), (worker or None)
+
+    def publish(self, rank: int, tid: TargetId, if_missing: bool=False):
+        name = self.lease_name(rank, tid)
+        tmp_path = self.path / f"{name}.tmp"
+        with open(tmp_path, "w") as f:
+            if if_missing:
+                f.write("if_missing\n")
+        os.replace(tmp_path, self.dirs["ready"] / name)
+
+    def if_missing(self, claimed: str) -> bool:
+        """
+        Returns True if the target of a claimed lease is only run if its
+        result is missing.
+        """
+        try:
+            with open(self.dirs["claimed"] / claimed, "r") as f:
+                return f.read().strip() == "if_missing"
+        except FileNotFoundError:
+            return False
+
+    def withdraw(self) -> int:
+        """
+        Removes all unclaimed leases. Returns the number of removed leases.
+        """
+        count = 0
+        for name in self.entries("ready"):
+            try:
+                os.unlink(self.dirs["ready"] / name)
+            except FileNotFoundError:
+                continue # Claimed in the meantime.
+            count += 1
+        return count
+
+    def claim(self, worker: str) -> str:
+        """
+        Claims the first ready lease for worker.
+
+        Returns:
+            Name of the claimed lease file, or None if no lease is ready.
+        """
+        for name in self.entries("ready"):
+            claimed = f"{name}@{worker}"
+            try:
+                os.rename(self.dirs["ready"] / name, self.dirs["claimed"] / claimed)
+            except FileNotFoundError:
+                continue # Claimed by another worker.
+            if self.heartbeat(claimed):
+                return claimed
+        return None
+
+    def heartbeat(self, claimed: str) -> bool:
+        """
+        Renews a lease. Returns False if the lease was reclaimed.
+        """
+        try:
+            os.utime(self.dirs["claimed"] / claimed)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def complete(self, claimed: str, error: str=None) -> bool:
+        """
+        Moves a claimed lease to done or, if error is given, to failed.
+        Returns False if the lease was reclaimed.
+        """
+        path = self.dirs["claimed"] / claimed
+        name = claimed.partition("@")[0]
+        try:
+            if error is None:
+                os.rename(path, self.dirs["done"] / name)
+            else:
+                with open(path, "r+") as f:
+                    f.write(error)
+                    f.truncate()
+                os.rename(path, self.dirs["failed"] / name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def reclaim_expired(self, timeout: float) -> list[str]:
+        """
+        Returns claimed leases without heartbeat for timeout seconds to the
+        ready set.
+
+        Returns:
+            List of names of the reclaimed leases.
+        """
+        now = self.now()
+        reclaimed = []
+        for claimed in self.entries("claimed"):
+            path = self.dirs["claimed"] / claimed
+            try:
+                if now - os.stat(path).st_mtime <= timeout:
+                    continue
+                os.rename(path, self.dirs["ready"] / claimed.partition("@")[0])
+            except FileNotFoundError:
+                continue # Completed in the meantime.
+            reclaimed.append(claimed)
+        return reclaimed
+
+class WorkerPoolExecutor(Executor):
+    """
+    Runs the targets of a BuildPlan on workers (see Worker) that share the
+    build directory. The targets are published in the same order in which
+    ParallelExecutor would start them. Only one coordinator must use a
+    build directory at a time.
+
+    If a target fails, no further targets are published. Targets that are
+    already running are allowed to finish, then FlowError is raised.
+    """
+    def __init__(self, plan, color=NoColor, jobs: int=1, resources: dict=None,
+            lease_timeout: float=LEASE_TIMEOUT, poll_interval: float=0.5):
+        super().__init__(plan, color, jobs, resources)
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.board = LeaseBoard(self.sess.index.meta_dir)
+
+        deps, self.dependents = self.plan_edges()
+        self.pending_deps = {tid: len(d) for tid, d in deps.items()}
+        priority = plan.schedule().priority
+        order = {tid: idx for idx, tid in enumerate(plan.target_sequence)}
+        by_priority = sorted(plan.target_sequence, key=lambda t: (-priority[t], order[t]))
+        self.rank = {tid: rank for rank, tid in enumerate(by_priority)}
+
+    def publish(self, tid: TargetId):
+        self.board.publish(self.rank[tid], tid, self.plan.if_missing(tid))
+
+    def run(self):
+        board = self.board
+        board.create()
+        board.reset()
+        for tid, count in self.pending_deps.items():
+            if count == 0:
+                self.publish(tid)
+        self.message(f"Waiting for workers (flow worker --build-dir {self.sess.build_dir}).")
+
+        total = len(self.plan.target_sequence)
+        finished = 0
+        running = set()
+        failures = []
+        while finished + len(failures) < total:
+            claimed = set(board.entries("claimed"))
+            for name in sorted(claimed - running):
+                tid, worker = board.parse_name(name)
+                self.message(f"Running target {tid} on {worker}.")
+            running = claimed
+
+            for name in board.entries("done"):
+                os.unlink(board.dirs["done"] / name)
+                tid, _ = board.parse_name(name)
+                finished += 1
+                # The result was written by the worker:
+                self.sess.refresh_target(tid)
+                self.message(f"Finished target {tid}.")
+                if failures:
+                    continue
+                for dependent in self.dependents[tid]:
+                    self.pending_deps[dependent] -= 1
+                    if self.pending_deps[dependent] == 0:
+                        self.publish(dependent)
+
+            for name in board.entries("failed"):
+                path = board.dirs["failed"] / name
+                with open(path, "r") as f:
+                    error = f.read()
+                os.unlink(path)
+                tid, _ = board.parse_name(name)
+                self.sess.refresh_target(tid)
+                self.message(f"Failed target {tid}: {error.strip().splitlines()[-1]}")
+                failures.append((tid, error))
+                board.withdraw()
+
+            for name in board.reclaim_expired(self.lease_timeout):
+                tid, worker = board.parse_name(name)
+                self.message(f"Lease of target {tid} on {worker} expired, target is released to other workers.")
+
+            if failures and not (board.entries("claimed") or board.entries("done")):
+                break
+            time.sleep(self.poll_interval)
+
+        if failures:
+            skipped = total - finished - len(failures)
+            if skipped > 0:
+                self.message(f"{skipped} target(s) not run due to failure.")
+            tid, error = failures[0]
+            raise FlowError(f"Target {tid} failed:\n{error}")
+
+class Worker:
+    """
+    Claims and runs targets published by a WorkerPoolExecutor.
+
+    Args:
+        sess: BuildSession of the shared build directory.
+        name: Name of the worker, defaults to host name and process ID.
+        heartbeat_interval: Seconds between renewals of the lease of the
+            running target. Must be well below the lease timeout of the
+            coordinator.
+        poll_interval: Seconds between checks for new leases.
+    """
+    def __init__(self, sess, name: str=None, heartbeat_interval: float=HEARTBEAT_INTERVAL,
+            poll_interval: float=1.0, color=NoColor):
+        self.sess = sess
+        self.name = name or worker_name()
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.color = color
+        self.board = LeaseBoard(sess.index.meta_dir)
+
+    def message(self, text):
+        style = self.color.FgBrightBlue
+        reset = self.color.Reset
+        print(f"{style}[PyDesignFlow worker {self.name}]{reset} {text}")
+        sys.stdout.flush()
+
+    def heartbeat(self, claimed: str, stop: threading.Event):
+        while not stop.wait(self.heartbeat_interval):
+            if not self.board.heartbeat(claimed):
+                tid, _ = self.board.parse_name(claimed)
+                self.message(f"Lease of target {tid} was reclaimed.")
+                return
+
+    def run_target(self, tid: TargetId, on_start=None, on_end=None, if_missing: bool=False) -> str:
+        """
+        Runs a single target, whose requirements were built by other
+        processes.
+
+        Args:
+            tid: TargetId
+            on_start, on_end: Optional functions called before and after the
+                target runs.
+            if_missing: Only build the target if its result is missing (see
+                Target.run).
+
+        Returns:
+            Formatted exception if the target failed, otherwise None.
+        """
+        target = self.sess.flow.target(tid)
+        # Results of dependencies were written by other workers:
+        for _, dep in target.resolve_requires():
+            self.sess.refresh_target(dep)
+
+        self.message(f"Running target {tid}.")
+        if on_start:
+            on_start()
+        error = None
+        try:
+            target.run(self.sess, if_missing=if_missing)
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            if on_end:
+                on_end()
+            self.sess.durations.save()
+        if error:
+            self.message(f"Failed target {tid}.")
+            sys.stderr.write(error)
+        else:
+            self.message(f"Finished target {tid}.")
+        return error
+
+    def run_claimed(self, claimed: str):
+        tid, _ = self.board.parse_name(claimed)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(claimed, stop), daemon=True)
+        def end_heartbeat():
+            stop.set()
+            heartbeat.join()
+        error = self.run_target(tid, on_start=heartbeat.start, on_end=end_heartbeat,
+            if_missing=self.board.if_missing(claimed))
+        if not self.board.complete(claimed, error):
+            self.message(f"Lease of target {tid} was reclaimed, completion is ignored.")
+
+    def run(self, idle_exit: float=None):
+        """
+        Runs targets until interrupted.
+
+        Args:
+            idle_exit: If given, the worker returns after idle_exit seconds
+                without ready leases.
+        """
+        self.board.create()
+        self.message(f"Waiting for targets in {self.sess.build_dir}.")
+        idle_since = time.monotonic()
+        purge = False
+        while True:
+            claimed = self.board.claim(self.name)
+            if claimed:
+                self.run_claimed(claimed)
+                idle_since = time.monotonic()
+                purge = True
+                continue
+            if purge:
+                # Outputs of rebuilt targets are purged when the worker
+                # becomes idle, not after each target.
+                self.sess.trash.purge_async()
+                purge = False
+            if (idle_exit is not None) and (time.monotonic() - idle_since >= idle_exit):
+                return
+            time.sleep(self.poll_interval)
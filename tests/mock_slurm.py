@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Minimal stand-in for sbatch, squeue and scancel, selected by the name under
+which the script is invoked. Job state is kept in the directory
+MOCK_SLURM_DIR. Every job is run by a detached process, which waits until
+the jobs of its --dependency=afterok:... have completed and then runs all
+array elements concurrently. With aftercorr:..., each element waits for
+the element of the same index of the given jobs.
+"""
+
+import os
+import sys
+import time
+import subprocess
+from pathlib import Path
+
+state_dir = Path(os.environ["MOCK_SLURM_DIR"])
+
+def get_state(job_id):
+    try:
+        return (state_dir / f"{job_id}.state").read_text()
+    except FileNotFoundError:
+        return None
+
+def set_state(job_id, state):
+    tmp = state_dir / f"{job_id}.state.tmp"
+    tmp.write_text(state)
+    os.replace(tmp, state_dir / f"{job_id}.state")
+
+def sbatch(args):
+    with open(state_dir / "sbatch.log", "a") as f:
+        f.write(" ".join(args) + "\n")
+    job_id = 1
+    while True:
+        try:
+            os.close(os.open(state_dir / f"{job_id}.job", os.O_CREAT | os.O_EXCL))
+            break
+        except FileExistsError:
+            job_id += 1
+    set_state(job_id, "PENDING")
+    subprocess.Popen([sys.executable, __file__, "run", str(job_id)] + args,
+        start_new_session=True, stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print(job_id)
+
+def parse_array(spec):
+    indices = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        indices += range(int(first), int(last or first) + 1)
+    return indices
+
+def wait_for(job_ids):
+    """
+    Waits until all job_ids have completed. Returns False if one of them
+    failed.
+    """
+    while any(get_state(j) != "COMPLETED" for j in job_ids):
+        if any(get_state(j) in ("FAILED", "CANCELLED") for j in job_ids):
+            return False
+        time.sleep(0.05)
+    return True
+
+def run(job_id, args):
+    array = [0]
+    afterok = []
+    aftercorr = []
+    output = "/dev/null"
+    for arg in args[:-1]:
+        if arg.startswith("--array="):
+            array = parse_array(arg.split("=", 1)[1])
+        elif arg.startswith("--dependency="):
+            for dep in arg.split("=", 1)[1].split(","):
+                kind, *job_ids = dep.split(":")
+                if kind == "afterok":
+                    afterok += job_ids
+                elif kind == "aftercorr":
+                    aftercorr += job_ids
+        elif arg.startswith("--output="):
+            output = arg.split("=", 1)[1]
+    if not wait_for(afterok):
+        set_state(job_id, "CANCELLED")
+        return
+    pending = list(array)
+    procs = {}
+    codes = []
+    while pending or procs:
+        if get_state(job_id) == "CANCELLED":
+            return
+        for idx in list(pending):
+            corr = [f"{j}_{idx}" for j in aftercorr]
+            if any(get_state(c) in ("FAILED", "CANCELLED") for c in corr):
+                pending.remove(idx)
+                set_state(f"{job_id}_{idx}", "CANCELLED")
+                codes.append(1)
+            elif all(get_state(c) == "COMPLETED" for c in corr):
+                pending.remove(idx)
+                set_state(job_id, "RUNNING")
+                env = dict(os.environ, SLURM_ARRAY_TASK_ID=str(idx))
+                with open(output.replace("%a", str(idx)), "w") as out:
+                    procs[idx] = subprocess.Popen(["bash", args[-1]], env=env, stdout=out, stderr=out)
+        for idx, proc in list(procs.items()):
+            code = proc.poll()
+            if code is not None:
+                del procs[idx]
+                set_state(f"{job_id}_{idx}", "COMPLETED" if code == 0 else "FAILED")
+                codes.append(code)
+        time.sleep(0.05)
+    set_state(job_id, "COMPLETED" if not any(codes) else "FAILED")
+
+def squeue(args):
+    job_ids = [a.split("=", 1)[1] for a in args if a.startswith("--jobs=")][0].split(",")
+    for job_id in job_ids:
+        if get_state(job_id) in ("PENDING", "RUNNING"):
+            print(job_id)
+
+def scancel(args):
+    for job_id in args:
+        if get_state(job_id) in ("PENDING", "RUNNING"):
+            set_state(job_id, "CANCELLED")
+
+if __name__ == "__main__":
+    cmd = os.path.basename(sys.argv[0])
+    if sys.argv[1:2] == ["run"]:
+        run(sys.argv[2], sys.argv[3:])
+    elif cmd == "sbatch":
+        sbatch(sys.argv[1:])
+    elif cmd == "squeue":
+        squeue(sys.argv[1:])
+    elif cmd == "scancel":
+        scancel(sys.argv[1:])
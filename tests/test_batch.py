@@ -0,0 +1,160 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import importlib.util
+from pathlib import Path
+import pytest
+from pydesignflow import TargetId, FlowError
+from pydesignflow.batch import SlurmExecutor, JobGroup, sbatch_options, array_spec
+
+flow_source = '''
+import os
+from pydesignflow import Flow, Block, task, Result
+
+def named(name):
+    r = Result()
+    r.name = name
+    return r
+
+class ChipBlock(Block):
+    @task(resources={'cpus': 2})
+    def a(self, cwd):
+        return named('a')
+
+    @task(resources={'cpus': 2})
+    def b(self, cwd):
+        return named('b')
+
+    @task(resources={'cpus': 2})
+    def c(self, cwd):
+        return named('c')
+
+    @task(resources={'license:innovus': 1})
+    def d(self, cwd):
+        return named('d')
+
+    @task(requires={'a': '.a', 'b': '.b', 'c': '.c', 'd': '.d'})
+    def join(self, cwd, a, b, c, d):
+        return named('+'.join([a.name, b.name, c.name, d.name]))
+
+    @task(requires={'a': '.a'})
+    def check_a(self, cwd, a):
+        return named('check_' + a.name)
+
+    @task(requires={'b': '.b'})
+    def check_b(self, cwd, b):
+        return named('check_' + b.name)
+
+    @task(requires={'a': '.check_a', 'b': '.check_b', 'd': '.d'})
+    def signoff(self, cwd, a, b, d):
+        return named('+'.join([a.name, b.name, d.name]))
+
+    @task()
+    def fail(self, cwd):
+        raise RuntimeError("task failed in batch job")
+
+    @task()
+    def crash(self, cwd):
+        os._exit(3)
+
+flow = Flow()
+flow['chip'] = ChipBlock()
+'''
+
+@pytest.fixture
+def mock_slurm(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for cmd in "sbatch", "squeue", "scancel":
+        (bin_dir / cmd).symlink_to(Path(__file__).resolve().parent / "mock_slurm.py")
+    state_dir = tmp_path / "slurm"
+    state_dir.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("MOCK_SLURM_DIR", str(state_dir))
+    monkeypatch.setenv("PYTHONPATH", str(Path(__file__).resolve().parent.parent))
+    monkeypatch.setenv("PYDESIGNFLOW_NO_SNAPSHOT", "1")
+    return state_dir
+
+def import_flow(path):
+    (path / "flow.py").write_text(flow_source)
+    spec = importlib.util.spec_from_file_location("batch_test_flow", path / "flow.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.flow
+
+def options(tmp_path):
+    return {'flow_dir': tmp_path, 'poll_interval': 0.1, 'queue_interval': 0.5}
+
+def test_sbatch_options():
+    assert sbatch_options({'cpus': 8, 'mem_gb': 1.5, 'license:innovus': 1, 'license:calibre': 2, 'gpu': 1}) \
+        == ['--cpus-per-task=8', '--mem=1536M', '--licenses=calibre:2,innovus:1']
+
+def test_groups(tmp_path):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path / "build")
+    plan = sess.plan('chip', 'join', build_dependencies='missing')
+    groups = SlurmExecutor(plan, **options(tmp_path)).groups()
+    assert [list(g.tids.values()) for g in groups] == [
+        [TargetId('chip', t) for t in ('a', 'b', 'c')],
+        [TargetId('chip', 'd')],
+        [TargetId('chip', 'join')],
+    ]
+    assert groups[2].after == {0, 1}
+    ex = SlurmExecutor(plan, max_array_size=2, **options(tmp_path))
+    assert [len(g.tids) for g in ex.groups()] == [2, 1, 1, 1]
+
+def test_groups_chains(tmp_path):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path / "build")
+    plan = sess.plan('chip', 'signoff', build_dependencies='missing')
+    groups = SlurmExecutor(plan, **options(tmp_path)).groups()
+    # check_a and check_b only wait for a and b, respectively:
+    assert groups == [
+        JobGroup({0: TargetId('chip', 'a'), 1: TargetId('chip', 'b')}),
+        JobGroup({0: TargetId('chip', 'd')}),
+        JobGroup({0: TargetId('chip', 'check_a'), 1: TargetId('chip', 'check_b')}, corr=0),
+        JobGroup({0: TargetId('chip', 'signoff')}, after={1, 2}),
+    ]
+
+def test_array_spec():
+    assert array_spec([0, 1, 2, 5, 7, 8]) == "0-2,5,7-8"
+    assert array_spec([3]) == "3"
+
+def test_slurm_build(tmp_path, mock_slurm):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path / "build")
+    plan = sess.plan('chip', 'join', build_dependencies='missing')
+    plan.run(executor="slurm", executor_options=options(tmp_path))
+    assert sess.get_result(TargetId('chip', 'join')).name == "a+b+c+d"
+
+    calls = (mock_slurm / "sbatch.log").read_text().splitlines()
+    assert len(calls) == 3
+    assert "--array=0-2" in calls[0] and "--cpus-per-task=2" in calls[0]
+    assert "--licenses=innovus:1" in calls[1]
+    assert "--dependency=afterok:1:2" in calls[2]
+    # Dependencies are skipped if another process has built them meanwhile:
+    batch_dir = tmp_path / "build" / ".pydesignflow" / "batch"
+    assert "[0]=--if-missing" in (batch_dir / "job0.sh").read_text()
+    assert "--if-missing" not in (batch_dir / "job2.sh").read_text().split("options=")[1].splitlines()[0]
+
+def test_slurm_build_chains(tmp_path, mock_slurm):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path / "build")
+    plan = sess.plan('chip', 'signoff', build_dependencies='missing')
+    plan.run(executor="slurm", executor_options=options(tmp_path))
+    assert sess.get_result(TargetId('chip', 'signoff')).name == "check_a+check_b+d"
+
+    calls = (mock_slurm / "sbatch.log").read_text().splitlines()
+    assert len(calls) == 4
+    assert "--array=0-1" in calls[2] and "--dependency=aftercorr:1" in calls[2]
+    assert "--dependency=afterok:2:3" in calls[3]
+
+def test_slurm_failure(tmp_path, mock_slurm):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path / "build")
+    with pytest.raises(FlowError, match="task failed in batch job"):
+        sess.plan('chip', 'fail').run(executor="slurm", executor_options=options(tmp_path))
+    # Job ends without status file, which is detected using squeue:
+    with pytest.raises(FlowError, match="ended without running target chip.crash"):
+        sess.plan('chip', 'crash').run(executor="slurm", executor_options=options(tmp_path))
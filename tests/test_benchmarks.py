@@ -0,0 +1,38 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import pytest
+from benchmarks.synthetic import shapes
+from benchmarks.run import run, count_targets
+from benchmarks.compare import compare
+
+@pytest.mark.parametrize("shape", list(shapes))
+def test_synthetic_flow(shape, tmp_path):
+    flow, sink = shapes[shape](300)
+    assert 300 <= count_targets(flow) <= 301
+    sess = flow.session_at(tmp_path)
+    plan = sess.plan(sink.block_id, sink.task_id, build_dependencies='missing')
+    assert len(plan.target_sequence) == count_targets(flow)
+
+def test_benchmark_report(tmp_path):
+    report = run(200, list(shapes), repeat=1, work_dir=tmp_path)
+    json.dumps(report)
+    benchmarks = {(r["shape"], r["benchmark"]) for r in report["results"]}
+    for shape in shapes:
+        for name in ("flow_construct", "session_open_cold", "session_open_warm",
+                "plan_missing", "plan_all", "status", "status_brief",
+                "result_roundtrip", "clean_block", "clean_all"):
+            assert (shape, name) in benchmarks
+    for r in report["results"]:
+        assert r["targets"] >= 200
+        assert not "error" in r
+
+def test_benchmark_compare():
+    old = {("wide", 100, "plan_all"): {"min": 1.0}, ("wide", 100, "status"): {"min": 1.0}}
+    new = {("wide", 100, "plan_all"): {"min": 1.1}, ("wide", 100, "status"): {"min": 1.0}}
+    rows, regression = compare(old, new, threshold=1.25)
+    assert not regression
+    new[("wide", 100, "status")] = {"error": "RecursionError: ..."}
+    rows, regression = compare(old, new, threshold=1.25)
+    assert regression
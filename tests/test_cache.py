@@ -0,0 +1,214 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import stat
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, Result
+
+class CachedBlock(Block):
+    def __init__(self, value, **kwargs):
+        super().__init__(**kwargs)
+        self.value = value
+        self.runs = []
+
+    @task()
+    def gen(self, cwd):
+        self.runs.append('gen')
+        r = Result()
+        r.value = self.value
+        return r
+
+    @task(requires={'g':'.gen'}, cache=True)
+    def syn(self, cwd, g):
+        self.runs.append('syn')
+        (cwd / "netlist.v").write_text(f"module top_{g.value};")
+        r = Result()
+        r.netlist = cwd / "netlist.v"
+        r.value = g.value
+        return r
+
+def get_flow_session(build_dir, cache_dir, value='a'):
+    flow = Flow(cache_dir=cache_dir)
+    flow['top'] = CachedBlock(value)
+    return flow.session_at(build_dir)
+
+def test_cache_hit(tmp_path):
+    build_dir = tmp_path / 'build'
+    cache_dir = tmp_path / 'cache'
+    sess = get_flow_session(build_dir, cache_dir)
+    sess.plan('top', 'syn', build_dependencies='missing').run()
+    block = sess.flow['top']
+    assert block.runs == ['gen', 'syn']
+    key = sess.get_result(TargetId('top', 'syn')).cache_key
+
+    # Rebuild only syn: cache hit.
+    sess.clean('top', 'syn')
+    sess.plan('top', 'syn').run()
+    assert block.runs == ['gen', 'syn']
+    res = sess.get_result(TargetId('top', 'syn'))
+    assert res.cache_key == key
+    assert res.netlist.read_text() == "module top_a;"
+
+    # Same block parameters and dependency results in a new session:
+    sess2 = get_flow_session(build_dir, cache_dir)
+    sess2.clean('top', 'syn')
+    sess2.plan('top', 'syn').run()
+    assert sess2.flow['top'].runs == []
+
+    # With caching disabled, the task is run:
+    sess2.cache = None
+    sess2.plan('top', 'syn', build_dependencies='all').run()
+    assert sess2.flow['top'].runs == ['gen', 'syn']
+
+def test_cache_hit_rebuilt_dependency(tmp_path):
+    build_dir = tmp_path / 'build'
+    cache_dir = tmp_path / 'cache'
+    sess = get_flow_session(build_dir, cache_dir)
+    sess.plan('top', 'syn', build_dependencies='missing').run()
+    key = sess.get_result(TargetId('top', 'syn')).cache_key
+
+    # A rebuilt dependency only differs in time_started etc.:
+    sess.plan('top', 'syn', build_dependencies='all').run()
+    assert sess.flow['top'].runs == ['gen', 'syn', 'gen']
+    assert sess.get_result(TargetId('top', 'syn')).cache_key == key
+
+    # New build directory sharing the cache:
+    sess2 = get_flow_session(tmp_path / 'build2', cache_dir)
+    sess2.plan('top', 'syn', build_dependencies='missing').run()
+    assert sess2.flow['top'].runs == ['gen']
+    res = sess2.get_result(TargetId('top', 'syn'))
+    assert res.netlist == tmp_path / 'build2' / 'top' / 'syn' / 'netlist.v'
+    assert res.netlist.read_text() == "module top_a;"
+
+def test_cache_miss(tmp_path):
+    build_dir = tmp_path / 'build'
+    cache_dir = tmp_path / 'cache'
+    sess = get_flow_session(build_dir, cache_dir)
+    sess.plan('top', 'syn', build_dependencies='missing').run()
+
+    # Different block parameters:
+    sess2 = get_flow_session(build_dir, cache_dir, value='b')
+    sess2.clean()
+    sess2.plan('top', 'syn', build_dependencies='missing').run()
+    assert sess2.flow['top'].runs == ['gen', 'syn']
+    assert sess2.get_result(TargetId('top', 'syn')).netlist.read_text() == "module top_b;"
+
+def test_cache_integrity(tmp_path):
+    build_dir = tmp_path / 'build'
+    cache_dir = tmp_path / 'cache'
+    sess = get_flow_session(build_dir, cache_dir)
+    sess.plan('top', 'syn', build_dependencies='missing').run()
+    key = sess.get_result(TargetId('top', 'syn')).cache_key
+    entry = sess.cache.entry_dir(key)
+    (entry / 'files' / 'netlist.v').write_text("corrupt")
+
+    sess.clean('top', 'syn')
+    sess.plan('top', 'syn').run()
+    assert sess.flow['top'].runs == ['gen', 'syn', 'syn']
+    assert sess.get_result(TargetId('top', 'syn')).netlist.read_text() == "module top_a;"
+    # Corrupt entry was replaced:
+    assert (entry / 'files' / 'netlist.v').read_text() == "module top_a;"
+
+def test_cache_eviction(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv('PYDESIGNFLOW_CACHE_DIR', str(cache_dir))
+    monkeypatch.setenv('PYDESIGNFLOW_CACHE_SIZE', '2K')
+    keys = []
+    for value in ('a', 'b', 'c'):
+        flow = Flow()
+        flow['top'] = CachedBlock(value * 400)
+        assert flow.cache_dir == cache_dir
+        assert flow.cache_size_limit == 2048
+        sess = flow.session_at(tmp_path / 'build')
+        sess.clean()
+        sess.plan('top', 'syn', build_dependencies='missing').run()
+        keys.append(sess.get_result(TargetId('top', 'syn')).cache_key)
+    # Each entry is more than 1K, only the most recent one fits.
+    assert len(sess.cache.entries()) == 1
+    assert sess.cache.entry_dir(keys[-1]).exists()
+    assert not sess.cache.entry_dir(keys[0]).exists()
+
+def test_cache_eviction_failed_discard(tmp_path, monkeypatch):
+    from pydesignflow.cache import TaskCache
+    monkeypatch.setenv('PYDESIGNFLOW_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('PYDESIGNFLOW_CACHE_SIZE', '2K')
+    entries = []
+    discard = TaskCache.discard
+    def discard_other(self, entry):
+        # The first entry belongs to another user:
+        return not (entries and entry == entries[0]) and discard(self, entry)
+    monkeypatch.setattr(TaskCache, 'discard', discard_other)
+    for value in ('a', 'b'):
+        flow = Flow()
+        flow['top'] = CachedBlock(value * 600)
+        sess = flow.session_at(tmp_path / 'build')
+        sess.clean()
+        sess.plan('top', 'syn', build_dependencies='missing').run()
+        entries.append(sess.cache.entry_dir(sess.get_result(TargetId('top', 'syn')).cache_key))
+    # The size of the entry that could not be discarded still counts:
+    assert entries[0].exists()
+    assert not entries[1].exists()
+
+def test_cache_shared(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    os.chmod(cache_dir, 0o2770)
+    umask = os.umask(0o077)
+    try:
+        sess = get_flow_session(tmp_path / 'build', cache_dir)
+        sess.plan('top', 'syn', build_dependencies='missing').run()
+    finally:
+        os.umask(umask)
+    entry = sess.cache.entry_dir(sess.get_result(TargetId('top', 'syn')).cache_key)
+    for path in (entry.parent, entry, entry / 'files', cache_dir / 'tmp'):
+        mode = os.stat(path).st_mode
+        assert mode & stat.S_IRWXG == stat.S_IRWXG and mode & stat.S_ISGID, path
+    for path in (entry / 'files' / 'netlist.v', entry / 'result.json', entry / 'manifest.json'):
+        assert os.stat(path).st_mode & stat.S_IRGRP, path
+    assert os.stat(entry / 'last_used').st_mode & stat.S_IWGRP
+
+    # Private cache directories are not shared:
+    sess = get_flow_session(tmp_path / 'build2', tmp_path / 'private')
+    os.umask(0o077)
+    try:
+        sess.plan('top', 'syn', build_dependencies='missing').run()
+    finally:
+        os.umask(umask)
+    entry = sess.cache.entry_dir(sess.get_result(TargetId('top', 'syn')).cache_key)
+    assert not os.stat(entry).st_mode & stat.S_IRWXG
+
+def test_cache_store_error(tmp_path, monkeypatch, capsys):
+    import pydesignflow.cache
+    def copy_denied(src, dst):
+        raise PermissionError(13, "Permission denied", str(dst))
+    monkeypatch.setattr(pydesignflow.cache, 'copy_hashed', copy_denied)
+    sess = get_flow_session(tmp_path / 'build', tmp_path / 'cache')
+    sess.plan('top', 'syn', build_dependencies='missing').run()
+    # The target is built nevertheless:
+    assert TargetId('top', 'syn') in sess.results
+    assert "Warning: Could not store top.syn in cache" in capsys.readouterr().out
+    assert sess.cache.entries() == []
+    assert list((tmp_path / 'cache' / 'tmp').iterdir()) == []
+
+def test_cache_key_error(tmp_path, capsys):
+    class ToolBlock(CachedBlock):
+        def __init__(self, tool):
+            super().__init__('a')
+            self.tool = tool
+    flow = Flow(cache_dir=tmp_path / 'cache')
+    # object() is represented by its address, which changes with every run:
+    flow['top'] = ToolBlock(object())
+    sess = flow.session_at(tmp_path / 'build')
+    sess.plan('top', 'syn', build_dependencies='missing').run()
+    assert "Warning: Not caching top.syn" in capsys.readouterr().out
+    assert not (tmp_path / 'cache').exists()
+
+def test_parse_size():
+    from pydesignflow.cache import parse_size
+    assert parse_size(100) == 100
+    assert parse_size("100") == 100
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5G") == 1536*1024*1024
+    with pytest.raises(ValueError):
+        parse_size("many")
@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import gzip
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, Result
+from pydesignflow.compression import (GzipCompressor, get_compressor, compress_outputs,
+    open_output, output_path, format_size)
+
+report_text = "".join(f"endpoint u{i}/D slack 0.{i % 97:02d}\n" for i in range(5000))
+
+class Impl(Block):
+    @task(compress=["*.log", "reports/**/*.rpt"])
+    def route(self, cwd):
+        (cwd / "route.log").write_text(report_text)
+        (cwd / "reports" / "timing").mkdir(parents=True)
+        (cwd / "reports" / "timing" / "setup.rpt").write_text(report_text)
+        (cwd / "reports" / "summary.txt").write_text("kept")
+        (cwd / "tiny.log").write_text("x")
+        result = Result()
+        result.log = cwd / "route.log"
+        result.setup = cwd / "reports" / "timing" / "setup.rpt"
+        result.tiny = cwd / "tiny.log"
+        return result
+
+    @task(requires={'route': '.route'})
+    def signoff(self, cwd, route):
+        with open_output(route.setup) as f:
+            lines = f.readlines()
+        with open_output(route.tiny) as f:
+            tiny = f.read()
+        result = Result()
+        result.endpoints = len(lines)
+        result.tiny = tiny
+        return result
+
+def test_compress_outputs(tmp_path):
+    (tmp_path / "a.log").write_text(report_text)
+    (tmp_path / "b.log.gz").write_bytes(gzip.compress(b"already compressed"))
+    (tmp_path / "result.json").write_text("{}")
+    os.symlink(tmp_path / "a.log", tmp_path / "link.log")
+    stats = compress_outputs(tmp_path, ["*.log", "*.json", "*.gz"], GzipCompressor(), workers=2)
+    assert stats["codec"] == "gzip"
+    assert stats["files"] == 1
+    assert stats["bytes_in"] == len(report_text)
+    assert 0 < stats["bytes_out"] < stats["bytes_in"]
+    assert not (tmp_path / "a.log").exists()
+    assert output_path(tmp_path / "a.log") == tmp_path / "a.log.gz"
+    assert (tmp_path / "result.json").exists()
+    assert (tmp_path / "b.log.gz").exists() and not (tmp_path / "b.log.gz.gz").exists()
+
+    with open_output(tmp_path / "a.log") as f:
+        assert f.read() == report_text
+    with open_output(tmp_path / "a.log", "rb") as f:
+        assert f.read() == report_text.encode()
+    with pytest.raises(FileNotFoundError):
+        open_output(tmp_path / "missing.log")
+    with pytest.raises(ValueError):
+        open_output(tmp_path / "a.log", "w")
+
+def test_get_compressor(monkeypatch):
+    monkeypatch.setenv("PYDESIGNFLOW_COMPRESSION", "gzip")
+    assert get_compressor().name == "gzip"
+    with pytest.raises(ValueError):
+        get_compressor("rar")
+    assert format_size(512) == "512 B"
+    assert format_size(3 * 1024**3) == "3.0 GiB"
+
+def test_invalid_compression(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("PYDESIGNFLOW_COMPRESSION", "rar")
+    flow = Flow()
+    flow['impl'] = Impl()
+    build_dir = tmp_path / "build"
+    # The compressor is only created when outputs are compressed:
+    flow.cli_main(['--build-dir', str(build_dir)])
+    assert "impl" in capsys.readouterr().out
+    flow.cli_main(['impl.route', '--build-dir', str(build_dir), '--no-compress'])
+    assert (build_dir / "impl" / "route" / "route.log").exists()
+    sess = flow.session_at(build_dir)
+    with pytest.raises(ValueError):
+        sess.compressor
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_target(tmp_path, capsys, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    flow = Flow(compression=compression)
+    flow['impl'] = Impl()
+    build_dir = tmp_path / "build"
+    flow.cli_main(['impl.signoff', '--build-dir', str(build_dir)])
+    assert "Compressed 2 output(s) of impl.route" in capsys.readouterr().out
+
+    route_dir = build_dir / "impl" / "route"
+    suffix = get_compressor(compression).suffix
+    assert (route_dir / f"route.log{suffix}").exists()
+    assert not (route_dir / "route.log").exists()
+    assert (route_dir / "reports" / "timing" / f"setup.rpt{suffix}").exists()
+    assert (route_dir / "reports" / "summary.txt").exists()
+    assert (route_dir / "tiny.log").exists() # Not smaller when compressed
+
+    sess = flow.session_at(build_dir)
+    route = sess.results[TargetId('impl', 'route')]
+    assert route.compression["codec"] == compression
+    assert route.compression["files"] == 2
+    assert route.compression["bytes_in"] == 2 * len(report_text)
+    assert route.compression["bytes_out"] < route.compression["bytes_in"] // 4
+    signoff = sess.results[TargetId('impl', 'signoff')]
+    assert signoff.endpoints == 5000
+    assert signoff.tiny == "x"
+    assert "compression" not in signoff.attrs
+
+def test_no_compress(tmp_path):
+    flow = Flow(compression="gzip")
+    flow['impl'] = Impl()
+    build_dir = tmp_path / "build"
+    flow.cli_main(['impl.route', '--build-dir', str(build_dir), '--no-compress'])
+    assert (build_dir / "impl" / "route" / "route.log").exists()
+    assert "compression" not in flow.session_at(build_dir).results[TargetId('impl', 'route')].attrs
@@ -0,0 +1,152 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+import time
+import socket
+import subprocess
+from pathlib import Path
+import pytest
+from pydesignflow import daemon as daemon_module
+from pydesignflow.cli import CLI
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets not available")
+
+flow_source = '''
+from pydesignflow import Flow, Block, task, Result
+
+print("importing flow")
+
+class Top(Block):
+    """Top block"""
+
+    @task()
+    def step1(self, cwd):
+        """First step"""
+        return Result()
+
+    @task(requires={'s1': '.step1'})
+    def step2(self, cwd, s1):
+        """Second step"""
+        return Result()
+
+flow = Flow()
+flow['top'] = Top()
+'''
+
+def flow_env(tmp_path):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(Path(__file__).resolve().parent.parent)
+    env["XDG_CACHE_HOME"] = str(tmp_path / "cache")
+    env.pop("PYDESIGNFLOW_NO_DAEMON", None)
+    return env
+
+def run_flow(path, env, *args):
+    return subprocess.run([sys.executable, "-c", "from pydesignflow.shortcut import main; main()", *args],
+        cwd=path, env=env, capture_output=True, text=True)
+
+@pytest.fixture
+def daemon_flow(tmp_path):
+    path = tmp_path / "proj"
+    path.mkdir()
+    (path / "flow.py").write_text(flow_source)
+    env = flow_env(tmp_path)
+    daemon = subprocess.Popen([sys.executable, "-c", "from pydesignflow.shortcut import main; main()", "--daemon"],
+        cwd=path, env=env, stdout=subprocess.PIPE, text=True)
+    socket_dir = tmp_path / "cache" / "pydesignflow" / "daemon"
+    deadline = time.monotonic() + 20
+    while not (socket_dir.exists() and any(socket_dir.glob("*.sock"))):
+        assert daemon.poll() is None
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    yield path, env, daemon
+    daemon.terminate()
+    daemon.wait()
+
+def test_is_daemon_query():
+    assert CLI.is_daemon_query([])
+    assert CLI.is_daemon_query(['top', '--brief'])
+    assert CLI.is_daemon_query(['top.step2', '--dry-run'])
+    assert CLI.is_daemon_query(['top', 'step2', '-d', '-j', '4'])
+    assert not CLI.is_daemon_query(['top.step2'])
+    assert not CLI.is_daemon_query(['--clean'])
+    assert not CLI.is_daemon_query(['--monitor'])
+    assert not CLI.is_daemon_query(['--daemon'])
+    assert not CLI.is_daemon_query(['worker'])
+    assert not CLI.is_daemon_query(['--help'])
+    assert not CLI.is_daemon_query(['--trace', 'trace.json'])
+    assert not CLI.is_daemon_query(['top.step2', '-d', '--trace', 'trace.json'])
+
+def test_is_daemon_query_silent(capsys):
+    # Invalid args are reported by the CLI, not while checking them:
+    assert not CLI.is_daemon_query(['--jobs', 'many'])
+    assert not CLI.is_daemon_query(['--executor', 'cloud'])
+    assert not CLI.is_daemon_query(['--trace'])
+    captured = capsys.readouterr()
+    assert captured.out == "" and captured.err == ""
+
+def test_daemon(daemon_flow):
+    path, env, daemon = daemon_flow
+
+    # Status is answered by the daemon, which imported the flow already:
+    proc = run_flow(path, env, "top")
+    assert proc.returncode == 0
+    assert "importing flow" not in proc.stdout
+    assert ".step1" in proc.stdout and "First step" in proc.stdout
+
+    # Dry run
+    proc = run_flow(path, env, "top.step2", "--dry-run")
+    assert proc.returncode == 0
+    assert "‣ top.step1" in proc.stdout and "‣ top.step2" in proc.stdout
+    assert "Estimated makespan" in proc.stdout
+
+    # Errors are returned with exit code:
+    proc = run_flow(path, env, "missing")
+    assert proc.returncode == 1
+    assert "Block 'missing' not found." in proc.stderr
+
+    # Builds run in the client. The daemon picks up the new results:
+    proc = run_flow(path, env, "top.step2")
+    assert proc.returncode == 0
+    assert "importing flow" in proc.stdout
+    proc = run_flow(path, env, "top.step2", "--dry-run")
+    assert "‣ top.step1" not in proc.stdout
+    proc = run_flow(path, env, "top")
+    assert proc.stdout.count("✓") == 2
+
+    # Changes of the flow sources are picked up:
+    source = flow_source.replace('"""Second step"""', '"""Second step, revised"""')
+    (path / "flow.py").write_text(source)
+    st = os.stat(path / "flow.py")
+    os.utime(path / "flow.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    proc = run_flow(path, env, "top")
+    assert "importing flow" not in proc.stdout
+    assert "Second step, revised" in proc.stdout
+
+    # A broken flow is imported by the client, which reports the error:
+    (path / "flow.py").write_text(source + "\nraise RuntimeError('broken flow')\n")
+    os.utime(path / "flow.py", ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    proc = run_flow(path, env)
+    assert proc.returncode != 0
+    assert "broken flow" in proc.stderr
+
+    assert daemon.poll() is None
+
+def test_request_timeout(tmp_path, monkeypatch):
+    # A daemon that accepts the connection but does not reply:
+    path = tmp_path / "daemon.sock"
+    monkeypatch.setattr(daemon_module, "socket_path", lambda base_dir: path)
+    monkeypatch.setattr(daemon_module, "request_timeout", 0.2)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(str(path))
+        sock.listen(1)
+        start = time.monotonic()
+        assert daemon_module.request(tmp_path, [], False) is None
+        assert time.monotonic() - start < 5
+
+def test_daemon_already_running(daemon_flow):
+    path, env, daemon = daemon_flow
+    proc = run_flow(path, env, "--daemon")
+    assert proc.returncode == 1
+    assert "already serving" in proc.stderr
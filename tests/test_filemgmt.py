@@ -1,6 +1,8 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+import time
 import pytest
 from pydesignflow import filemgmt
 from pathlib import Path
@@ -68,3 +70,195 @@ def test_filecollection(tmp_path):
 
     with pytest.raises(filemgmt.FileManagementError):
         c(speed='fast') # Does not give unique result, therefore fails.
+
+def linear_filter(items, missing_key_deselects=False, **filters):
+    # Reference implementation: linear scan over all items.
+    res = []
+    for item in items:
+        keep = True
+        for key, value in filters.items():
+            try:
+                if item.attrs[key] != value:
+                    keep = False
+            except KeyError:
+                if missing_key_deselects:
+                    keep = False
+        if keep:
+            res.append(item)
+    return res
+
+def test_filecollection_index(tmp_path):
+    def lib(name):
+        path = tmp_path / name
+        path.touch()
+        return path
+    c = filemgmt.FileCollection()
+    for i in range(60):
+        attrs = {'corner': ('ss', 'tt', 'ff')[i % 3], 'voltage': (0.9, 1.0, 1.1, 1)[i % 4]}
+        if i % 5:
+            attrs['temp'] = (-40, 25, 125)[i % 3 - 1]
+        if i % 7 == 0:
+            attrs['tags'] = ['unhashable']
+        c.add(lib(f"lib{i}.lib"), **attrs)
+
+    queries = [
+        {},
+        {'corner': 'tt'},
+        {'voltage': 1},  # matches 1.0 as well
+        {'corner': 'ss', 'temp': 125},
+        {'corner': 'ff', 'voltage': 1.1, 'temp': -40},
+        {'temp': 25, 'missing': 'x'},
+        {'corner': 'xx'},
+        {'tags': ['unhashable']},
+        {'voltage': [1]},
+        {'temp': float('nan')},
+    ]
+    for filters in queries:
+        for mkd in (False, True):
+            expected = [item.path for item in linear_filter(c.items, mkd, **filters)]
+            got = [item.path for item in c.filter(missing_key_deselects=mkd, **filters)]
+            assert got == expected, (filters, mkd)
+
+    # Indexes and memoized one() results follow added items:
+    assert c(corner='tt', voltage=0.9, temp=-40, tags=['unhashable'], missing_key_deselects=True) == tmp_path / Path("lib28.lib")
+    c.add(lib("new.lib"), corner='tt', voltage=0.95, temp=25)
+    assert c(voltage=0.95) == tmp_path / Path("new.lib")
+    c.add(lib("new2.lib"), corner='tt', voltage=0.95, temp=125)
+    with pytest.raises(filemgmt.FileManagementError):
+        c(voltage=0.95)
+    assert c(voltage=0.95, temp=125) == tmp_path / Path("new2.lib")
+
+    # Changes of the items list are detected:
+    c.items = c.items[:10]
+    assert [item.path for item in c.filter(corner='tt')] == [tmp_path / Path("lib1.lib"), tmp_path / Path("lib4.lib"), tmp_path / Path("lib7.lib")]
+    with pytest.raises(filemgmt.FileManagementError):
+        c(voltage=0.95)
+
+    # Replaced items and modified attrs are detected:
+    c.items[0] = filemgmt.FileCollectionItem(lib("replaced.lib"), {'corner': 'ss', 'voltage': 0.95, 'temp': 125})
+    assert c(voltage=0.95) == tmp_path / Path("replaced.lib")
+    c.items[0].attrs['voltage'] = 0.8
+    with pytest.raises(filemgmt.FileManagementError):
+        c(voltage=0.95)
+    assert c(voltage=0.8) == tmp_path / Path("replaced.lib")
+    c.items[1].attrs = {'voltage': 0.8, 'corner': 'xx'}
+    assert c(corner='xx') == tmp_path / Path("lib1.lib")
+    c.items[1].attrs.update(corner='yy')
+    assert c(corner='yy') == tmp_path / Path("lib1.lib")
+    del c.items[1]
+    assert c(voltage=0.8) == tmp_path / Path("replaced.lib")
+    c.items.sort(key=lambda item: item.path.name, reverse=True)
+    assert [item.path.name for item in c.filter(corner='tt')] == ["lib7.lib", "lib4.lib"]
+    # Attributes of tagged items:
+    lazy = c.lazy().tag(view='nldm').collect()
+    assert lazy(view='nldm', voltage=0.8) == tmp_path / Path("replaced.lib")
+    lazy.items[0].attrs['voltage'] = 0.7
+    assert lazy(view='nldm', voltage=0.7) == tmp_path / Path("replaced.lib")
+
+def test_frompattern_scan_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYDESIGNFLOW_SCAN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(filemgmt.DirectoryScanner, "loaded", {})
+    pdk = tmp_path / "pdk"
+    for corner in ("ss", "tt", "ff"):
+        (pdk / corner).mkdir(parents=True)
+        for volt in ("0p90", "1p10"):
+            (pdk / corner / f"lib_{volt}.lib").touch()
+        (pdk / corner / "readme.txt").touch()
+    (pdk / "top_tt.lib").touch()
+    for d in (pdk, pdk / "ss", pdk / "tt", pdk / "ff"):
+        os.utime(d, (time.time() - 100, time.time() - 100))
+
+    def decode(s):
+        corner, volt = s.split("/lib_")
+        return {'corner': corner, 'voltage': volt}
+    pattern = r"(.*)\.lib"
+    rec_pattern = r"(\w+/lib_\w+)\.lib"
+
+    # Non-recursive scans do not start a thread pool:
+    with monkeypatch.context() as m:
+        m.setattr(filemgmt, "ThreadPoolExecutor", None)
+        c = filemgmt.FileCollection.frompattern(pdk, pattern, lambda s: {'name': s})
+    assert [item.path for item in c] == [pdk / "top_tt.lib"]
+    c = filemgmt.FileCollection.frompattern(pdk, rec_pattern, decode, recursive=True)
+    assert len(c) == 6
+    assert c(corner='ff', voltage='1p10') == pdk / "ff" / "lib_1p10.lib"
+
+    scandir_calls = []
+    scandir = os.scandir
+    def counting_scandir(path):
+        scandir_calls.append(path)
+        return scandir(path)
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+
+    # Unchanged directories are not listed again, also in a new process:
+    monkeypatch.setattr(filemgmt.DirectoryScanner, "loaded", {})
+    c = filemgmt.FileCollection.frompattern(pdk, rec_pattern, decode, recursive=True)
+    assert len(c) == 6
+    assert scandir_calls == []
+
+    # Changed directories are listed again:
+    (pdk / "tt" / "lib_1p20.lib").touch()
+    c = filemgmt.FileCollection.frompattern(pdk, rec_pattern, decode, recursive=True)
+    assert len(c) == 7
+    assert c(corner='tt', voltage='1p20') == pdk / "tt" / "lib_1p20.lib"
+    assert scandir_calls == [str(pdk / "tt")]
+
+    # Without cache, all directories are listed:
+    c = filemgmt.FileCollection.frompattern(pdk, rec_pattern, decode, recursive=True, cache=False)
+    assert len(c) == 7
+    assert len(scandir_calls) == 5
+
+    # Matched entries that are not files are errors, like in add():
+    with pytest.raises(filemgmt.FileManagementError):
+        filemgmt.FileCollection.frompattern(pdk, r"(t.)", lambda s: {})
+    with pytest.raises(filemgmt.FileManagementError):
+        filemgmt.FileCollection.frompattern(pdk, r"(.*)\.v", lambda s: {})
+    with pytest.raises(filemgmt.FileManagementError):
+        filemgmt.FileCollection.frompattern(pdk / "missing", pattern, lambda s: {})
+
+def test_lazy_filecollection(tmp_path):
+    c = filemgmt.FileCollection()
+    for i in range(12):
+        path = tmp_path / f"lib{i}.lib"
+        path.touch()
+        attrs = {'corner': ('ss', 'tt', 'ff')[i % 3], 'voltage': (0.9, 1.1)[i % 2]}
+        if i % 4:
+            attrs['temp'] = 25
+        c.add(path, **attrs)
+    other = filemgmt.FileCollection(c.items[:3]).tag(extra=True)
+
+    def pipeline(coll, other):
+        return ((coll.filter(corner='tt') + coll.filter(corner='ff', missing_key_deselects=True, temp=25))
+            .tag(view='nldm').filter(voltage=1.1).tag(view='ccs', rev=2) + other)
+    eager = pipeline(c, other)
+    lazy = pipeline(c.lazy(), other.lazy())
+    assert isinstance(lazy, filemgmt.LazyFileCollection)
+    assert [(p, dict(a)) for p, a in lazy] == [(p, a) for p, a in eager]
+    assert len(lazy) == len(eager)
+    assert [i.path for i in lazy.filter(corner='ff')] == [i.path for i in eager.filter(corner='ff')]
+    assert lazy[0].attrs == eager[0].attrs
+    assert c.lazy().filter(corner='tt').one(voltage=0.9, temp=25, missing_key_deselects=True) == tmp_path / "lib10.lib"
+
+    # Items are not copied, attribute dicts are shared:
+    tagged = list(c.lazy().tag(view='nldm'))
+    assert tagged[0].attrs['view'] == 'nldm'
+    assert c.items[0].attrs is tagged[0].attrs._layers[-1]
+    assert tagged[0].attrs._layers[0] is tagged[1].attrs._layers[0]
+    assert list(c.lazy().filter(corner='ss'))[0] is c.items[0]
+
+    # Copy-on-write:
+    tagged[0].attrs['view'] = 'ccs'
+    tagged[0].attrs['corner'] = 'xx'
+    assert tagged[0].attrs == c.items[0].attrs | {'view': 'ccs', 'corner': 'xx'}
+    assert tagged[1].attrs['view'] == 'nldm'
+    assert c.items[0].attrs['corner'] == 'ss'
+    assert 'view' not in c.items[0].attrs
+
+    # The pipeline is evaluated when it is used:
+    query = c.lazy().filter(voltage=0.9, temp=25, missing_key_deselects=True)
+    path = tmp_path / "new.lib"
+    path.touch()
+    c.add(path, corner='tt', voltage=0.9, temp=25)
+    assert len(query) == 4
+    assert query[-1].path == path
+    assert len(c.filter(voltage=1.1) + query) == 6 + 4
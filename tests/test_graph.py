@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import random
+import pytest
+from pydesignflow import Flow, Block, TargetId, FlowError, task
+from pydesignflow.target import TargetPrototype
+
+def get_flow():
+    from .flow_example1 import flow
+    return flow
+
+def test_graph_edges():
+    graph = get_flow().graph()
+    assert get_flow().graph() is graph
+    idx = graph.index[TargetId('top', 'step2')]
+    assert graph.tids[idx] == TargetId('top', 'step2')
+    assert [graph.tids[d] for d in graph.deps[idx]] == [TargetId('top', 'step1')]
+    step1 = graph.index[TargetId('top', 'step1')]
+    assert idx in graph.dependents[step1]
+    for node, deps in enumerate(graph.deps):
+        for dep in deps:
+            assert node in graph.dependents[dep]
+
+def test_graph_unknown_target():
+    class BadBlock(Block):
+        @task(requires={'x': '=other.step1'})
+        def bad(self, cwd, x):
+            pass
+    flow = Flow()
+    flow['bad'] = BadBlock()
+    with pytest.raises(FlowError):
+        flow.graph()
+
+def test_graph_rebuilt_when_block_added():
+    class A(Block):
+        @task()
+        def a(self, cwd):
+            pass
+    flow = Flow()
+    flow['a1'] = A()
+    graph = flow.graph()
+    flow['a2'] = A()
+    assert flow.graph() is not graph
+    assert len(flow.graph()) == 2
+
+def make_chain_flow(length):
+    attrs = {'t0': TargetPrototype(lambda self, cwd: None, {}, False, False)}
+    for i in range(1, length):
+        attrs[f't{i}'] = TargetPrototype(lambda self, cwd, d: None,
+            {'d': f'.t{i-1}'}, False, False)
+    flow = Flow()
+    flow['chain'] = type('ChainBlock', (Block,), attrs)()
+    return flow
+
+def test_plan_deep_chain(tmp_path):
+    # Deeper than the recursion limit:
+    flow = make_chain_flow(5000)
+    sess = flow.session_at(tmp_path)
+    plan = sess.plan('chain', 't4999', build_dependencies='missing')
+    assert plan.target_sequence == [TargetId('chain', f't{i}') for i in range(5000)]
+
+def reference_order(flow, tid, present, rebuild):
+    # Recursive DFS, as previously implemented in BuildSession.
+    order = []
+    visited = set()
+    def dfs(tid):
+        visited.add(tid)
+        for _, dep in flow.target(tid).resolve_requires():
+            if dep in present and not rebuild and not flow.target(dep).always_rebuild:
+                continue
+            if dep not in visited:
+                dfs(dep)
+        order.append(tid)
+    dfs(tid)
+    return order
+
+def test_plan_matches_recursive_dfs(tmp_path):
+    rnd = random.Random(1)
+    n = 60
+    attrs = {}
+    for i in range(n):
+        deps = rnd.sample(range(i), min(i, rnd.randint(0, 4)))
+        attrs[f't{i}'] = TargetPrototype(lambda self, cwd, **kw: None,
+            {f'd{j}': f'.t{j}' for j in deps}, always_rebuild=(i % 7 == 3), hidden=False)
+    flow = Flow()
+    flow['r'] = type('RandomBlock', (Block,), attrs)()
+    sess = flow.session_at(tmp_path)
+    present = {TargetId('r', f't{i}') for i in rnd.sample(range(n), n//3)}
+    for tid in present:
+        sess.results[tid] = None
+    for rebuild in False, True:
+        for i in range(n):
+            tid = TargetId('r', f't{i}')
+            assert sess._dependency_list(tid, rebuild) == reference_order(flow, tid, present, rebuild)
@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import shutil
+import threading
+from pydesignflow import TargetId
+from pydesignflow.index import ResultIndex
+
+def get_flow_session(build_dir):
+    from .flow_example1 import flow
+    return flow.session_at(build_dir)
+
+def test_index_written(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step3', build_dependencies='missing').run()
+    assert (tmp_path / '.pydesignflow' / 'index.log').exists()
+
+    state = ResultIndex(tmp_path).load()
+    assert set(state.entries) == {
+        TargetId('top', 'step1'),
+        TargetId('top', 'step2'),
+        TargetId('top', 'step3'),
+    }
+
+    sess2 = get_flow_session(tmp_path)
+    assert sess2.get_result(TargetId('top', 'step3')).my_key == "step3 res (step2 res (step1 res))"
+
+def test_index_used(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step1').run()
+    # Changing a result.json file does not modify any directory. The index
+    # is not invalidated, therefore the change is not seen.
+    with open(tmp_path / 'top' / 'step1' / 'result.json', 'w') as f:
+        f.write("invalid")
+    sess2 = get_flow_session(tmp_path)
+    assert sess2.get_result(TargetId('top', 'step1')).my_key == "step1 res"
+
+def test_index_stale(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step2', build_dependencies='missing').run()
+    shutil.rmtree(tmp_path / 'top' / 'step1')
+    sess2 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step1') not in sess2.results
+    assert TargetId('top', 'step2') in sess2.results
+
+    shutil.rmtree(tmp_path / 'top')
+    sess3 = get_flow_session(tmp_path)
+    assert len(sess3.results) == 0
+
+def test_index_rebuild(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step2', build_dependencies='missing').run()
+    index_fn = tmp_path / '.pydesignflow' / 'index.log'
+
+    index_fn.unlink()
+    sess2 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step2') in sess2.results
+    assert index_fn.exists()
+
+    with open(index_fn, 'w') as f:
+        f.write("garbage\n")
+    sess3 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step2') in sess3.results
+    assert ResultIndex(tmp_path).load() != None
+
+def test_index_incomplete_and_clean(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step2', build_dependencies='missing').run()
+    (tmp_path / 'top' / 'step3').mkdir()
+    sess2 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step3') in sess2.incomplete
+
+    sess2.clean('top', 'step1')
+    assert TargetId('top', 'step1') not in sess2.results
+    sess3 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step1') not in sess3.results
+    assert TargetId('top', 'step2') in sess3.results
+
+def test_index_read_only(tmp_path, monkeypatch):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step2', build_dependencies='missing').run()
+    shutil.rmtree(tmp_path / 'top' / 'step1')
+    def read_only(*args, **kwargs):
+        raise PermissionError("read-only build directory")
+    monkeypatch.setattr(ResultIndex, 'append', read_only)
+    monkeypatch.setattr(ResultIndex, 'rewrite', read_only)
+    monkeypatch.setattr(ResultIndex, 'create_meta_dir', read_only)
+
+    # Rescan of a block
+    sess2 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step1') not in sess2.results
+    assert TargetId('top', 'step2') in sess2.results
+
+    # Full rescan
+    (tmp_path / '.pydesignflow' / 'index.log').unlink()
+    sess3 = get_flow_session(tmp_path)
+    assert TargetId('top', 'step1') not in sess3.results
+    assert TargetId('top', 'step2') in sess3.results
+
+def test_index_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(ResultIndex, 'compact_threshold', 10)
+    index_fn = tmp_path / '.pydesignflow' / 'index.log'
+    sess = get_flow_session(tmp_path)
+    for i in range(10):
+        sess.plan('top', 'step1').run()
+    records_before = len(index_fn.read_text().splitlines())
+
+    sess2 = get_flow_session(tmp_path)
+    records_after = len(index_fn.read_text().splitlines())
+    assert records_after < records_before
+    assert ResultIndex(tmp_path).load().superseded() == 0
+    assert sess2.get_result(TargetId('top', 'step1')).my_key == "step1 res"
+
+def test_index_lock(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'step1').run()
+    index = ResultIndex(tmp_path)
+    state = index.load()
+    appended = threading.Event()
+    def append():
+        index.append([("S", "top", "step2")])
+        appended.set()
+    # Records cannot be appended while the index is replaced:
+    with index.locked(exclusive=True):
+        thread = threading.Thread(target=append)
+        thread.start()
+        assert not appended.wait(timeout=0.2)
+    thread.join()
+    assert TargetId('top', 'step2') in index.load().entries
+    # The appended record is not lost by compaction of the loaded state:
+    assert not index.rewrite(state, expected_size=state.size)
+    assert TargetId('top', 'step2') in index.load().entries
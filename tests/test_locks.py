@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import socket
+import threading
+import subprocess
+from pydesignflow import Flow, Block, TargetId, task
+from pydesignflow.locks import TargetLocks
+from pydesignflow.ansiterm import NoColor
+
+class SocBlock(Block):
+    def __init__(self):
+        super().__init__()
+        self.gen_rtl_runs = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    @task()
+    def gen_rtl(self, cwd):
+        self.gen_rtl_runs += 1
+        self.started.set()
+        assert self.release.wait(timeout=10)
+
+    @task(requires={'rtl': '.gen_rtl'})
+    def sim(self, cwd, rtl):
+        pass
+
+    @task(requires={'rtl': '.gen_rtl'})
+    def fpga(self, cwd, rtl):
+        pass
+
+def get_flow():
+    flow = Flow()
+    flow['soc'] = SocBlock()
+    return flow
+
+def test_concurrent_invocations(tmp_path, capsys):
+    flow = get_flow()
+    block = flow['soc']
+    sess_a = flow.session_at(tmp_path)
+    sess_b = flow.session_at(tmp_path)
+    sess_b.locks.poll_interval = 0.05
+    thread_a = threading.Thread(target=sess_a.plan('soc', 'sim', build_dependencies='missing').run)
+    thread_a.start()
+    assert block.started.wait(timeout=10)
+    # gen_rtl is missing for sess_b as well:
+    plan_b = sess_b.plan('soc', 'fpga', build_dependencies='missing')
+    assert TargetId('soc', 'gen_rtl') in plan_b.target_sequence
+    waiting = threading.Event()
+    failed_attempts = []
+    try_acquire = sess_b.locks.try_acquire
+    def try_acquire_b(tid):
+        if try_acquire(tid):
+            return True
+        failed_attempts.append(tid)
+        if len(failed_attempts) > 1:
+            # The waiting message was printed after the first attempt.
+            waiting.set()
+        return False
+    sess_b.locks.try_acquire = try_acquire_b
+    thread_b = threading.Thread(target=plan_b.run)
+    thread_b.start()
+    assert "running" in sess_b.status(None, show_hidden=False, color=NoColor, brief=False)
+    # sess_b is blocked on the lock before gen_rtl finishes:
+    assert waiting.wait(timeout=10)
+    block.release.set()
+    thread_a.join()
+    thread_b.join()
+    assert block.gen_rtl_runs == 1
+    assert TargetId('soc', 'fpga') in sess_b.results
+    out = capsys.readouterr().out
+    assert f"Waiting for target soc.gen_rtl, which is being built by {socket.gethostname()}:{os.getpid()}." in out
+    assert "Using result of target soc.gen_rtl built by other process." in out
+    assert not [name for name in os.listdir(sess_a.locks.path) if name.endswith(".lock")]
+
+def test_finished_before_lock(tmp_path, capsys):
+    flow = get_flow()
+    block = flow['soc']
+    block.release.set()
+    sess_a = flow.session_at(tmp_path)
+    sess_b = flow.session_at(tmp_path)
+    plan_b = sess_b.plan('soc', 'fpga', build_dependencies='missing')
+    assert TargetId('soc', 'gen_rtl') in plan_b.target_sequence
+    # gen_rtl is built and unlocked by sess_a before sess_b runs its plan:
+    sess_a.plan('soc', 'sim', build_dependencies='missing').run()
+    plan_b.run()
+    assert block.gen_rtl_runs == 1
+    assert TargetId('soc', 'fpga') in sess_b.results
+    assert "Using result of target soc.gen_rtl built by other process." in capsys.readouterr().out
+
+    # Requested targets and rebuilt dependencies are built:
+    sess_b.plan('soc', 'gen_rtl').run()
+    assert block.gen_rtl_runs == 2
+    sess_b.plan('soc', 'fpga', build_dependencies='all').run()
+    assert block.gen_rtl_runs == 3
+
+def test_stale_locks(tmp_path):
+    locks = TargetLocks(tmp_path, poll_interval=0.05)
+    tid = TargetId('soc', 'gen_rtl')
+    # Lock without heartbeat:
+    locks.lock_path(tid).write_text("otherhost:1\n")
+    assert locks.running() == {tid}
+    os.utime(locks.lock_path(tid), (0, 0))
+    assert locks.running() == set()
+    with locks.hold(tid) as waited:
+        assert not waited
+        assert locks.holder(tid) == locks.owner
+    assert locks.holder(tid) is None
+
+    # Lock of a process of this host that has exited:
+    proc = subprocess.Popen(["true"])
+    proc.wait()
+    locks.lock_path(tid).write_text(f"{socket.gethostname()}:{proc.pid}\n")
+    assert locks.running() == set()
+    with locks.hold(tid) as waited:
+        assert not waited
+
+def test_break_stale_lock_race(tmp_path):
+    tid = TargetId('soc', 'gen_rtl')
+    locks_a = TargetLocks(tmp_path)
+    locks_a.owner = "hosta:1"
+    class RacingLocks(TargetLocks):
+        def is_stale(self, path, now, state=None):
+            stale = super().is_stale(path, now, state)
+            # Process A breaks the stale lock and acquires the target before
+            # this process has renamed the lock:
+            os.unlink(path)
+            assert locks_a.try_acquire(tid)
+            return stale
+    locks_b = RacingLocks(tmp_path)
+    locks_b.lock_path(tid).write_text("otherhost:1\n")
+    os.utime(locks_b.lock_path(tid), (0, 0))
+    assert not locks_b.try_acquire(tid)
+    assert locks_b.holder(tid) == "hosta:1"
+    assert not list(tmp_path.glob("*.stale"))
+    locks_a.release(tid)
+
+def test_status_running(tmp_path):
+    flow = get_flow()
+    sess = flow.session_at(tmp_path)
+    tid = TargetId('soc', 'sim')
+    sess.task_dir('soc', 'sim').mkdir(parents=True)
+    sess.reload_results()
+    sess.locks.path.mkdir()
+    sess.locks.lock_path(tid).write_text("otherhost:1\n")
+    assert "running" in sess.status('soc', show_hidden=True, color=NoColor, brief=False)
+    # Crashed build:
+    os.utime(sess.locks.lock_path(tid), (0, 0))
+    status = sess.status('soc', show_hidden=True, color=NoColor, brief=False)
+    assert "running" not in status
+    assert "incomplete" in status
+    # Status queries do not write to the build directory:
+    assert not (sess.locks.path / "clock").exists()
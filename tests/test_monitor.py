@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import time
+import errno
+from pydesignflow import TargetId, inotify
+from pydesignflow.monitor import Monitor, BuildDirWatcher
+
+def get_flow_session(build_dir):
+    from .flow_example1 import flow
+    return flow.session_at(build_dir)
+
+def wait_for_messages(m, count, timeout=5.0):
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count and time.monotonic() < deadline:
+        messages += m.step()
+    return messages
+
+def test_watcher(tmp_path):
+    tmp_path = tmp_path / 'build'
+    sess = get_flow_session(tmp_path)
+    try:
+        watcher = BuildDirWatcher(sess)
+    except OSError:
+        pytest.skip("inotify not available")
+    # Build directory does not exist yet:
+    assert not watcher.build_dir_watched
+
+    builder = get_flow_session(tmp_path)
+    builder.plan('top', 'step1').run()
+    changed = watcher.wait(timeout=1.0)
+    assert TargetId('top', 'step1') in changed
+    assert watcher.build_dir_watched
+
+    builder.plan('top', 'step2').run()
+    changed = set()
+    deadline = time.monotonic() + 5.0
+    while TargetId('top', 'step2') not in changed and time.monotonic() < deadline:
+        changed |= watcher.wait(timeout=0.5)
+    assert TargetId('top', 'step2') in changed
+    assert TargetId('top', 'step1') not in changed
+    watcher.close()
+
+def test_monitor_inotify(tmp_path):
+    (tmp_path / 'top').mkdir()
+    m = Monitor(get_flow_session(tmp_path))
+    if not m.watcher:
+        pytest.skip("inotify not available")
+    get_flow_session(tmp_path).plan('top', 'step1').run()
+    messages = wait_for_messages(m, 1)
+    assert len(messages) == 1
+    assert messages[0].startswith("top.step1: finished on ")
+    assert TargetId('top', 'step1') in m.sess.results
+
+    (tmp_path / 'top' / 'step2').mkdir()
+    assert wait_for_messages(m, 1) == ["top.step2: started"]
+
+def test_monitor_inotify_reload(tmp_path):
+    m = Monitor(get_flow_session(tmp_path), reload_interval=0.0)
+    if not m.watcher:
+        pytest.skip("inotify not available")
+    # Changes made by other hosts of a network file system are not reported
+    # by inotify.
+    m.watcher.wait = lambda timeout: set()
+    get_flow_session(tmp_path).plan('top', 'step1').run()
+    messages = m.step()
+    assert len(messages) == 1
+    assert messages[0].startswith("top.step1: finished on ")
+
+def test_monitor_watch_limit(tmp_path, monkeypatch):
+    m = Monitor(get_flow_session(tmp_path), refresh_interval=0.0)
+    if not m.watcher:
+        pytest.skip("inotify not available")
+    def add_watch(path, mask):
+        raise OSError(errno.ENOSPC, "No space left on device", str(path))
+    monkeypatch.setattr(m.watcher.inotify, 'add_watch', add_watch)
+    # Watches for the new directories cannot be added, polling is used:
+    get_flow_session(tmp_path).plan('top', 'step1').run()
+    messages = []
+    deadline = time.monotonic() + 5.0
+    while not messages and time.monotonic() < deadline:
+        messages = m.step()
+    assert m.watcher is None
+    assert len(messages) == 1
+    assert messages[0].startswith("top.step1: finished on ")
+
+    # Watch limit reached at start:
+    monkeypatch.setattr(inotify.Inotify, 'add_watch', lambda self, path, mask: add_watch(path, mask))
+    assert Monitor(get_flow_session(tmp_path)).watcher is None
+
+def test_monitor_polling(tmp_path):
+    m = Monitor(get_flow_session(tmp_path), refresh_interval=0.0, use_inotify=False)
+    assert m.watcher is None
+    get_flow_session(tmp_path).plan('top', 'step1').run()
+    messages = m.step()
+    assert len(messages) == 1
+    assert messages[0].startswith("top.step1: finished on ")
@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import time
+import signal
+import pytest
+import threading
+from concurrent import futures
+from concurrent.futures import ALL_COMPLETED
+from pydesignflow import Flow, Block, TargetId, task, Result, executor
+
+class BarrierBlock(Block):
+    """
+    Tasks left and right can only finish when they run concurrently.
+    """
+    def __init__(self):
+        super().__init__()
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    @task()
+    def left(self, cwd):
+        print("left says hello")
+        self.barrier.wait()
+        r = Result()
+        r.my_key = "left"
+        return r
+
+    @task()
+    def right(self, cwd):
+        self.barrier.wait()
+        r = Result()
+        r.my_key = "right"
+        return r
+
+    @task(requires={'l':'.left', 'r':'.right'})
+    def join(self, cwd, l, r):
+        r_ = Result()
+        r_.my_key = f"join ({l.my_key}, {r.my_key})"
+        return r_
+
+class FailBlock(Block):
+    @task()
+    def fail(self, cwd):
+        raise RuntimeError("task failed")
+
+    @task()
+    def ok(self, cwd):
+        pass
+
+    @task(requires={'f':'.fail', 'o':'.ok'})
+    def after(self, cwd, f, o):
+        pass
+
+class InterruptBlock(Block):
+    """
+    Task hang interrupts the build (like Ctrl-C) once task other is running.
+    Both keep running until released.
+    """
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.other_started = threading.Event()
+        self.finished = []
+
+    @task()
+    def hang(self, cwd):
+        self.other_started.wait(timeout=10)
+        os.kill(os.getpid(), signal.SIGINT)
+        self.release.wait(timeout=10)
+        self.finished.append('hang')
+
+    @task()
+    def other(self, cwd):
+        self.other_started.set()
+        self.release.wait(timeout=10)
+        self.finished.append('other')
+
+    @task(requires={'h':'.hang', 'o':'.other'})
+    def both(self, cwd, h, o):
+        pass
+
+def get_flow_session(build_dir):
+    flow = Flow()
+    flow['b'] = BarrierBlock()
+    flow['f'] = FailBlock()
+    return flow.session_at(build_dir)
+
+def test_parallel_join(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('b', 'join', build_dependencies='missing').run(jobs=2)
+    res = sess.get_result(TargetId('b', 'join'))
+    assert res.my_key == "join (left, right)"
+
+def test_parallel_output_prefix(tmp_path, capsys):
+    sess = get_flow_session(tmp_path)
+    sess.plan('b', 'join', build_dependencies='missing').run(jobs=4)
+    out = capsys.readouterr().out
+    assert "[b.left] left says hello\n" in out
+    assert "Finished target b.join." in out
+
+def test_parallel_failure(tmp_path):
+    sess = get_flow_session(tmp_path)
+    with pytest.raises(RuntimeError):
+        sess.plan('f', 'after', build_dependencies='missing').run(jobs=2)
+    assert (tmp_path / 'f' / 'ok' / 'result.json').exists()
+    assert not (tmp_path / 'f' / 'fail' / 'result.json').exists()
+    assert not (tmp_path / 'f' / 'after').exists()
+
+def test_parallel_cli(tmp_path):
+    flow = get_flow_session(tmp_path).flow
+    flow.cli_main(['b.join', '--build-dir', str(tmp_path), '-j', '2'])
+    assert (tmp_path / 'b' / 'join' / 'result.json').exists()
+    with pytest.raises(SystemExit):
+        flow.cli_main(['b.join', '--build-dir', str(tmp_path), '-j', '0'])
+
+def test_parallel_interrupt(tmp_path, capsys):
+    flow = Flow()
+    flow['i'] = InterruptBlock()
+    sess = flow.session_at(tmp_path)
+    threading.Timer(0.5, flow['i'].release.set).start()
+    with pytest.raises(KeyboardInterrupt):
+        sess.plan('i', 'both', build_dependencies='missing').run(jobs=2)
+    # run() waits for the running targets, but does not start new ones.
+    assert sorted(flow['i'].finished) == ['hang', 'other']
+    assert (tmp_path / 'i' / 'other' / 'result.json').exists()
+    assert not (tmp_path / 'i' / 'both').exists()
+    assert "Interrupted, waiting for running target(s) i.hang, i.other." in capsys.readouterr().out
+
+def test_parallel_interrupt_twice(tmp_path, capsys, monkeypatch):
+    flow = Flow()
+    flow['i'] = InterruptBlock()
+    sess = flow.session_at(tmp_path)
+    # Interrupt again while waiting for all running targets:
+    def wait(fs, timeout=None, return_when=ALL_COMPLETED):
+        if return_when == ALL_COMPLETED:
+            raise KeyboardInterrupt()
+        return futures.wait(fs, timeout, return_when)
+    monkeypatch.setattr(executor, "wait", wait)
+    t_start = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        sess.plan('i', 'both', build_dependencies='missing').run(jobs=2)
+    # A second interrupt stops waiting for the running targets.
+    assert time.monotonic() - t_start < 5
+    assert flow['i'].finished == []
+    assert "Interrupted again, not waiting for running targets." in capsys.readouterr().out
+    flow['i'].release.set()
@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+import threading
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, FlowError
+from pydesignflow.resources import ResourcePool, parse_resources
+
+class LicenseBlock(Block):
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def work(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.2)
+        with self.lock:
+            self.active -= 1
+
+    @task(resources={'license:innovus': 1})
+    def pnr1(self, cwd):
+        self.work()
+
+    @task(resources={'license:innovus': 1})
+    def pnr2(self, cwd):
+        self.work()
+
+    @task(requires={'p1': '.pnr1', 'p2': '.pnr2'})
+    def signoff(self, cwd, p1, p2):
+        pass
+
+    @task(resources={'cpus': 64})
+    def big(self, cwd):
+        pass
+
+def test_parse_resources():
+    assert parse_resources("cpus=32, mem_gb=2.5,license:innovus=2,") \
+        == {'cpus': 32, 'mem_gb': 2.5, 'license:innovus': 2}
+    assert parse_resources("") == {}
+    with pytest.raises(ValueError):
+        parse_resources("cpus")
+    with pytest.raises(ValueError):
+        parse_resources("cpus=many")
+
+def test_env_resources(monkeypatch):
+    monkeypatch.setenv("PYDESIGNFLOW_RESOURCES", "cpus=16,mem_gb=64")
+    flow = Flow(resources={'cpus': 8})
+    assert flow.resources == {'cpus': 8, 'mem_gb': 64}
+
+def test_admit():
+    pool = ResourcePool({'cpus': 8, 'lic': 1})
+    started = pool.admit([('a', {'cpus': 6}), ('b', {'cpus': 4}), ('c', {'lic': 1}), ('d', {})], slots=10)
+    # b does not fit, c and d use other resources:
+    assert started == ['a', 'c', 'd']
+    assert pool.used == {'cpus': 6, 'lic': 1}
+    pool.release({'cpus': 6})
+    # e would fit, but b was waiting for cpus first:
+    assert pool.admit([('b', {'cpus': 8}), ('e', {'cpus': 1})], slots=10) == ['b']
+    pool.release({'cpus': 8})
+    assert pool.admit([('f', {}), ('g', {}), ('h', {})], slots=2) == ['f', 'g']
+
+def test_license_limit(tmp_path, capsys):
+    flow = Flow(resources={'license:innovus': 1})
+    flow['chip'] = LicenseBlock()
+    sess = flow.session_at(tmp_path)
+    sess.plan('chip', 'signoff', build_dependencies='missing').run(jobs=4)
+    assert flow['chip'].max_active == 1
+    assert "(queued " in capsys.readouterr().out
+
+def test_resource_override(tmp_path):
+    flow = Flow(resources={'license:innovus': 1})
+    flow['chip'] = LicenseBlock()
+    sess = flow.session_at(tmp_path)
+    sess.plan('chip', 'signoff', build_dependencies='missing').run(jobs=4, resources={'license:innovus': 2})
+    assert flow['chip'].max_active == 2
+
+def test_request_exceeds_pool(tmp_path):
+    flow = Flow(resources={'cpus': 32})
+    flow['chip'] = LicenseBlock()
+    sess = flow.session_at(tmp_path)
+    with pytest.raises(FlowError, match="requires 64 cpus"):
+        sess.plan('chip', 'big').run(jobs=2)
+    assert TargetId('chip', 'big') not in sess.results
+
+def test_makespan(tmp_path):
+    flow = Flow(resources={'license:innovus': 1})
+    flow['chip'] = LicenseBlock()
+    sess = flow.session_at(tmp_path)
+    for task_id in ('pnr1', 'pnr2'):
+        sess.durations.record(flow.target(TargetId('chip', task_id)), 100)
+    sched = sess.plan('chip', 'signoff', build_dependencies='missing').schedule()
+    assert sched.makespan(jobs=2) == 200
+    assert sched.makespan(jobs=2, resources={'license:innovus': 2}) == 100
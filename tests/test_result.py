@@ -1,7 +1,8 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-from pydesignflow import Flow, Block, task, Result
+from pydesignflow import Flow, Block, TargetId, task, Result
+from pydesignflow.result import EncodedValue
 from pathlib import Path
 from datetime import datetime
 import json
@@ -43,4 +44,28 @@ def test_json_file(tmp_path):
     assert result.bool_true == True
     assert result.bool_false == False
     assert result.path_test == tmp_path / Path("top/syn/whats/up")
-    assert result.date_test == datetime(year=1900, month=1, day=1)
\ No newline at end of file
+    assert result.date_test == datetime(year=1900, month=1, day=1)
+
+def test_lazy_decode(tmp_path):
+    sess = get_flow_session(tmp_path)
+    sess.plan('top', 'syn').run()
+
+    sess2 = get_flow_session(tmp_path)
+    tid = TargetId('top', 'syn')
+    assert tid in sess2.results
+    # Result is only decoded when accessed:
+    assert isinstance(sess2.results.entries[tid], str)
+    result = sess2.get_result(tid)
+    assert isinstance(sess2.results.entries[tid], Result)
+
+    # Attributes are converted individually on access:
+    assert isinstance(result._attrs['path_test'], EncodedValue)
+    assert result.path_test == tmp_path / Path("top/syn/whats/up")
+    assert result._attrs['path_test'] == tmp_path / Path("top/syn/whats/up")
+    assert isinstance(result._attrs['dict_attrib'], EncodedValue)
+
+    # Serialization of partially decoded results:
+    json_str = result.json(sess2, 'top', 'syn')
+    _, _, result2 = Result.from_json(sess2, json_str)
+    assert result2.attrs == result.attrs
+    assert result2.dict_attrib == {'hello': 'world', 'number': 100, 'nested': [1, 2, 'test']}
@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import array
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, Result
+
+class TimingBlock(Block):
+    @task()
+    def sta(self, cwd):
+        r = Result()
+        r.slack = array.array('d', [0.5 * i for i in range(10000)])
+        r.corners = {'ss': array.array('i', [1, 2, 3]), 'empty': array.array('d')}
+        return r
+
+    @task(requires={'sta': '.sta'})
+    def report(self, cwd, sta):
+        r = Result()
+        r.worst = min(sta.slack)
+        return r
+
+def get_flow():
+    flow = Flow()
+    flow['top'] = TimingBlock()
+    return flow
+
+def test_array_sidecar(tmp_path):
+    sess = get_flow().session_at(tmp_path)
+    sess.plan('top', 'report', build_dependencies='missing').run()
+    assert sess.get_result(TargetId('top', 'report')).worst == 0.0
+    task_dir = tmp_path / "top/sta"
+    assert sorted(p.name for p in task_dir.glob("result.*.bin")) == ["result.0.bin", "result.1.bin", "result.2.bin"]
+    assert "slack" in (task_dir / "result.json").read_text()
+    assert (task_dir / "result.0.bin").stat().st_size == 8 * 10000
+
+    sess2 = get_flow().session_at(tmp_path)
+    res = sess2.get_result(TargetId('top', 'sta'))
+    assert isinstance(res.slack, memoryview)
+    assert res.slack.readonly
+    assert len(res.slack) == 10000
+    assert res.slack[3] == 1.5
+    assert res.corners['ss'].tolist() == [1, 2, 3]
+    assert len(res.corners['empty']) == 0
+
+def test_array_digest(tmp_path):
+    sess = get_flow().session_at(tmp_path)
+    r = Result()
+    r.a = array.array('i', [1, 2, 3])
+    json1 = r.json(sess, 'top', 'sta')
+    r.a = array.array('i', [1, 2, 4])
+    assert "sha256" in json1
+    assert r.json(sess, 'top', 'sta') != json1
+    assert not list(tmp_path.glob("**/*.bin"))
+
+def test_numpy_sidecar(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    class PowerBlock(Block):
+        @task()
+        def power(self, cwd):
+            r = Result()
+            r.per_cycle = np.arange(100000, dtype=np.float32)
+            r.empty = np.zeros((0, 3))
+            return r
+
+    flow = Flow()
+    flow['top'] = PowerBlock()
+    flow.session_at(tmp_path).plan('top', 'power').run()
+    assert (tmp_path / "top/power/result.0.npy").exists()
+
+    res = flow.session_at(tmp_path).get_result(TargetId('top', 'power'))
+    assert isinstance(res.per_cycle, np.memmap)
+    assert not res.per_cycle.flags.writeable
+    assert float(res.per_cycle.sum()) == float(np.arange(100000, dtype=np.float32).sum())
+    assert res.empty.shape == (0, 3)
+
+    with pytest.raises(ValueError):
+        Result().objects = np.array([object()])
@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+from pydesignflow import Flow, Block, TargetId, task
+from pydesignflow.schedule import format_duration
+
+class ChipBlock(Block):
+    def __init__(self):
+        super().__init__()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def log(self, name):
+        with self.lock:
+            self.started.append(name)
+
+    @task()
+    def lint1(self, cwd):
+        self.log('lint1')
+
+    @task()
+    def lint2(self, cwd):
+        self.log('lint2')
+
+    @task()
+    def syn(self, cwd):
+        self.log('syn')
+
+    @task(requires={'s': '.syn'})
+    def pnr(self, cwd, s):
+        self.log('pnr')
+
+    @task(requires={'l1': '.lint1', 'l2': '.lint2', 'p': '.pnr'})
+    def signoff(self, cwd, l1, l2, p):
+        self.log('signoff')
+
+def get_flow():
+    flow = Flow()
+    flow['chip'] = ChipBlock()
+    return flow
+
+def seed_history(sess, durations):
+    for task_id, seconds in durations.items():
+        sess.durations.record(sess.flow.target(TargetId('chip', task_id)), seconds)
+    sess.durations.save()
+
+def test_format_duration():
+    assert format_duration(12) == "12s"
+    assert format_duration(310) == "5m 10s"
+    assert format_duration(6*3600+5*60) == "6h 05m"
+
+def test_duration_history(tmp_path):
+    sess = get_flow().session_at(tmp_path)
+    sess.plan('chip', 'lint1').run()
+    seed_history(sess, {'syn': 100})
+
+    # History is persisted and merged:
+    sess2 = get_flow().session_at(tmp_path)
+    seed_history(sess2, {'syn': 200})
+    sess3 = get_flow().session_at(tmp_path)
+    target = sess3.flow.target(TargetId('chip', 'syn'))
+    assert sess3.durations.estimate(target) == 150
+    # Duration of the present result is used without history:
+    lint1 = sess3.flow.target(TargetId('chip', 'lint1'))
+    assert sess3.durations.estimate(lint1, sess3.get_result(TargetId('chip', 'lint1'))) < 1
+    # Other instances of the same Block class share the task type history:
+    flow = get_flow()
+    flow['chip2'] = ChipBlock()
+    sess4 = flow.session_at(tmp_path)
+    assert sess4.durations.estimate(flow.target(TargetId('chip2', 'syn'))) == 150
+    assert sess4.durations.estimate(flow.target(TargetId('chip2', 'pnr'))) is None
+
+def test_critical_path(tmp_path):
+    sess = get_flow().session_at(tmp_path)
+    seed_history(sess, {'lint1': 300, 'lint2': 300, 'syn': 3600, 'pnr': 6*3600, 'signoff': 60})
+    sched = sess.plan('chip', 'signoff', build_dependencies='missing').schedule()
+    assert sched.critical_path() == [TargetId('chip', t) for t in ('syn', 'pnr', 'signoff')]
+    assert sched.makespan(jobs=1) == 300+300+3600+6*3600+60
+    assert sched.makespan(jobs=2) == 3600+6*3600+60
+    summary = sched.summary(jobs=2)
+    assert "Estimated makespan: 7h 01m (jobs=2)" in summary
+    assert "Critical path: chip.syn (1h 00m) → chip.pnr (6h 00m) → chip.signoff (1m 00s)" in summary
+
+def test_priority_order(tmp_path):
+    flow = get_flow()
+    sess = flow.session_at(tmp_path)
+    seed_history(sess, {'lint1': 300, 'lint2': 300, 'syn': 3600, 'pnr': 6*3600, 'signoff': 60})
+    # lint1 and lint2 come first in the plan, but syn is on the critical
+    # path and therefore started in one of the two slots.
+    sess.plan('chip', 'signoff', build_dependencies='missing').run(jobs=2)
+    assert 'syn' in flow['chip'].started[:2]
+    assert flow['chip'].started[-1] == 'signoff'
+    # Durations of the run are recorded:
+    sess2 = get_flow().session_at(tmp_path)
+    assert len(sess2.durations.read()["targets"]["chip.syn"]) == 2
+
+def test_dry_run_summary(tmp_path, capsys):
+    get_flow().cli_main(['chip.signoff', '--build-dir', str(tmp_path), '--dry-run', '-j', '2'])
+    out = capsys.readouterr().out
+    assert "Estimated makespan: 0s (jobs=2)" in out
+    assert "No duration history for 5 of 5 target(s)." in out
+    assert "Critical path: " in out
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import math
+from pathlib import Path
+from datetime import datetime
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, Result
+from pydesignflow.serialization import get_codec, StdlibCodec
+
+class FileListBlock(Block):
+    @task()
+    def netlist(self, cwd):
+        r = Result()
+        r.files = [cwd / f"mod{i}.v" for i in range(1000)]
+        r.external = Path("/opt/pdk/cells.lib")
+        r.generated = datetime(2026, 1, 2, 3, 4, 5, 123456)
+        r.big = 2**70
+        return r
+
+    @task()
+    def non_finite(self, cwd):
+        r = Result()
+        r.slack = float("nan")
+        r.bounds = {"min": float("-inf"), "max": float("inf")}
+        return r
+
+    @task()
+    def with_tuple(self, cwd):
+        r = Result()
+        r.pair = (1, 2)
+        return r
+
+def get_flow(**kwargs):
+    flow = Flow(**kwargs)
+    flow['top'] = FileListBlock()
+    return flow
+
+def check_netlist(res, build_dir):
+    assert res.files[7] == build_dir / "top/netlist/mod7.v"
+    assert res.external == Path("/opt/pdk/cells.lib")
+    assert res.generated == datetime(2026, 1, 2, 3, 4, 5, 123456)
+    assert res.big == 2**70
+
+@pytest.mark.parametrize("writer", ["json", "orjson"])
+@pytest.mark.parametrize("reader", ["json", "orjson"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_codecs(tmp_path, writer, reader, compact):
+    if "orjson" in (writer, reader):
+        pytest.importorskip("orjson")
+    sess = get_flow(result_codec=writer, compact_results=compact).session_at(tmp_path)
+    sess.plan('top', 'netlist').run()
+    json_str = (tmp_path / "top/netlist/result.json").read_text()
+    assert (json_str.count("\n") == 0) == compact
+
+    sess2 = get_flow(result_codec=reader).session_at(tmp_path)
+    check_netlist(sess2.get_result(TargetId('top', 'netlist')), tmp_path)
+
+@pytest.mark.parametrize("writer", ["json", "orjson"])
+@pytest.mark.parametrize("reader", ["json", "orjson"])
+def test_non_finite_floats(tmp_path, writer, reader):
+    if "orjson" in (writer, reader):
+        pytest.importorskip("orjson")
+    sess = get_flow(result_codec=writer).session_at(tmp_path)
+    sess.plan('top', 'non_finite').run()
+    json_str = (tmp_path / "top/non_finite/result.json").read_text()
+    assert "null" not in json_str
+
+    for res in (sess.get_result(TargetId('top', 'non_finite')),
+            get_flow(result_codec=reader).session_at(tmp_path).get_result(TargetId('top', 'non_finite'))):
+        assert math.isnan(res.slack)
+        assert res.bounds == {"min": float("-inf"), "max": float("inf")}
+
+def test_orjson_loads_non_finite():
+    pytest.importorskip("orjson")
+    codec = get_codec("orjson")
+    assert codec.loads(StdlibCodec().dumps([float("inf")], None)) == [float("inf")]
+    with pytest.raises(ValueError):
+        codec.loads("[1,")
+
+def test_result_kept_in_memory(tmp_path):
+    flow = get_flow()
+    sess = flow.session_at(tmp_path)
+    sess.plan('top', 'netlist').run()
+    tid = TargetId('top', 'netlist')
+    # The Result returned by the task is stored without decoding result.json:
+    assert isinstance(sess.results.entries[tid], Result)
+    check_netlist(sess.get_result(tid), tmp_path)
+
+    # Tuples are decoded as lists, so this Result is decoded from JSON:
+    sess.plan('top', 'with_tuple').run()
+    assert sess.get_result(TargetId('top', 'with_tuple')).pair == [1, 2]
+
+def test_codecs_equivalent(tmp_path):
+    pytest.importorskip("orjson")
+    res = Result()
+    res.files = [tmp_path / "a.v"]
+    res.time = datetime(2026, 1, 1)
+    sess = get_flow().session_at(tmp_path)
+    stdlib = res.json(sess, 'top', 'netlist', indent=None, sort_keys=True, codec=StdlibCodec())
+    orjson = res.json(sess, 'top', 'netlist', indent=None, sort_keys=True, codec=get_codec("orjson"))
+    assert StdlibCodec().loads(stdlib) == StdlibCodec().loads(orjson)
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("yaml")
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+import pytest
+from pathlib import Path
+from pydesignflow import shortcut
+from pydesignflow.snapshot import FlowSnapshot, load_snapshot
+from pydesignflow.cli import CLI
+
+flow_py = """
+from pathlib import Path
+from pydesignflow import Flow, Block, task, Result
+
+with open(Path(__file__).parent / "imports.txt", "a") as f:
+    f.write("imported\\n")
+
+class MyBlock(Block):
+    \"\"\"My block\"\"\"
+    @task()
+    def step1(self, cwd):
+        \"\"\"First step\"\"\"
+        r = Result()
+        r.value = 1
+        return r
+
+    @task(requires={'s1': '.step1'}, hidden=True)
+    def step2(self, cwd, s1):
+        pass
+
+flow = Flow()
+flow['top'] = MyBlock()
+"""
+
+@pytest.fixture
+def flow_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.delenv('PYDESIGNFLOW_NO_SNAPSHOT', raising=False)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'flow.py').write_text(flow_py)
+    yield tmp_path
+    sys.modules.pop('flow', None)
+
+def run_flow(monkeypatch, args):
+    monkeypatch.setattr(sys, 'argv', ['flow'] + args)
+    shortcut.main()
+
+def import_count(flow_dir):
+    return (flow_dir / 'imports.txt').read_text().count("imported")
+
+def test_is_status_query():
+    assert CLI.is_status_query([])
+    assert CLI.is_status_query(['--brief'])
+    assert CLI.is_status_query(['top', '-B', 'build'])
+    assert not CLI.is_status_query(['top.step1'])
+    assert not CLI.is_status_query(['top', 'step1'])
+    assert not CLI.is_status_query(['--clean'])
+    assert not CLI.is_status_query(['--monitor'])
+    assert not CLI.is_status_query(['--help'])
+    assert not CLI.is_status_query(['--unknown-option'])
+    assert not CLI.is_status_query(['--trace', 'trace.json'])
+
+def test_snapshot_status(flow_dir, monkeypatch, capsys):
+    run_flow(monkeypatch, ['top.step1'])
+    assert import_count(flow_dir) == 1
+    capsys.readouterr()
+
+    # Status is answered from the snapshot:
+    run_flow(monkeypatch, ['--brief'])
+    assert import_count(flow_dir) == 1
+    assert capsys.readouterr().out == "top\n  .step1\n"
+    run_flow(monkeypatch, ['top'])
+    assert import_count(flow_dir) == 1
+    out = capsys.readouterr().out
+    assert "First step" in out
+    assert ".step2" in out
+
+    # Changing the flow source invalidates the snapshot:
+    (flow_dir / 'flow.py').write_text(flow_py + "\n# changed\n")
+    os.utime(flow_dir / 'flow.py', ns=(0, 0))
+    run_flow(monkeypatch, ['--brief'])
+    assert import_count(flow_dir) == 2
+
+def test_snapshot_roundtrip(flow_dir, monkeypatch, capsys):
+    run_flow(monkeypatch, ['--brief'])
+    snap = load_snapshot(flow_dir)
+    assert snap is not None
+    snap2 = FlowSnapshot.from_json(snap.to_json())
+    assert list(snap2) == ['top']
+    assert snap2['top'].__doc__ == "My block"
+    assert snap2['top'].tasks['step2'].hidden
+    assert dict(snap2['top'].tasks['step2'].resolve_requires())['s1'].task_id == 'step1'
+
+def test_snapshot_settings(flow_dir, monkeypatch):
+    (flow_dir / 'flow.py').write_text(flow_py.replace("flow = Flow()",
+        "flow = Flow(result_codec='json', compact_results=True, compression='gzip')"))
+    run_flow(monkeypatch, ['--brief'])
+    snap = FlowSnapshot.from_json(load_snapshot(flow_dir).to_json())
+    assert snap.result_codec == 'json'
+    assert snap.compact_results
+    assert snap.compression == 'gzip'
+
+def test_snapshot_package_sources(flow_dir, monkeypatch, tmp_path_factory):
+    # Module outside the flow directory, e.g. an installed PDK package:
+    site_dir = tmp_path_factory.mktemp('site')
+    (site_dir / 'mypdk.py').write_text("CORNERS = ['tt']\n")
+    monkeypatch.syspath_prepend(str(site_dir))
+    (flow_dir / 'flow.py').write_text("import mypdk\n" + flow_py)
+    try:
+        run_flow(monkeypatch, ['--brief'])
+        run_flow(monkeypatch, ['--brief'])
+        assert import_count(flow_dir) == 1
+        os.utime(site_dir / 'mypdk.py', ns=(0, 0))
+        run_flow(monkeypatch, ['--brief'])
+        assert import_count(flow_dir) == 2
+    finally:
+        sys.modules.pop('mypdk', None)
+
+def test_snapshot_disabled(flow_dir, monkeypatch):
+    run_flow(monkeypatch, ['--brief'])
+    assert load_snapshot(flow_dir) is not None
+    (flow_dir / 'flow.py').write_text(flow_py.replace("flow = Flow()", "flow = Flow(snapshot=False)"))
+    run_flow(monkeypatch, ['--brief'])
+    run_flow(monkeypatch, ['--brief'])
+    assert import_count(flow_dir) == 3
+    assert load_snapshot(flow_dir) is None
@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import pickle
+import pytest
+from dataclasses import FrozenInstanceError
+from pydesignflow import Flow, Block, TargetId, task
+
+class BaseBlock(Block):
+    @task()
+    def base_task(self, cwd):
+        pass
+
+class ParamBlock(BaseBlock):
+    def __init__(self, param, dependency_map={}):
+        super().__init__(dependency_map)
+        self.param = param
+
+    @task()
+    def first(self, cwd):
+        pass
+
+    @task(requires={'f': '.first', 'o': 'other.first'})
+    def second(self, cwd, f, o):
+        pass
+
+    @property
+    def prop(self):
+        raise RuntimeError("properties must not be evaluated")
+
+def test_task_table_shared():
+    flow = Flow()
+    flow['a'] = ParamBlock(1, dependency_map={'other': 'b'})
+    flow['b'] = ParamBlock(2, dependency_map={'other': 'a'})
+    # Tasks of the class come first, inherited tasks are appended:
+    assert list(flow['a'].tasks) == ['first', 'second', 'base_task']
+    # Targets are created per instance:
+    assert flow['a'].tasks['first'] is not flow['b'].tasks['first']
+    assert flow['a'].tasks['first'].block is flow['a']
+    assert list(flow['a'].tasks['second'].resolve_requires()) == [
+        ('f', TargetId('a', 'first')),
+        ('o', TargetId('b', 'first')),
+    ]
+    # Table is computed once per class:
+    assert ParamBlock.task_table() is ParamBlock.task_table()
+    assert BaseBlock.task_table() is not ParamBlock.task_table()
+    assert [k for k, _ in BaseBlock.task_table()[0]] == ['base_task']
+
+def test_task_table_block_refs():
+    with pytest.raises(ValueError):
+        ParamBlock(1)
+    assert ParamBlock(1, dependency_map={'other': 'x'}).required_block_refs() == {'other'}
+
+def test_malformed_spec():
+    # Malformed specs are reported when the block is instantiated.
+    class BadBlock(Block):
+        @task(requires={'x': 'no dot'})
+        def bad(self, cwd, x):
+            pass
+    with pytest.raises(ValueError):
+        BadBlock()
+
+def test_target_slots():
+    target = ParamBlock(1, dependency_map={'other': 'x'}).tasks['first']
+    assert not hasattr(target, '__dict__')
+    with pytest.raises(AttributeError):
+        target.unknown_attribute = 1
+
+def test_target_id():
+    tid = TargetId('a', 'b')
+    assert tid == TargetId(block_id='a', task_id='b')
+    assert tid != TargetId('a', 'c')
+    assert hash(tid) == hash(TargetId('a', 'b'))
+    assert len({tid, TargetId('a', 'b')}) == 1
+    assert str(tid) == 'a.b'
+    assert repr(tid) == "TargetId(block_id='a', task_id='b')"
+    assert pickle.loads(pickle.dumps(tid)) == tid
+    assert not hasattr(tid, '__dict__')
+    with pytest.raises(FrozenInstanceError):
+        tid.block_id = 'x'
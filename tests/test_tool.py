@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import sys
+import gzip
+import shlex
+import subprocess
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, Result
+from pydesignflow.tool import ToolError, OutputPump, run_tool
+
+def script(code):
+    # Unbuffered, so that the order of stdout and stderr lines is defined.
+    return [sys.executable, "-u", "-c", code]
+
+noisy = script(
+    "import sys\n"
+    "for i in range(20000): print(f'line {i}')\n"
+    "sys.stderr.write('warning: done\\n')\n"
+    "sys.stdout.write('no newline at end')\n"
+)
+
+failing = script(
+    "import sys\n"
+    "for i in range(100): print(f'step {i}')\n"
+    "sys.stderr.write('ERROR: placement failed\\n')\n"
+    "sys.exit(3)\n"
+)
+
+class ToolBlock(Block):
+    @task()
+    def noisy(self, cwd):
+        result = Result()
+        self.run_tool(noisy, cwd, result=result, echo_rate=5)
+        self.run_tool(script("print('second run')"), cwd, result=result)
+        return result
+
+    @task()
+    def failing(self, cwd):
+        self.run_tool(failing, cwd)
+
+def test_run_tool(tmp_path, capsys):
+    block = ToolBlock()
+    result = Result()
+    run = block.run_tool(noisy, tmp_path, echo_rate=10, tail_lines=5, result=result)
+    assert run.returncode == 0
+    assert run.lines == 20002
+    assert run.log == tmp_path / f"{noisy[0].rsplit('/', 1)[-1]}.log.gz"
+    assert run.tail[-1] == "no newline at end"
+    assert len(run.tail) == 5
+
+    with gzip.open(run.log, "rt") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 20002
+    assert lines[:2] == ["line 0", "line 1"]
+    assert "line 19999" in lines
+    assert "warning: done" in lines
+
+    # Echo is rate-limited, the other lines are counted:
+    out = capsys.readouterr().out.splitlines()
+    assert "line 0" in out
+    shown = [l for l in out if not l.startswith("[")]
+    assert len(shown) < 100
+    omitted = sum(int(l[1:].split(" ")[0]) for l in out if l.startswith("["))
+    assert len(shown) + omitted == 20002
+
+    assert result.tool_runs == [{"cmd": shlex.join(run.cmd),
+        "returncode": 0, "log": run.log, "lines": 20002}]
+
+    # A second run gets its own log:
+    run2 = block.run_tool(noisy, tmp_path, echo_rate=0)
+    assert run2.log != run.log and run2.log.exists()
+    assert capsys.readouterr().out == ""
+
+    # Unlimited echo:
+    run3 = block.run_tool(noisy, tmp_path, echo_rate=None)
+    assert len(capsys.readouterr().out.splitlines()) == 20002
+
+def test_run_tool_pump_error(tmp_path, monkeypatch):
+    def add_lines(self, lines, data):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(OutputPump, 'add_lines', add_lines)
+    # The error is raised instead of waiting for the pipe forever:
+    with pytest.raises(OSError, match="No space left"):
+        run_tool(noisy, tmp_path)
+
+def test_run_tool_failure(tmp_path, capsys):
+    block = ToolBlock()
+    with pytest.raises(ToolError) as exc_info:
+        block.run_tool(failing, tmp_path, tail_lines=3)
+    e = exc_info.value
+    assert isinstance(e, subprocess.CalledProcessError)
+    assert e.returncode == 3
+    assert e.tail[-1] == "ERROR: placement failed"
+    assert len(e.tail) == 3
+    assert str(e.log) in str(e)
+
+    run = block.run_tool(failing, tmp_path, check=False)
+    assert run.returncode == 3
+
+def test_run_tool_flow(tmp_path, capsys):
+    flow = Flow()
+    flow['tool'] = ToolBlock()
+    build_dir = tmp_path / "build"
+    flow.cli_main(['tool.noisy', '--build-dir', str(build_dir)])
+    sess = flow.session_at(build_dir)
+    runs = sess.results[TargetId('tool', 'noisy')].tool_runs
+    assert [r["returncode"] for r in runs] == [0, 0]
+    assert runs[0]["log"].parent == build_dir / "tool" / "noisy"
+    assert runs[0]["log"] != runs[1]["log"]
+    assert all(r["log"].exists() for r in runs)
+
+    # hide_subprocess_errors shows the last lines and the log:
+    with pytest.raises(SystemExit) as exc_info:
+        flow.cli_main(['tool.failing', '--build-dir', str(build_dir)])
+    message = str(exc_info.value)
+    assert "exited with return code 3" in message
+    assert "ERROR: placement failed" in message
+    assert str(build_dir / "tool" / "failing") in message
+
+def test_run_tool_parallel_prefix(tmp_path, capsys):
+    class Parallel(Block):
+        @task()
+        def a(self, cwd):
+            self.run_tool(script("print('from a')"), cwd)
+
+        @task()
+        def b(self, cwd):
+            self.run_tool(script("print('from b')"), cwd)
+
+        @task(requires={'a': '.a', 'b': '.b'})
+        def join(self, cwd, a, b):
+            pass
+    flow = Flow()
+    flow['p'] = Parallel()
+    flow.cli_main(['p.join', '--build-dir', str(tmp_path), '-j', '2'])
+    out = capsys.readouterr().out.splitlines()
+    assert "[p.a] from a" in out
+    assert "[p.b] from b" in out
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import sys
+import json
+import subprocess
+from pydesignflow import Flow, Block, TargetId, task, Result
+from pydesignflow.trace import Tracer, process_usage
+
+class ToolBlock(Block):
+    @task()
+    def tool(self, cwd):
+        # Subprocess allocating ~50 MiB and spinning for a while.
+        subprocess.check_call([sys.executable, "-c",
+            "import time\n"
+            "x = bytearray(50*2**20)\n"
+            "t = time.time()\n"
+            "while time.time() - t < 0.5: pass\n"
+        ])
+
+    @task(requires={'t': '.tool'})
+    def after(self, cwd, t):
+        r = Result()
+        r.value = 1
+        return r
+
+def get_flow():
+    flow = Flow()
+    flow['b'] = ToolBlock()
+    return flow
+
+def trace_events(filename):
+    with open(filename) as f:
+        return json.load(f)["traceEvents"]
+
+def test_process_usage():
+    ticks, rss = process_usage(subprocess.os.getpid())
+    assert ticks >= 0
+    assert rss > 0
+
+def test_trace_run(tmp_path):
+    tracer = Tracer(sample_interval=0.05)
+    sess = get_flow().session_at(tmp_path / 'build', tracer=tracer)
+    trace_file = tmp_path / 'trace.json'
+    sess.plan('b', 'after', build_dependencies='missing').run(trace=trace_file)
+
+    events = trace_events(trace_file)
+    spans = [e["name"] for e in events if e["ph"] == "X"]
+    for name in ("session open", "reload_results", "plan", "run", "b.tool",
+            "b.after", "rmtree", "load dependencies", "task",
+            "serialize result", "write result"):
+        assert name in spans
+    for e in events:
+        if e["ph"] == "X":
+            assert e["dur"] >= 0
+
+    counters = [e for e in events if e["ph"] == "C" and e["name"] == "b.tool resources"]
+    assert len(counters) > 0
+    assert max(e["args"]["rss_mib"] for e in counters) >= 50
+    assert max(e["args"]["cpu_percent"] for e in counters) > 0
+
+    res = sess.get_result(TargetId('b', 'tool'))
+    assert res.peak_rss >= 50*2**20
+    assert res.peak_cpu_percent > 0
+
+def test_trace_without_tracer(tmp_path):
+    # Without tracer, resource usage is sampled for the Result as well:
+    sess = get_flow().session_at(tmp_path / 'build')
+    sess.plan('b', 'after', build_dependencies='missing').run()
+    assert sess.get_result(TargetId('b', 'tool')).peak_rss >= 50*2**20
+
+    # BuildPlan.run with trace, but session without Tracer:
+    sess.clean()
+    sess.plan('b', 'after', build_dependencies='missing').run(trace=tmp_path / 'trace.json')
+    spans = [e["name"] for e in trace_events(tmp_path / 'trace.json') if e["ph"] == "X"]
+    assert "b.tool" in spans
+    assert not "session open" in spans
+
+class JoinBlock(Block):
+    @task(requires={'b': '=b.tool', 'c': '=c.tool'})
+    def join(self, cwd, b, c):
+        pass
+
+def test_trace_parallel(tmp_path):
+    flow = get_flow()
+    flow['c'] = ToolBlock()
+    flow['j'] = JoinBlock()
+    sess = flow.session_at(tmp_path / 'build', tracer=Tracer(sample_interval=0.05))
+    trace_file = tmp_path / 'trace.json'
+    sess.plan('j', 'join', build_dependencies='missing').run(jobs=2, trace=trace_file)
+    events = trace_events(trace_file)
+    for block_id in 'b', 'c':
+        # Subprocesses are attributed to the thread that started them:
+        rss_mib = [e["args"]["rss_mib"] for e in events
+            if e["ph"] == "C" and e["name"] == f"{block_id}.tool resources"]
+        assert 50 <= max(rss_mib) < 90
+        res = sess.get_result(TargetId(block_id, 'tool'))
+        assert 50*2**20 <= res.peak_rss < 90*2**20
+
+def test_trace_cli(tmp_path):
+    trace_file = tmp_path / 'trace.json'
+    get_flow().cli_main(['b.after', '--build-dir', str(tmp_path / 'build'),
+        '--trace', str(trace_file)])
+    spans = [e["name"] for e in trace_events(trace_file) if e["ph"] == "X"]
+    assert "session open" in spans
+    assert "b.after" in spans
@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import errno
+from pydesignflow import TargetId
+from pydesignflow.trash import Trash
+
+def get_flow():
+    from .flow_example1 import flow
+    return flow
+
+def test_trash_rebuild(tmp_path):
+    sess = get_flow().session_at(tmp_path)
+    sess.plan('top', 'step1').run()
+    (tmp_path / 'top' / 'step1' / 'old_output.txt').write_text("old")
+    sess.plan('top', 'step1').run()
+    assert not (tmp_path / 'top' / 'step1' / 'old_output.txt').exists()
+    assert TargetId('top', 'step1') in sess.results
+    sess.trash.wait()
+    assert not sess.trash.pending()
+
+def test_trash_one_purge_per_build(tmp_path, monkeypatch):
+    sess = get_flow().session_at(tmp_path)
+    sess.plan('top', 'step2', build_dependencies='missing').run()
+    purges = []
+    purge_async = Trash.purge_async
+    def counting_purge_async(self):
+        purges.append(self)
+        purge_async(self)
+    monkeypatch.setattr(Trash, "purge_async", counting_purge_async)
+    # Both targets are rebuilt, their previous outputs are purged once:
+    sess.plan('top', 'step2', build_dependencies='all').run()
+    assert len(purges) == 1
+    sess.trash.wait()
+    assert not sess.trash.pending()
+
+def test_trash_clean(tmp_path):
+    sess = get_flow().session_at(tmp_path)
+    sess.plan('top', 'step2', build_dependencies='missing').run()
+    sess.clean('top', 'step1')
+    assert not (tmp_path / 'top' / 'step1').exists()
+    assert not TargetId('top', 'step1') in sess.results
+    assert TargetId('top', 'step2') in sess.results
+    sess.clean('top')
+    assert not (tmp_path / 'top').exists()
+    assert len(sess.results) == 0
+    sess.trash.wait()
+    assert not sess.trash.pending()
+
+    # Clean all keeps the directory holding index and trash:
+    sess.plan('top', 'step1').run()
+    (tmp_path / 'other_file').write_text("")
+    sess.clean()
+    assert sorted(os.listdir(tmp_path)) == ['.pydesignflow']
+    assert len(sess.results) == 0
+    sess2 = get_flow().session_at(tmp_path)
+    assert len(sess2.results) == 0
+    sess.trash.wait()
+    assert not sess.trash.pending()
+
+def test_trash_resume(tmp_path):
+    trash = Trash(tmp_path / '.pydesignflow')
+    (tmp_path / 'leftover' / 'sub').mkdir(parents=True)
+    trash.move(tmp_path / 'leftover', purge=False)
+    assert trash.pending()
+    # Opening a session resumes the purge:
+    sess = get_flow().session_at(tmp_path)
+    sess.trash.wait()
+    assert not trash.pending()
+
+def test_trash_sync(tmp_path):
+    trash = Trash(tmp_path / '.pydesignflow', background=False)
+    (tmp_path / 'a' / 'b').mkdir(parents=True)
+    assert trash.move(tmp_path / 'a')
+    assert not (tmp_path / 'a').exists()
+    assert not trash.pending()
+    assert not trash.move(tmp_path / 'a')
+
+def test_trash_rename_fails(tmp_path, monkeypatch):
+    trash = Trash(tmp_path / '.pydesignflow')
+    (tmp_path / 'a' / 'b').mkdir(parents=True)
+    def rename(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    monkeypatch.setattr(os, "rename", rename)
+    assert trash.move(tmp_path / 'a')
+    assert not (tmp_path / 'a').exists()
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2026 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+import time
+import threading
+import importlib.util
+import subprocess
+from pathlib import Path
+import pytest
+from pydesignflow import Flow, Block, TargetId, task, Result, FlowError
+from pydesignflow.workers import LeaseBoard, Worker, WorkerPoolExecutor
+
+flow_source = '''
+import os
+import time
+from pydesignflow import Flow, Block, task, Result
+
+class FarmBlock(Block):
+    def step(self):
+        time.sleep(0.3)
+        r = Result()
+        r.pid = os.getpid()
+        return r
+
+    @task()
+    def a(self, cwd):
+        return self.step()
+
+    @task()
+    def b(self, cwd):
+        return self.step()
+
+    @task()
+    def c(self, cwd):
+        return self.step()
+
+    @task(requires={'a': '.a', 'b': '.b', 'c': '.c'})
+    def join(self, cwd, a, b, c):
+        r = self.step()
+        r.inputs = [a.pid, b.pid, c.pid]
+        return r
+
+    @task()
+    def fail(self, cwd):
+        raise RuntimeError("task failed on worker")
+
+flow = Flow()
+flow['farm'] = FarmBlock()
+'''
+
+def import_flow(path):
+    (path / "flow.py").write_text(flow_source)
+    spec = importlib.util.spec_from_file_location("worker_test_flow", path / "flow.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.flow
+
+def start_worker(path, build_dir):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(Path(__file__).resolve().parent.parent)
+    env["PYDESIGNFLOW_NO_SNAPSHOT"] = "1"
+    return subprocess.Popen([sys.executable, "-c", "from pydesignflow.shortcut import main; main()",
+        "worker", "--build-dir", str(build_dir), "--idle-exit", "2"],
+        cwd=path, env=env, stdout=subprocess.DEVNULL)
+
+def test_lease_board(tmp_path):
+    board = LeaseBoard(tmp_path)
+    board.create()
+    tid = TargetId('farm', 'a')
+    board.publish(3, tid)
+    assert board.entries("ready") == ["000003-farm.a"]
+    claimed = board.claim("host1:1")
+    assert claimed == "000003-farm.a@host1:1"
+    assert board.parse_name(claimed) == (tid, "host1:1")
+    assert board.claim("host2:2") is None
+
+    # Expired lease is returned to the ready set:
+    os.utime(board.dirs["claimed"] / claimed, (0, 0))
+    assert board.reclaim_expired(60) == [claimed]
+    assert not board.heartbeat(claimed)
+    assert not board.complete(claimed)
+    claimed2 = board.claim("host2:2")
+    assert board.reclaim_expired(60) == []
+    assert board.complete(claimed2)
+    assert board.entries("done") == ["000003-farm.a"]
+
+def test_worker_processes(tmp_path):
+    flow = import_flow(tmp_path)
+    build_dir = tmp_path / "build"
+    sess = flow.session_at(build_dir)
+    workers = [start_worker(tmp_path, build_dir) for _ in range(3)]
+    try:
+        sess.plan('farm', 'join', build_dependencies='missing').run(executor="workers")
+    finally:
+        for w in workers:
+            w.wait(timeout=30)
+    worker_pids = {w.pid for w in workers}
+    join = sess.get_result(TargetId('farm', 'join'))
+    assert join.pid in worker_pids
+    assert set(join.inputs) <= worker_pids
+    assert not LeaseBoard(sess.index.meta_dir).entries("done")
+
+def test_worker_failure(tmp_path):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path)
+    worker = threading.Thread(target=Worker(flow.session_at(tmp_path), poll_interval=0.1).run,
+        kwargs={'idle_exit': 1})
+    worker.start()
+    with pytest.raises(FlowError, match="task failed on worker"):
+        sess.plan('farm', 'fail').run(executor="workers")
+    worker.join()
+
+def test_expired_lease(tmp_path, capsys):
+    flow = import_flow(tmp_path)
+    sess = flow.session_at(tmp_path)
+    plan = sess.plan('farm', 'a')
+    coordinator = threading.Thread(target=WorkerPoolExecutor(plan, lease_timeout=0.5, poll_interval=0.1).run)
+    coordinator.start()
+    board = LeaseBoard(sess.index.meta_dir)
+    # A worker claims the target and dies without heartbeat:
+    for _ in range(100):
+        if board.claim("crashed:1"):
+            break
+        time.sleep(0.05)
+    time.sleep(1.5)
+    Worker(flow.session_at(tmp_path), poll_interval=0.1).run(idle_exit=1)
+    coordinator.join()
+    assert "Lease of target farm.a on crashed:1 expired" in capsys.readouterr().out
+    assert TargetId('farm', 'a') in sess.results